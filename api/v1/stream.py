@@ -10,6 +10,7 @@ from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, System
 
 from utilities.llm.ai_factory import AIFactory
 from utilities.llm.chain import run_chain
+from utilities.llm.graph_factory import get_checkpointer
 from utilities.llm.prompts.assistant_prompt import ASSISTANT_SYSTEM_PROMPT, WEB_ASSISTANT_SYSTEM_PROMPT
 from utilities.llm.prompts.title_suggestion_prompt import TITLE_SUGGESTION_PROMPT
 from utilities.database.models.history_listing import HistoryListing
@@ -18,6 +19,7 @@ from utilities.database.models.checkpoints import Checkpoints
 from utilities.database.models.checkpoint_writes import CheckpointWrites
 import logging
 import uuid
+from bson import ObjectId
 from utilities.helper import extract_token_usage_details
 from utilities.llm.tools.content_search_tool import content_search
 from utilities.llm.tools.sample_tool import get_weather
@@ -25,6 +27,11 @@ from core.model_config import get_active_model
 from fastapi import Body, Query
 
 from utilities.llm.tools.support_search_tool import support_search
+from utilities.embedding_cache import query_embedding_cache
+from utilities.search_cache import search_result_cache
+from utilities.payload_store import payload_store
+from utilities.search_index_writer import search_index_writer
+from utilities.blocking_executor import run_blocking
 
 router = APIRouter()
 
@@ -98,10 +105,11 @@ async def chat(request: ChatRequest):
             tools = []
         elif request.focus == "swo":
             system_prompt = ASSISTANT_SYSTEM_PROMPT
-            if request.publication_ids_array and str(request.publication_ids_array).strip() not in ["", "[]", "null", None]:
-                system_prompt += "\n Note user only subscribed to the following publications :" + str(request.publication_ids_array)
             tools = [content_search, support_search]
             agent_info = {"publication_ids": request.publication_ids_array}
+            if request.publication_ids_array and str(request.publication_ids_array).strip() not in ["", "[]", "null", None]:
+                # Appended to the system prompt per run, so the compiled graph stays shared
+                agent_info["prompt_note"] = "\n Note user only subscribed to the following publications :" + str(request.publication_ids_array)
         else:
             system_prompt = ASSISTANT_SYSTEM_PROMPT
             tools = []
@@ -121,11 +129,8 @@ async def chat(request: ChatRequest):
             
         )
         state = {"messages": [{"role":"human", "content": request.message}]}
-        config = {
-            "configurable": {"thread_id": thread_id},
-            "recursion_limit": 1500,
-        }
-        result = agent.graph.invoke(state, config)
+        config = agent.make_config(thread_id)
+        result = await agent.graph.ainvoke(state, config)
         messages = result.get("messages", [])
         print(f"****Messages received: {messages}")
         formatted_messages = []
@@ -133,15 +138,24 @@ async def chat(request: ChatRequest):
         for msg in messages:
             # If msg is not a dict (e.g., a HumanMessage object), convert to dict or extract needed fields
             if isinstance(msg, BaseMessage) and msg.content:
+                content = msg.content
+                tool_output = None
+                if isinstance(msg, ToolMessage):
+                    # Large tool outputs are kept in the payload store; clients get the full text
+                    content = await run_blocking(payload_store.resolve_content, msg.content)
+                    try:
+                        tool_output = json.loads(content)
+                    except (TypeError, ValueError):
+                        tool_output = None  # plain-text output or error
                 formatted = {
                     "id": msg.id,
                     "type": msg.type,
-                    "content": msg.content
+                    "content": content
                 }
                 formatted_messages.append(formatted)
-                if isinstance(msg, ToolMessage)  and isinstance(json.loads(msg.content), dict):
-                    print(f"--------Tool message content: {msg.content}")
-                    internal_source_url= json.loads(msg.content).get("internal_source_url", None)
+                if isinstance(tool_output, dict):
+                    print(f"--------Tool message content: {content}")
+                    internal_source_url= tool_output.get("internal_source_url", None)
                     # split the internal_source_url with "/" take the last part as search_index_id
                     if internal_source_url:
                         print(internal_source_url)
@@ -157,13 +171,19 @@ async def chat(request: ChatRequest):
                
         try:
             if internal_source_url and search_index_id:
-                SearchIndex.objects(id=search_index_id).update(
-                    set__final_answer=messages[-1].content if messages else "",
-                    set__checkpointer_id=messages[-1].id if messages else None,
-                    set__thread_id=thread_id,
-                    set__user_id=request.user_id,
-                    set__created_at=datetime.now()
+                # Coalesces with the buffered insert from content_search when it has not been flushed yet
+                await run_blocking(
+                    search_index_writer.update,
+                    search_index_id,
+                    final_answer=messages[-1].content if messages else "",
+                    checkpointer_id=messages[-1].id if messages else None,
+                    thread_id=thread_id,
+                    user_id=request.user_id,
+                    created_at=datetime.now()
                 )
+                # /search/message may hit another worker right after this response; don't leave
+                # the sources of this answer in this process's write buffer
+                await run_blocking(search_index_writer.flush)
         except Exception as e:
             logging.error(f"Failed to update to SearchIndex: {e}")
 
@@ -238,31 +258,35 @@ class SearchIndexMetaRequest(BaseModel):
 async def get_search_index_meta(request: SearchIndexMetaRequest):
     # Fetch the record from search_index collection
     record = SearchIndex.objects(id=request.id).first()
-    if not record:
+    # The record may still be in the write-behind buffer
+    pending = search_index_writer.pending(request.id) if not record and ObjectId.is_valid(request.id) else None
+    if not record and not (pending and pending.get("query")):
         raise HTTPException(status_code=404, detail="SearchIndex record not found")
 
-    query = record.query
-    # Call content_search tool with the query and publication_ids_array, top_k=20
-    from utilities.llm.tools.content_search_tool import content_search
+    query = record.query if record else pending["query"]
+    # Re-run the search with a larger top_k and return the full metadata of every hit;
+    # the tool's compact LLM context only keeps the fields needed for an answer.
+    from utilities.llm.tools.content_search_tool import build_filter_criteria, publication_namespaces, asearch_content
     try:
-        content_search_response = content_search.invoke(input={
-            "query": query,
-            "top_k": 20,
-            "publication_ids_array": request.publication_ids_array
-        })
-        print("content_search_response--->",content_search_response)
-        # Parse the response and extract only metadata
-        
-        docs = []
-        try:
-            docs = json.loads(content_search_response)
-        except Exception:
-            docs = []
-        metadata_list = [doc.get("metadata", {}) for doc in docs if isinstance(doc, dict) and "metadata" in doc]
+        docs = await asearch_content(
+            query,
+            build_filter_criteria(request.publication_ids_array),
+            k=20,
+            namespaces=publication_namespaces(request.publication_ids_array)
+        )
+        metadata_list = [doc.metadata for doc in docs]
         return {"metadata": metadata_list}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in content search: {str(e)}")
 
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Return hit/miss counters for the retrieval caches."""
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "search_results": search_result_cache.stats(),
+    }
+
 @router.get("/thread/{thread_id}")
 async def load_conversation(thread_id: str):
     try:
@@ -275,7 +299,7 @@ async def load_conversation(thread_id: str):
         )
         
         # Get the conversation state for the thread
-        state = agent.graph.get_state({'configurable': {'thread_id': thread_id}})
+        state = await agent.graph.aget_state({"configurable": {"thread_id": thread_id}})
         print(f"Loaded state for thread {thread_id}: {state}")  
         # Access messages from state.values if StateSnapshot
         messages = state.values.get("messages", []) if hasattr(state, "values") else []
@@ -309,7 +333,7 @@ async def get_search_index_by_message_id(mid: str = Query(..., description="Mess
             "id": str(rec.id),
             "final_answer": rec.final_answer,
             "query": rec.query,
-            "sources": rec.sources,
+            "sources": payload_store.resolve(rec.sources),
             "thread_id": rec.thread_id,
             "user_id": rec.user_id,
             "checkpointer_id": rec.checkpointer_id,
@@ -341,6 +365,11 @@ async def delete_thread(request: DeleteThreadRequest):
         print("thread id ", request.thread_id)
         # Delete from HistoryListing
         history_result = HistoryListing.objects(thread_id=request.thread_id).delete()
+
+        # Drop the thread from the in-memory checkpoint tier so queued writes do not recreate it
+        discard_thread = getattr(get_checkpointer(), "discard_thread", None)
+        if discard_thread:
+            discard_thread(request.thread_id)
         
         # Delete from CheckpointWrites
         checkpoint_writes_result = CheckpointWrites.objects(thread_id=request.thread_id).delete()
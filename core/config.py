@@ -25,6 +25,59 @@ class GlobalConfig(BaseConfig):
     DEEPSEEK_API_KEY: Optional[str] = None
     API_KEY: Optional[str] = None
     SEARCH_URL: Optional[str] = None
+    QUERY_EMBEDDING_CACHE_SIZE: int = 2048
+    QUERY_EMBEDDING_CACHE_TTL: int = 86400
+    QUERY_EMBEDDING_CACHE_PERSIST: bool = False
+    HYBRID_SEARCH: bool = False
+    HYBRID_ALPHA: float = 0.7
+    KEYWORD_INDEX_DIR: Optional[str] = "keyword_index"
+    VECTOR_QUERY_TIMEOUT: float = 3.0
+    PUBLICATION_NAMESPACES: bool = False
+    PUBLICATION_NAMESPACE_PREFIX: str = "pub-"
+    RETRIEVAL_FETCH_K: int = 20
+    RETRIEVAL_MMR_LAMBDA: float = 0.5
+    RETRIEVAL_SCORE_THRESHOLD: Optional[float] = None
+    RETRIEVAL_MAX_TOKENS: int = 1500
+    CONTEXT_FIELDS: str = "title,type,category_name,section_name"
+    TOOL_TIMEOUT: float = 20.0
+    TOOL_MAX_WORKERS: int = 8
+    GRAPH_CACHE_SIZE: int = 32
+    BLOCKING_EXECUTOR_WORKERS: int = 16
+    TOOL_PAYLOAD_MIN_BYTES: int = 2048
+    CONVERSATION_MEMORY: bool = True
+    MEMORY_MAX_TOKENS: int = 4000
+    MEMORY_SUMMARY_WORDS: int = 250
+    MEMORY_SUMMARY_MODEL: str = "azureai"
+    MEMORY_FOLD_WORKERS: int = 2
+    TOOL_PAYLOAD_CACHE_SIZE: int = 256
+    CHECKPOINT_MEMORY_TIER: bool = False
+    CHECKPOINT_MEMORY_THREADS: int = 1000
+    CHECKPOINT_DURABILITY: str = "sync"  # sync | async | latest; write-behind needs a long-lived process
+    CHECKPOINT_FLUSH_SIZE: int = 200
+    CHECKPOINT_FLUSH_INTERVAL: float = 1.0
+    CHECKPOINT_KEEP_LAST: int = 20
+    CHECKPOINT_TTL_DAYS: Optional[float] = None
+    CHECKPOINT_COMPACTION_BATCH_SIZE: int = 500
+    CHECKPOINT_COMPACTION_MAX_THREADS: Optional[int] = 1000
+    CHECKPOINT_COMPACTION_INTERVAL: float = 0  # seconds; 0 disables the background task
+    SPECULATIVE_PREFETCH: bool = False
+    SPECULATIVE_PREINJECT: bool = False
+    SPECULATIVE_MIN_SIMILARITY: float = 0.6
+    SEARCH_INDEX_WRITE_BEHIND: bool = False  # buffer SearchIndex writes; needs a long-lived process
+    SEARCH_INDEX_FLUSH_SIZE: int = 100
+    SEARCH_INDEX_FLUSH_INTERVAL: float = 2.0
+    SEARCH_CACHE_SIZE: int = 1024
+    SEARCH_CACHE_TTL: int = 3600
+    SEARCH_CACHE_GENERATION_CHECK_SECONDS: int = 30
+    EMBEDDING_ARCHIVE_DIR: Optional[str] = "embedding_archive"
+    VECTOR_BACKEND: str = "pinecone"
+    LOCAL_VECTOR_NAMESPACES: Optional[str] = None
+    LOCAL_VECTOR_DIR: str = "local_vectors"
+    LOCAL_VECTOR_HNSW: bool = False
+    UPLOAD_BATCH_SIZE: int = 100
+    UPLOAD_MAX_IN_FLIGHT: int = 4
+    UPLOAD_MAX_REQUESTS_PER_MIN: int = 120
+    UPLOAD_MAX_TOKENS_PER_MIN: int = 150000
 
 
 class DevConfig(GlobalConfig):
@@ -1,3 +1,4 @@
+import asyncio
 from time import time
 from pymongo import MongoClient
 from core.config import config
@@ -8,18 +9,28 @@ from fastapi.responses import HTMLResponse
 from api.routes import api_router_v1
 from core.initialize import set_environment_variables
 from core.mongoengine_connect import init_mongoengine
+from utilities.search_index_writer import search_index_writer
+from utilities.checkpoint_compaction import run_compaction_loop
+from utilities.llm.graph_factory import close_checkpointer
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.mongodb_client = MongoClient(config.MONGO_URI)
     app.database = app.mongodb_client[config.MONGO_DB]
     print("Connected to the MongoDB database!")
+    compaction = None
+    if config.CHECKPOINT_COMPACTION_INTERVAL:
+        compaction = asyncio.create_task(run_compaction_loop(config.CHECKPOINT_COMPACTION_INTERVAL))
     yield
+    if compaction is not None:
+        compaction.cancel()
+    # Drain buffered SearchIndex writes before the process exits
+    search_index_writer.close()
+    # Persist checkpoints still queued in the in-memory tier
+    close_checkpointer()
     app.mongodb_client.close()
 
 app = FastAPI(lifespan=lifespan)
-
-app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 html = f"""
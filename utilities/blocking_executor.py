@@ -0,0 +1,28 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from core.config import config
+
+# Bounded pool for the remaining blocking calls (mongoengine, sync SDKs) on async paths,
+# so they neither hold the event loop nor grow the default executor without limit.
+_executor = ThreadPoolExecutor(max_workers=config.BLOCKING_EXECUTOR_WORKERS, thread_name_prefix="blocking")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Await a blocking call run in the bounded executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def _log_failure(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        logging.error(f"Background call failed: {future.exception()!r}")
+
+
+def submit_blocking(func, *args, **kwargs) -> Future:
+    """Run a blocking call in the bounded executor without waiting for it; failures are logged."""
+    future = _executor.submit(func, *args, **kwargs)
+    future.add_done_callback(_log_failure)
+    return future
@@ -0,0 +1,165 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from bson import ObjectId
+
+from core.config import config
+from utilities.llm.graph_factory import get_mongo_client
+
+# Collection names used by MongoDBSaver
+CHECKPOINTS = "checkpoints"
+CHECKPOINT_WRITES = "checkpoint_writes"
+
+# Compaction runs can take minutes; keep them off the shared blocking executor
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-compaction")
+
+
+def _collections():
+    db = get_mongo_client()[os.environ['MONGO_DB']]
+    return db[CHECKPOINTS], db[CHECKPOINT_WRITES]
+
+
+def _bson_size(collection, query: dict) -> int:
+    """Total BSON size of the documents matching ``query``."""
+    result = list(collection.aggregate([
+        {"$match": query},
+        {"$group": {"_id": None, "bytes": {"$sum": {"$bsonSize": "$$ROOT"}}}},
+    ]))
+    return result[0]["bytes"] if result else 0
+
+
+def _delete(collections, query: dict, stats: dict, dry_run: bool):
+    for collection in collections:
+        stats["bytes"] += _bson_size(collection, query)
+        if dry_run:
+            stats[collection.name] += collection.count_documents(query)
+        else:
+            stats[collection.name] += collection.delete_many(query).deleted_count
+
+
+def _next_thread(checkpoints, after: Optional[str]) -> Optional[str]:
+    """Smallest thread_id greater than ``after``; served by the (thread_id, ...) index."""
+    query = {"thread_id": {"$gt": after}} if after is not None else {}
+    doc = checkpoints.find_one(query, {"thread_id": 1}, sort=[("thread_id", 1)])
+    return doc["thread_id"] if doc else None
+
+
+def _expire_threads(collections, thread_ids: list, stats: dict, dry_run: bool):
+    """Delete expired threads from the checkpoint collections, their history listing and summary."""
+    from utilities.database.models.history_listing import HistoryListing
+    from utilities.database.models.thread_summary import ThreadSummary
+    _delete(collections, {"thread_id": {"$in": thread_ids}}, stats, dry_run)
+    for model, key in ((HistoryListing, "history_listings"), (ThreadSummary, "thread_summaries")):
+        rows = model.objects(thread_id__in=thread_ids)
+        stats[key] += rows.count() if dry_run else rows.delete()
+    stats["expired_threads"] += len(thread_ids)
+
+
+def compact_checkpoints(
+    keep_last: int = 20,
+    ttl_days: Optional[float] = None,
+    batch_size: int = 500,
+    max_threads: Optional[int] = None,
+    dry_run: bool = False,
+    start_after: Optional[str] = None,
+) -> dict:
+    """
+    Prune the MongoDBSaver collections.
+
+    Threads are visited in thread_id order, one index lookup at a time, so no query
+    has to group the whole collection. A thread whose newest checkpoint is older than
+    ``ttl_days`` is removed entirely, along with its history listing and conversation
+    summary; the insert time comes from the ObjectId of the checkpoint document. Of
+    every other thread (and checkpoint namespace) only the newest ``keep_last``
+    checkpoints and their pending writes are kept. Checkpoint ids are time-ordered,
+    so "newest" is the highest id.
+
+    Args:
+        keep_last (int): Checkpoints kept per thread and namespace; 0 disables pruning.
+        ttl_days (float, optional): Expire threads without activity for this many days.
+        batch_size (int): Threads or checkpoint ids handled per delete.
+        max_threads (int, optional): Stop after visiting this many threads, to bound a
+            single run; the next run continues from ``last_thread_id``.
+        dry_run (bool): Only count what would be deleted.
+        start_after (str, optional): Resume after this thread_id.
+
+    Returns:
+        dict: Expired threads, pruned threads, deleted documents per collection, the
+            BSON bytes reclaimed and ``last_thread_id`` (None once every thread was visited).
+    """
+    checkpoints, writes = _collections()
+    collections = (checkpoints, writes)
+    stats = {
+        "expired_threads": 0, "pruned_threads": 0, CHECKPOINTS: 0, CHECKPOINT_WRITES: 0,
+        "history_listings": 0, "thread_summaries": 0, "bytes": 0, "dry_run": dry_run,
+    }
+    cutoff = ObjectId.from_datetime(datetime.utcnow() - timedelta(days=ttl_days)) if ttl_days else None
+
+    expired = []
+    visited = 0
+    thread_id = start_after
+    while max_threads is None or visited < max_threads:
+        thread_id = _next_thread(checkpoints, thread_id)
+        if thread_id is None:
+            break
+        visited += 1
+        namespaces = checkpoints.distinct("checkpoint_ns", {"thread_id": thread_id}) or [""]
+        newest = [
+            checkpoints.find_one({"thread_id": thread_id, "checkpoint_ns": ns}, {"_id": 1}, sort=[("checkpoint_id", -1)])
+            for ns in namespaces
+        ]
+        if cutoff is not None and max(doc["_id"] for doc in newest if doc) < cutoff:
+            expired.append(thread_id)
+            if len(expired) >= batch_size:
+                _expire_threads(collections, expired, stats, dry_run)
+                expired = []
+            continue
+        if not keep_last:
+            continue
+        pruned = False
+        for ns in namespaces:
+            scope = {"thread_id": thread_id, "checkpoint_ns": ns}
+            stale = [
+                doc["checkpoint_id"] for doc in
+                checkpoints.find(scope, {"checkpoint_id": 1}).sort("checkpoint_id", -1).skip(keep_last)
+            ]
+            for i in range(0, len(stale), batch_size):
+                _delete(collections, {**scope, "checkpoint_id": {"$in": stale[i:i + batch_size]}}, stats, dry_run)
+            pruned = pruned or bool(stale)
+        stats["pruned_threads"] += int(pruned)
+    if expired:
+        _expire_threads(collections, expired, stats, dry_run)
+
+    stats["last_thread_id"] = thread_id
+    logging.info(f"Checkpoint compaction: {stats}")
+    return stats
+
+
+async def run_compaction_loop(interval: float):
+    """
+    Compact the checkpoint collections every ``interval`` seconds (lifespan background task).
+
+    Runs on its own thread rather than the shared blocking executor; each run resumes
+    where the previous one stopped when CHECKPOINT_COMPACTION_MAX_THREADS bounds it.
+    """
+    loop = asyncio.get_running_loop()
+    start_after = None
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            stats = await loop.run_in_executor(_executor, functools.partial(
+                compact_checkpoints,
+                keep_last=config.CHECKPOINT_KEEP_LAST,
+                ttl_days=config.CHECKPOINT_TTL_DAYS,
+                batch_size=config.CHECKPOINT_COMPACTION_BATCH_SIZE,
+                max_threads=config.CHECKPOINT_COMPACTION_MAX_THREADS,
+                start_after=start_after,
+            ))
+            start_after = stats["last_thread_id"]
+        except Exception as e:
+            logging.error(f"Checkpoint compaction failed: {e}")
@@ -0,0 +1,27 @@
+import hashlib
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def source_prefix(source: str) -> str:
+    """Id prefix shared by every chunk of a source (file path, pdf_url, article url...)."""
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:16] + "#"
+
+
+def make_chunk_id(source: str, ordinal: int, text: str) -> str:
+    """
+    Deterministic vector id for a chunk.
+
+    Args:
+        source (str): Identifier of the chunk's source document.
+        ordinal (int): Position of the chunk within the source.
+        text (str): Chunk content.
+
+    Returns:
+        str: ``<source hash>#<ordinal>#<content hash>``; re-uploading the same chunk
+        overwrites the existing vector instead of adding a duplicate.
+    """
+    return f"{source_prefix(source)}{ordinal}#{content_hash(text)[:16]}"
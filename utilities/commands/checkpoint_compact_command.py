@@ -0,0 +1,43 @@
+import typer
+from rich.console import Console
+
+from core.config import config
+from utilities.checkpoint_compaction import CHECKPOINTS, CHECKPOINT_WRITES, compact_checkpoints
+from .base_command import BaseCommand
+
+console = Console()
+
+
+class CheckpointCompactCommand(BaseCommand):
+    """Command to prune old LangGraph checkpoints"""
+
+    def register(self, app: typer.Typer) -> None:
+        @app.command(name="compact-checkpoints")
+        def compact_checkpoints_command(
+            keep_last: int = typer.Option(config.CHECKPOINT_KEEP_LAST, help="Checkpoints kept per thread (0 keeps all)"),
+            ttl_days: float = typer.Option(config.CHECKPOINT_TTL_DAYS or 0, help="Delete threads inactive for this many days (0 disables)"),
+            batch_size: int = typer.Option(config.CHECKPOINT_COMPACTION_BATCH_SIZE, help="Threads or checkpoints deleted per request"),
+            max_threads: int = typer.Option(0, help="Stop after visiting this many threads (0 for no limit)"),
+            start_after: str = typer.Option("", help="Resume after this thread id"),
+            dry_run: bool = typer.Option(False, "--dry-run", help="Only report what would be deleted")
+        ):
+            """Keep the latest checkpoints per thread and expire abandoned threads"""
+            try:
+                result = compact_checkpoints(
+                    keep_last=keep_last,
+                    ttl_days=ttl_days or None,
+                    batch_size=batch_size,
+                    max_threads=max_threads or None,
+                    dry_run=dry_run,
+                    start_after=start_after or None
+                )
+                verb = "would be" if dry_run else "were"
+                console.print(f"[cyan]{result['expired_threads']}[/cyan] expired threads and [cyan]{result['pruned_threads']}[/cyan] pruned threads")
+                console.print(f"[cyan]{result[CHECKPOINTS]}[/cyan] checkpoints and [cyan]{result[CHECKPOINT_WRITES]}[/cyan] checkpoint writes {verb} deleted")
+                console.print(f"[cyan]{result['history_listings']}[/cyan] history listings and [cyan]{result['thread_summaries']}[/cyan] thread summaries {verb} deleted")
+                if result["last_thread_id"] is not None:
+                    console.print(f"[yellow]Stopped after thread {result['last_thread_id']}; continue with --start-after {result['last_thread_id']}[/yellow]")
+                console.print(f"[bold green]{result['bytes'] / (1024 * 1024):.2f} MiB {verb} reclaimed[/bold green]")
+            except Exception as e:
+                console.print(f"[bold red]Error during checkpoint compaction: {str(e)}[/bold red]")
+                raise typer.Exit(code=1)
@@ -0,0 +1,110 @@
+import logging
+from datetime import datetime
+
+import typer
+from rich.console import Console
+from rich.progress import track
+
+from core.mongoengine_connect import init_mongoengine
+from utilities.database.models.index_manifest import IndexManifest
+from utilities.keyword_index import get_keyword_index
+from utilities.search_cache import bump_index_generation
+from utilities.vectorstore import create_handler, publication_namespace
+from .base_command import BaseCommand
+
+console = Console()
+
+
+def migrate_to_publication_namespaces(source_namespace: str = "", batch_size: int = 100, keep_source: bool = False, dry_run: bool = False) -> dict:
+    """
+    Move content vectors into one namespace per publication.
+
+    Vectors are fetched with their values and metadata and upserted unchanged into
+    ``pub-<publication_id>``, so nothing is re-embedded. Vectors without a
+    publication_id stay where they are. Index manifests and the keyword index follow
+    the moved chunks.
+
+    Args:
+        source_namespace (str): Namespace currently holding the content ("" is the default namespace).
+        batch_size (int): Vectors fetched and upserted per request.
+        keep_source (bool): Leave the moved vectors in the source namespace as well.
+        dry_run (bool): Only count what would be moved.
+
+    Returns:
+        dict: Counts of moved and skipped vectors per target namespace.
+    """
+    init_mongoengine()
+    handler = create_handler(namespace=source_namespace or None)
+    ids = handler.list_ids(namespace=source_namespace)
+    console.print(f"[yellow]{len(ids)} vectors in namespace '{source_namespace}'[/yellow]")
+
+    moved = {}  # chunk id -> target namespace
+    per_namespace = {}
+    skipped = 0
+    for i in track(range(0, len(ids), batch_size), description="Migrating..."):
+        records = handler.fetch_records(ids[i:i + batch_size], namespace=source_namespace)
+        groups = {}
+        for record in records:
+            publication_id = record["metadata"].get("publication_id")
+            if publication_id in (None, ""):
+                skipped += 1
+                continue
+            groups.setdefault(publication_namespace(publication_id), []).append(record)
+        for namespace, group in groups.items():
+            per_namespace[namespace] = per_namespace.get(namespace, 0) + len(group)
+            moved.update((record["id"], namespace) for record in group)
+            if not dry_run:
+                handler._upsert(group, namespace=namespace)
+        if not dry_run and not keep_source:
+            handler.delete_ids([record["id"] for group in groups.values() for record in group], namespace=source_namespace)
+
+    if not dry_run and moved:
+        _move_manifests(source_namespace, moved, keep_source)
+        keyword_index = get_keyword_index()
+        if keyword_index is not None:
+            keyword_index.move(moved)
+            keyword_index.save()
+        bump_index_generation()
+
+    result = {"moved": len(moved), "skipped": skipped, "namespaces": per_namespace, "dry_run": dry_run}
+    logging.info(f"Publication namespace migration: {result}")
+    return result
+
+
+def _move_manifests(source_namespace: str, moved: dict, keep_source: bool):
+    """Re-scope manifests whose chunks all moved to the same publication namespace."""
+    now = datetime.utcnow()
+    for manifest in IndexManifest.objects(namespace=source_namespace):
+        targets = {moved.get(chunk_id) for chunk_id in manifest.chunks.keys()}
+        if len(targets) != 1 or None in targets:
+            continue
+        IndexManifest.objects(kind=manifest.kind, namespace=targets.pop(), source=manifest.source).update_one(
+            set__chunks=manifest.chunks,
+            set__updated_at=now,
+            upsert=True
+        )
+        if not keep_source:
+            manifest.delete()
+
+
+class PublicationNamespaceMigrateCommand(BaseCommand):
+    """Command to shard content vectors into per-publication namespaces"""
+
+    def register(self, app: typer.Typer) -> None:
+        @app.command()
+        def migrate_publication_namespaces(
+            source_namespace: str = typer.Option("", help="Namespace currently holding the content vectors"),
+            batch_size: int = typer.Option(100, help="Vectors fetched and upserted per request"),
+            keep_source: bool = typer.Option(False, "--keep-source", help="Do not delete the moved vectors from the source namespace"),
+            dry_run: bool = typer.Option(False, "--dry-run", help="Only report what would be moved")
+        ):
+            """Move content vectors into one namespace per publication (enable PUBLICATION_NAMESPACES afterwards)"""
+            try:
+                result = migrate_to_publication_namespaces(source_namespace, batch_size, keep_source, dry_run)
+                for namespace, count in sorted(result["namespaces"].items()):
+                    console.print(f"[cyan]{namespace}[/cyan]: {count} vectors")
+                verb = "would be moved" if dry_run else "moved"
+                console.print(f"[bold green]{result['moved']} vectors {verb}, {result['skipped']} without publication_id left in place[/bold green]")
+            except Exception as e:
+                console.print(f"[bold red]Error during namespace migration: {str(e)}[/bold red]")
+                raise typer.Exit(code=1)
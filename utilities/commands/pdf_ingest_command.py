@@ -7,7 +7,10 @@ from pathlib import Path
 from typing import List, Dict
 from .base_command import BaseCommand
 from core.mongo_connect import MongoConnect
-from utilities.vectorstore import PineconeVectorStoreHandler
+from utilities.vectorstore import create_handler, publication_namespace
+from core.config import config
+from utilities.index_sync import sync_sources
+from core.mongoengine_connect import init_mongoengine
 from rich.console import Console
 from rich.progress import track
 import logging
@@ -74,9 +77,10 @@ class PDFIngestCommand(BaseCommand):
             logging.error(f"Chunking failed: {str(e)}")
             raise
 
-    def process_pending_documents(self, batch_size: int = 10):
+    def process_pending_documents(self, batch_size: int = 10, purge_stale: bool = False):
         try:
-            self.vector_store = PineconeVectorStoreHandler()
+            init_mongoengine()
+            self.vector_store = create_handler()
             pending_docs = list(self.mongo_collection.find({"status": "pending"}).limit(batch_size))
             if not pending_docs:
                 print("No pending documents found. Retrying documents with error status...")
@@ -114,9 +118,15 @@ class PDFIngestCommand(BaseCommand):
                         
                         chunks = self.chunk_text(text_content, metadata)
                         
-                        # Upload to vector store
-                        self.vector_store.add_texts([chunk["text"] for chunk in chunks],
-                                                metadatas=[chunk["metadata"] for chunk in chunks])
+                        # Upload to vector store; chunk ids are derived from the pdf_url, so a
+                        # retry of an errored document overwrites its vectors in place
+                        sync_sources(
+                            self.vector_store,
+                            {doc['pdf_url']: [(chunk["text"], chunk["metadata"]) for chunk in chunks]},
+                            kind="pdf",
+                            namespace=publication_namespace(doc['publication_id']) if config.PUBLICATION_NAMESPACES else None,
+                            purge_stale=purge_stale
+                        )
                         
                         # Update status
                         self.update_status(doc['_id'], 'complete')
@@ -151,6 +161,7 @@ class PDFIngestCommand(BaseCommand):
         @app.command()
         def ingest_pdfs(
             batch_size: int = typer.Option(10, help="Number of documents to process"),
+            purge_stale: bool = typer.Option(False, "--purge-stale", help="Delete stale chunks of each PDF before uploading"),
             verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
         ):
             """Process pending PDFs and add them to the vector store"""
@@ -158,7 +169,7 @@ class PDFIngestCommand(BaseCommand):
                 if verbose:
                     console.print("[bold blue]Starting PDF ingestion process...[/bold blue]")
                 
-                self.process_pending_documents(batch_size)
+                self.process_pending_documents(batch_size, purge_stale=purge_stale)
                 
                 if verbose:
                     # display summary of processed documents
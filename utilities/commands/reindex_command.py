@@ -1,8 +1,14 @@
 import os
 import logging
 import typer
-from utilities.vectorstore import PineconeVectorStoreHandler
+from core.config import config
+from utilities.database.models.index_manifest import IndexManifest
+from utilities.vectorstore import create_handler, publication_namespace
 from utilities.textloader import load_documents_from_folder
+from utilities.index_sync import sync_sources, clear_manifests
+from utilities.search_cache import bump_index_generation
+from utilities.keyword_index import get_keyword_index
+from core.mongoengine_connect import init_mongoengine
 from rich.console import Console
 from rich.progress import track
 from .base_command import BaseCommand
@@ -15,12 +21,57 @@ def setup_logging():
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
 
-def execute_reindex(dataset_folder: str = "./dataset"):
+def group_chunks_by_source(docs, dataset_folder: str) -> dict:
+    """Group split documents by their source file (relative to the dataset folder), keeping chunk order."""
+    sources = {}
+    skipped = 0
+    for doc in docs:
+        if not doc.metadata.get("source"):
+            # Chunk ids and manifests are keyed by source; such a chunk cannot be tracked
+            skipped += 1
+            continue
+        source = os.path.relpath(doc.metadata["source"], dataset_folder)
+        sources.setdefault(source, []).append((doc.page_content, doc.metadata))
+    if skipped:
+        logging.warning(f"Skipped {skipped} chunks without a source")
+    return sources
+
+def group_sources_by_namespace(sources: dict) -> dict:
+    """
+    Split grouped sources by target namespace.
+
+    With PUBLICATION_NAMESPACES every source goes to the namespace of its chunks'
+    publication_id (the dataset folder name) and sources without one stay in the default
+    namespace. Namespaces that still hold dataset manifests but no longer have any
+    source get an empty group, so their chunks are pruned.
+    """
+    if not config.PUBLICATION_NAMESPACES:
+        return {None: sources}
+    groups = {}
+    for source, chunks in sources.items():
+        publication_id = chunks[0][1].get("publication_id") if chunks else None
+        namespace = publication_namespace(publication_id) if publication_id not in (None, "") else None
+        groups.setdefault(namespace, {})[source] = chunks
+    for namespace in IndexManifest.objects(kind="dataset").distinct("namespace"):
+        groups.setdefault(namespace or None, {})
+    return groups
+
+def execute_reindex(dataset_folder: str = "./dataset", full: bool = False):
     """
     Execute reindexing of all documents with detailed logging.
+
+    By default the index is updated incrementally: only new or changed chunks are
+    upserted and chunks whose source disappeared are deleted, so search keeps
+    serving throughout. ``full`` deletes and recreates the index first.
+
+    An index built before the manifest existed has random vector ids that an
+    incremental run can neither match nor delete, so every chunk would be uploaded a
+    second time. When the index has vectors but there is no dataset manifest, the
+    incremental run is refused; run once with ``full`` to migrate.
     
     Args:
         dataset_folder (str): Path to the dataset folder
+        full (bool): Delete and recreate the index instead of diffing against the manifest
     
     Returns:
         dict: Status of the reindexing operation
@@ -29,31 +80,63 @@ def execute_reindex(dataset_folder: str = "./dataset"):
     console.print("[bold blue]Starting reindexing process...[/bold blue]")
     
     try:
+        init_mongoengine()
         # Initialize vectorstore
-        console.print("[yellow]Initializing Pinecone vector store...[/yellow]")
-        vstorehandler = PineconeVectorStoreHandler()
+        console.print("[yellow]Initializing vector store...[/yellow]")
+        vstorehandler = create_handler()
         
-        # Reset index
-        console.print("[yellow]Resetting existing index...[/yellow]")
-        vstorehandler.reset_index()
+        if full:
+            # Reset index
+            console.print("[yellow]Resetting existing index...[/yellow]")
+            vstorehandler.reset_index()
+            clear_manifests()
+            vstorehandler.update_sparse_encoder([], reset=True)
+            keyword_index = get_keyword_index()
+            if keyword_index is not None:
+                keyword_index.clear()
+            bump_index_generation()
         
+        elif IndexManifest.objects(kind="dataset").first() is None and vstorehandler.has_vectors():
+            error_msg = (
+                "The index has vectors but no dataset manifest (it was built before incremental "
+                "reindexing); run `reindex --full` once to rebuild it with manifest-tracked ids"
+            )
+            console.print(f"[bold red]Error: {error_msg}[/bold red]")
+            logging.error(error_msg)
+            return {"status": "error", "message": error_msg}
+
         # Load and process documents
         console.print(f"[yellow]Loading documents from {dataset_folder}...[/yellow]")
         docs = load_documents_from_folder(dataset_folder)
         
         console.print(f"[green]Successfully loaded {len(docs)} document chunks[/green]")
         
-        # Create vector store
-        console.print("[yellow]Creating vector store and uploading documents in batches...[/yellow]")
-        total_batches = (len(docs) + 99) // 100  # Calculate total number of batches
-        with console.status(f"[cyan]Uploading {len(docs)} documents in {total_batches} batches...[/cyan]", spinner="dots"):
-            vectorstore = vstorehandler.get_vector_store(docs)
+        console.print("[yellow]Syncing changed chunks to the vector store...[/yellow]")
+        upserted, deleted, upload_stats = 0, 0, []
+        groups = group_sources_by_namespace(group_chunks_by_source(docs, dataset_folder))
+        with console.status(f"[cyan]Diffing and uploading {len(docs)} documents...[/cyan]", spinner="dots"):
+            for namespace, sources in groups.items():
+                # prune_missing is scoped to the namespace, so each group prunes only its own sources
+                sync_result = sync_sources(
+                    vstorehandler,
+                    sources,
+                    kind="dataset",
+                    namespace=namespace,
+                    prune_missing=True
+                )
+                upserted += sync_result["upserted"]
+                deleted += sync_result["deleted"]
+                if sync_result["upload_stats"]:
+                    upload_stats.append(sync_result["upload_stats"])
         
         console.print("[bold green]✓ Reindexing completed successfully![/bold green]")
         return {
             "status": "success",
             "message": "Data reindexed successfully",
-            "chunks_processed": len(docs)
+            "chunks_processed": len(docs),
+            "chunks_upserted": upserted,
+            "chunks_deleted": deleted,
+            "upload_stats": upload_stats[0] if len(upload_stats) == 1 else upload_stats or None
         }
         
     except Exception as e:
@@ -74,10 +157,11 @@ class ReindexCommand(BaseCommand):
         @app.command()
         def reindex(
             dataset_folder: str = typer.Option("./dataset", help="Path to the dataset folder"),
+            full: bool = typer.Option(False, "--full", help="Delete and recreate the index instead of an incremental sync (required once for indexes built without a manifest)"),
             verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
         ):
             """Reindex all documents in the database"""
-            result = execute_reindex(dataset_folder)
+            result = execute_reindex(dataset_folder, full=full)
             if result["status"] == "error":
                 raise typer.Exit(code=1)
             return result
\ No newline at end of file
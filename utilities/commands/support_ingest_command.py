@@ -2,7 +2,9 @@ import typer
 import csv
 from pathlib import Path
 from .base_command import BaseCommand
-from utilities.vectorstore import PineconeVectorStoreHandler
+from utilities.vectorstore import create_handler
+from utilities.index_sync import sync_sources
+from core.mongoengine_connect import init_mongoengine
 from rich.console import Console
 
 console = Console()
@@ -28,24 +30,35 @@ class SupportIngestCommand(BaseCommand):
                 # console.print(f"Processed article:[cyan] {metadata['title']} [/cyan]")
         return chunks
 
-    def ingest_support(self, verbose: bool = False):
-        self.vector_store = PineconeVectorStoreHandler()
+    def ingest_support(self, verbose: bool = False, purge_stale: bool = False):
+        init_mongoengine()
+        self.vector_store = create_handler(namespace="support")
         if verbose:
             console.print("[bold blue]Starting support articles ingestion...[/bold blue]")
         
         chunks = self.process_support_csv()
-        texts = [chunk["text"] for chunk in chunks]
-        metadatas = [chunk["metadata"] for chunk in chunks]
-        total_batches = 1  # All docs in one batch for now
-        with console.status(f"[cyan]Uploading {len(chunks)} documents in {total_batches} batches...[/cyan]", spinner="dots"):
-            self.vector_store.add_texts(texts, metadatas=metadatas, namespace="support")
+        # Group by article url so chunk ids are stable across runs
+        sources = {}
+        for chunk in chunks:
+            source = chunk["metadata"]["url"] or chunk["metadata"]["title"]
+            sources.setdefault(source, []).append((chunk["text"], chunk["metadata"]))
+        with console.status(f"[cyan]Uploading {len(chunks)} documents...[/cyan]", spinner="dots"):
+            sync_sources(
+                self.vector_store,
+                sources,
+                kind="support",
+                namespace="support",
+                prune_missing=True,
+                purge_stale=purge_stale
+            )
         if verbose:
             console.print(f"[bold green]Ingested {len(chunks)} support articles into Pinecone.[/bold green]")
 
     def register(self, app: typer.Typer) -> None:
         @app.command()
         def ingest_support(
+            purge_stale: bool = typer.Option(False, "--purge-stale", help="Delete stale chunks of each article before uploading"),
             verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
         ):
             """Ingest support articles from swo_support.csv into Pinecone vector store."""
-            self.ingest_support(verbose)
+            self.ingest_support(verbose, purge_stale=purge_stale)
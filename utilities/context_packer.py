@@ -0,0 +1,75 @@
+import json
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from core.config import config
+from utilities.upload_engine import get_token_encoding
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        _encoding = get_token_encoding("gpt-4o")
+    return _encoding
+
+
+def context_fields() -> List[str]:
+    return [field.strip() for field in (config.CONTEXT_FIELDS or "").split(",") if field.strip()]
+
+
+def compact_metadata(metadata: dict, fields: List[str]) -> dict:
+    """Keep the configured fields plus every citation URL (any key ending in "url")."""
+    return {
+        key: value for key, value in metadata.items()
+        if (key in fields or key.endswith("url")) and value not in (None, "")
+    }
+
+
+def pack_context(docs: List[Document], max_tokens: Optional[int] = None, fields: List[str] = None, min_chunk_tokens: int = 24) -> str:
+    """
+    Serialize search results compactly for a ToolMessage.
+
+    Metadata is reduced to the fields the answer needs and every distinct metadata
+    object is written once under "sources"; each result points at its source by index.
+    Content is added in rank order until ``max_tokens`` is spent, truncating the chunk
+    that crosses the budget (or stopping when fewer than ``min_chunk_tokens`` remain).
+
+    Args:
+        docs (list): Search results, best first.
+        max_tokens (int, optional): Token budget for the content. Defaults to
+            RETRIEVAL_MAX_TOKENS; 0 disables the budget.
+        fields (list, optional): Metadata fields to keep. Defaults to CONTEXT_FIELDS.
+        min_chunk_tokens (int): Smallest truncated chunk worth including.
+
+    Returns:
+        str: JSON like {"sources": [{...}], "results": [{"source": 0, "content": "..."}]}.
+    """
+    fields = context_fields() if fields is None else fields
+    budget = config.RETRIEVAL_MAX_TOKENS if max_tokens is None else max_tokens
+    encoding = _get_encoding()
+    sources, source_index, results = [], {}, []
+    used = 0
+    for doc in docs:
+        content = doc.page_content
+        if budget:
+            tokens = encoding.encode(content, disallowed_special=())
+            remaining = budget - used
+            if len(tokens) > remaining:
+                # Always include something from the best result
+                if results and remaining < min_chunk_tokens:
+                    break
+                tokens = tokens[:max(remaining, min_chunk_tokens)]
+                content = encoding.decode(tokens).rstrip() + " …"
+            used += len(tokens)
+        metadata = compact_metadata(doc.metadata or {}, fields)
+        key = json.dumps(metadata, sort_keys=True, default=str)
+        if key not in source_index:
+            source_index[key] = len(sources)
+            sources.append(metadata)
+        results.append({"source": source_index[key], "content": content})
+        if budget and used >= budget:
+            break
+    return json.dumps({"sources": sources, "results": results}, ensure_ascii=False, separators=(",", ":"), default=str)
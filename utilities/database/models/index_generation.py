@@ -0,0 +1,8 @@
+from mongoengine import Document, StringField, IntField, DateTimeField
+
+class IndexGeneration(Document):
+    name = StringField(required=True, unique=True)
+    value = IntField(default=0)
+    updated_at = DateTimeField(required=False)
+
+    meta = {'collection': 'index_generation'}
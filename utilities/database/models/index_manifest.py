@@ -0,0 +1,14 @@
+from mongoengine import Document, StringField, DictField, DateTimeField
+
+class IndexManifest(Document):
+    kind = StringField(required=True)
+    source = StringField(required=True, unique_with=['kind', 'namespace'])
+    namespace = StringField(default='')
+    # chunk id -> content hash of every vector currently uploaded for this source
+    chunks = DictField()
+    updated_at = DateTimeField(required=True)
+
+    meta = {
+        'collection': 'index_manifest',
+        'indexes': ['kind']
+    }
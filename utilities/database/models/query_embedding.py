@@ -0,0 +1,16 @@
+from mongoengine import Document, StringField, ListField, FloatField, DateTimeField
+from core.config import config
+
+class QueryEmbedding(Document):
+    key = StringField(required=True, unique=True)
+    model = StringField(required=True)
+    query = StringField(required=True)
+    embedding = ListField(FloatField(), required=True)
+    created_at = DateTimeField(required=True)
+
+    meta = {
+        'collection': 'query_embedding_cache',
+        'indexes': [
+            {'fields': ['created_at'], 'expireAfterSeconds': config.QUERY_EMBEDDING_CACHE_TTL}
+        ]
+    }
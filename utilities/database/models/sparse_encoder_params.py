@@ -0,0 +1,13 @@
+from mongoengine import Document, StringField, IntField, FloatField, DictField, DateTimeField
+
+class SparseEncoderParams(Document):
+    name = StringField(required=True, unique=True)
+    k1 = FloatField(default=1.2)
+    b = FloatField(default=0.75)
+    n_docs = IntField(default=0)
+    avg_doc_len = FloatField(default=0.0)
+    # Legacy inline vocabulary; document frequencies now live in SparseEncoderTerm
+    doc_freq = DictField()
+    updated_at = DateTimeField(required=False)
+
+    meta = {'collection': 'sparse_encoder_params'}
@@ -0,0 +1,10 @@
+from mongoengine import Document, StringField, IntField, LongField
+
+class SparseEncoderTerm(Document):
+    # Encoder name, as in SparseEncoderParams
+    name = StringField(required=True)
+    term = LongField(required=True, unique_with='name')
+    # Number of chunks containing the term
+    doc_freq = IntField(default=0)
+
+    meta = {'collection': 'sparse_encoder_terms'}
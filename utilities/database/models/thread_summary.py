@@ -0,0 +1,11 @@
+from mongoengine import Document, StringField, IntField, DateTimeField
+
+class ThreadSummary(Document):
+    thread_id = StringField(required=True, unique=True)
+    summary = StringField(default="")
+    # Id of the newest message folded into the summary
+    through_message_id = StringField(required=False)
+    folded_messages = IntField(default=0)
+    updated_at = DateTimeField(required=True)
+
+    meta = {'collection': 'thread_summaries'}
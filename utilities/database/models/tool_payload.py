@@ -0,0 +1,10 @@
+from mongoengine import Document, StringField, IntField, DateTimeField
+
+class ToolPayload(Document):
+    # sha256 of the content, so identical payloads are stored once
+    id = StringField(primary_key=True, db_field="_id")
+    content = StringField(required=True)
+    size = IntField()
+    created_at = DateTimeField(required=True)
+
+    meta = {'collection': 'tool_payloads'}
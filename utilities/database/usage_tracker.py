@@ -1,6 +1,7 @@
 from typing import Dict, Any
 from core.mongoengine_connect import init_mongoengine
 from utilities.database.models.tokenz import Tokenz
+from utilities.blocking_executor import submit_blocking
 
 class UsageTracker:
     def __init__(self):
@@ -18,3 +19,7 @@ class UsageTracker:
             model_name=model_name
         )
         doc.save()
+
+    def save_usage_background(self, thread_id: str, usage_details: Dict[str, Any], user_id: str, agent_type: str = "rag", model_name: str = None):
+        """Saves the usage details in the bounded executor, off the request's critical path."""
+        return submit_blocking(self.save_usage, thread_id, usage_details, user_id, agent_type=agent_type, model_name=model_name)
@@ -0,0 +1,194 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def embedding_key(model: str, dimension: int, text: str) -> str:
+    """Content address of an embedding: hash of (model, dimension, chunk text)."""
+    return hashlib.sha256(f"{model}\x00{dimension}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingArchive:
+    """
+    Append-only, content-addressed store of computed embeddings on local disk.
+
+    Vectors live in a row-major float32 matrix (``vectors.f32``) that is read through
+    a memory map; ``index.jsonl`` is the sidecar mapping each key to its row plus
+    any metadata recorded when the vector was archived. Appends hold an exclusive
+    ``flock`` on ``archive.lock``, so several processes can share one archive; use
+    ``get_embedding_archive`` to share one instance per path within a process.
+    """
+
+    def __init__(self, path: str, model: str, dimension: int):
+        """
+        Initialize the EmbeddingArchive.
+
+        Args:
+            path (str): Root folder of the archive.
+            model (str): Embedding model name; each model/dimension gets its own subfolder.
+            dimension (int): Dimensionality of the stored vectors.
+        """
+        self.model = model
+        self.dimension = dimension
+        self.path = os.path.join(path, f"{model}-{dimension}".replace("/", "_"))
+        os.makedirs(self.path, exist_ok=True)
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.index_path = os.path.join(self.path, "index.jsonl")
+        self.lock_path = os.path.join(self.path, "archive.lock")
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._index_offset = 0
+        self._matrix = None
+        with self._lock:
+            self._load_index()
+
+    def _load_index(self):
+        """Read the sidecar entries appended since the last call, by this or another process."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # entry still being written
+                self._index_offset += len(line)
+                if line.strip():
+                    entry = json.loads(line)
+                    self._rows[entry["key"]] = entry["row"]
+        # Drop sidecar entries whose vectors never made it to disk (interrupted write).
+        row_count = self._row_count_on_disk()
+        self._rows = {key: row for key, row in self._rows.items() if row < row_count}
+
+    def _row_count_on_disk(self) -> int:
+        if not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (4 * self.dimension)
+
+    def _get_matrix(self):
+        rows = self._row_count_on_disk()
+        if rows == 0:
+            return None
+        if self._matrix is None or self._matrix.shape[0] != rows:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        return self._matrix
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key: str):
+        return key in self._rows
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return the archived vectors for the keys that are present."""
+        with self._lock:
+            if any(key not in self._rows for key in keys):
+                self._load_index()
+            found = {key: self._rows[key] for key in keys if key in self._rows}
+            if not found:
+                return {}
+            matrix = self._get_matrix()
+            return {key: np.array(matrix[row]) for key, row in found.items()}
+
+    def put_many(self, keys: List[str], vectors: List[List[float]], metadatas: Optional[List[dict]] = None):
+        """Append vectors for keys not already archived."""
+        row_bytes = 4 * self.dimension
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Pick up what other processes archived since we last looked
+            self._load_index()
+            new_keys, new_vectors, new_metadatas = [], [], []
+            seen = set()
+            for i, key in enumerate(keys):
+                if key in self._rows or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_vectors.append(vectors[i])
+                new_metadatas.append(metadatas[i] if metadatas else None)
+            if not new_keys:
+                return
+
+            matrix = np.asarray(new_vectors, dtype=np.float32).reshape(len(new_keys), self.dimension)
+            with open(self.vectors_path, "ab") as f:
+                end = f.seek(0, os.SEEK_END)
+                if end % row_bytes:
+                    # Torn row from an interrupted append; no index entry points at it.
+                    end = f.truncate(end - end % row_bytes)
+                start = end // row_bytes
+                f.write(matrix.tobytes())
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                for offset, key in enumerate(new_keys):
+                    entry = {"key": key, "row": start + offset}
+                    if new_metadatas[offset]:
+                        entry["metadata"] = new_metadatas[offset]
+                    f.write(json.dumps(entry) + "\n")
+                    self._rows[key] = start + offset
+                self._index_offset = f.tell()
+
+
+_archives: Dict[str, EmbeddingArchive] = {}
+_archives_lock = threading.Lock()
+
+
+def get_embedding_archive(path: str, model: str, dimension: int) -> Optional[EmbeddingArchive]:
+    """
+    Process-wide EmbeddingArchive for a folder, model and dimension.
+
+    Returns:
+        EmbeddingArchive: The shared archive, or None if the folder cannot be created
+            (e.g. a read-only filesystem), in which case embeddings are not archived.
+    """
+    key = os.path.join(os.path.abspath(path), f"{model}-{dimension}")
+    with _archives_lock:
+        if key not in _archives:
+            try:
+                _archives[key] = EmbeddingArchive(path, model, dimension)
+            except OSError as e:
+                logging.warning(f"Embedding archive disabled, cannot use {path}: {e}")
+                return None
+        return _archives[key]
+
+
+class ArchivedEmbeddings(Embeddings):
+    """Embeddings wrapper that looks up the EmbeddingArchive before calling the embedding API."""
+
+    def __init__(self, embeddings: Embeddings, archive: EmbeddingArchive):
+        self.embeddings = embeddings
+        self.archive = archive
+        self.model = archive.model
+
+    def keys_for(self, texts: List[str]) -> List[str]:
+        return [embedding_key(self.model, self.archive.dimension, text) for text in texts]
+
+    def missing(self, texts: List[str]) -> List[str]:
+        """Return the texts that would still have to be sent to the embedding API."""
+        return [text for text, key in zip(texts, self.keys_for(texts)) if key not in self.archive]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = self.keys_for(texts)
+        archived = self.archive.get_many(keys)
+        pending = [i for i, key in enumerate(keys) if key not in archived]
+        if pending:
+            computed = self.embeddings.embed_documents([texts[i] for i in pending])
+            self.archive.put_many(
+                [keys[i] for i in pending],
+                computed,
+                metadatas=[{"chars": len(texts[i])} for i in pending]
+            )
+            for i, vector in zip(pending, computed):
+                archived[keys[i]] = vector
+        logging.info(f"Embedding archive: {len(texts) - len(pending)} hits, {len(pending)} embedded")
+        return [list(map(float, archived[key])) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from core.config import config
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share a cache entry."""
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache of query embeddings with TTL eviction and an optional Mongo tier."""
+
+    def __init__(self, max_size: int = 2048, ttl: int = 86400, persist: bool = False):
+        """
+        Initialize the QueryEmbeddingCache.
+
+        Args:
+            max_size (int): Maximum number of embeddings kept in memory.
+            ttl (int): Seconds after which an entry is considered stale.
+            persist (bool): Whether to read through / write through to the Mongo tier.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist = persist
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+
+    @staticmethod
+    def make_key(model: str, query: str) -> str:
+        return hashlib.sha256(f"{model}\x00{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        """Return the cached embedding for (model, query) or None."""
+        key = self.make_key(model, query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, embedding = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+
+        embedding = self._get_persistent(key) if self.persist else None
+        with self._lock:
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.persistent_hits += 1
+            self._store(key, embedding, now)
+        return embedding
+
+    def set(self, model: str, query: str, embedding: List[float]):
+        """Store the embedding for (model, query)."""
+        key = self.make_key(model, query)
+        with self._lock:
+            self._store(key, embedding, time.monotonic())
+        if self.persist:
+            self._set_persistent(key, model, query, embedding)
+
+    def _store(self, key: str, embedding: List[float], stored_at: float):
+        self._entries[key] = (stored_at, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _get_persistent(self, key: str) -> Optional[List[float]]:
+        from utilities.database.models.query_embedding import QueryEmbedding
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+            record = QueryEmbedding.objects(key=key, created_at__gte=cutoff).only("embedding").first()
+            return list(record.embedding) if record else None
+        except Exception as e:
+            logging.error(f"Failed to read query embedding cache: {e}")
+            return None
+
+    def _set_persistent(self, key: str, model: str, query: str, embedding: List[float]):
+        from utilities.database.models.query_embedding import QueryEmbedding
+        try:
+            QueryEmbedding.objects(key=key).update_one(
+                set__model=model,
+                set__query=normalize_query(query),
+                set__embedding=list(embedding),
+                set__created_at=datetime.utcnow(),
+                upsert=True
+            )
+        except Exception as e:
+            logging.error(f"Failed to write query embedding cache: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.persistent_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.persistent_hits) / lookups if lookups else 0.0,
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_size=config.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl=config.QUERY_EMBEDDING_CACHE_TTL,
+    persist=config.QUERY_EMBEDDING_CACHE_PERSIST,
+)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that serves embed_query from the query embedding cache."""
+
+    def __init__(self, embeddings: Embeddings, cache: QueryEmbeddingCache = None):
+        self.embeddings = embeddings
+        self.cache = cache or query_embedding_cache
+        self.model = getattr(embeddings, "model", embeddings.__class__.__name__)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        embedding = self.cache.get(self.model, text)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(text)
+            self.cache.set(self.model, text, embedding)
+        return embedding
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def _split_cached(self, texts: List[str]):
+        embeddings = [self.cache.get(self.model, text) for text in texts]
+        return embeddings, [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+    def _embed_many(self, texts: List[str]) -> List[List[float]]:
+        embed = getattr(self.embeddings, "embed_queries", self.embeddings.embed_documents)
+        return embed(texts)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries, sending every cache miss in a single embedding request."""
+        embeddings, misses = self._split_cached(texts)
+        if misses:
+            for i, embedding in zip(misses, self._embed_many([texts[i] for i in misses])):
+                embeddings[i] = embedding
+                self.cache.set(self.model, texts[i], embedding)
+        return embeddings
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        embeddings, misses = self._split_cached(texts)
+        if misses:
+            aembed = getattr(self.embeddings, "aembed_queries", self.embeddings.aembed_documents)
+            for i, embedding in zip(misses, await aembed([texts[i] for i in misses])):
+                embeddings[i] = embedding
+                self.cache.set(self.model, texts[i], embedding)
+        return embeddings
+
+    async def aembed_query(self, text: str) -> List[float]:
+        embedding = self.cache.get(self.model, text)
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(text)
+            self.cache.set(self.model, text, embedding)
+        return embedding
@@ -0,0 +1,126 @@
+import logging
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from rich.console import Console
+
+from utilities.chunk_ids import content_hash, make_chunk_id, source_prefix
+from utilities.database.models.index_manifest import IndexManifest
+from utilities.keyword_index import get_keyword_index
+from utilities.search_cache import bump_index_generation
+
+console = Console()
+
+
+def sync_sources(
+    handler,
+    sources: Dict[str, List[Tuple[str, dict]]],
+    kind: str,
+    namespace: str = None,
+    prune_missing: bool = False,
+    purge_stale: bool = False,
+) -> dict:
+    """
+    Bring the vector index in line with the given sources using the index manifest.
+
+    Only chunks whose id is not yet recorded for their source are embedded and
+    upserted; ids recorded for a source but no longer produced by it are deleted.
+
+    Args:
+        handler: PineconeVectorStoreHandler to write to.
+        sources (dict): Source id -> ordered list of (chunk text, metadata).
+        kind (str): Manifest scope, e.g. "dataset", "pdf" or "support".
+        namespace (str, optional): Target namespace.
+        prune_missing (bool): Also delete every source of this kind/namespace that is
+            absent from ``sources`` (use when ``sources`` is the complete corpus).
+        purge_stale (bool): Before uploading, list each source's vectors by id prefix and
+            delete those not produced by the current chunks, including ones missing
+            from the manifest.
+
+    Returns:
+        dict: Counts of sources, upserted, deleted and unchanged chunks plus upload stats.
+    """
+    ns = namespace or ""
+    manifests = {m.source: m for m in IndexManifest.objects(kind=kind, namespace=ns, source__in=list(sources.keys()))}
+
+    texts, metadatas, ids = [], [], []
+    stale_ids = []
+    new_chunks = {}
+    unchanged = 0
+    for source, chunks in sources.items():
+        previous = manifests[source].chunks if source in manifests else {}
+        current = {}
+        for ordinal, (text, metadata) in enumerate(chunks):
+            chunk_id = make_chunk_id(source, ordinal, text)
+            current[chunk_id] = content_hash(text)
+            if chunk_id in previous:
+                unchanged += 1
+                continue
+            texts.append(text)
+            metadatas.append(metadata)
+            ids.append(chunk_id)
+        stale_ids.extend(chunk_id for chunk_id in previous if chunk_id not in current)
+        new_chunks[source] = current
+
+    removed_sources = []
+    if prune_missing:
+        for manifest in IndexManifest.objects(kind=kind, namespace=ns, source__nin=list(sources.keys())):
+            stale_ids.extend(manifest.chunks.keys())
+            removed_sources.append(manifest)
+
+    if texts or stale_ids:
+        # Before the deletes below, while the removed chunks can still be fetched
+        handler.update_sparse_encoder(texts, removed_ids=stale_ids, namespace=namespace)
+
+    purged = 0
+    if purge_stale:
+        for source, chunks in new_chunks.items():
+            purged += handler.purge_source(source, keep_ids=list(chunks.keys()), namespace=namespace)
+        # Purging already removed the stale ids of these sources.
+        stale_ids = [chunk_id for manifest in removed_sources for chunk_id in manifest.chunks.keys()]
+
+    upload_stats = handler.add_texts(texts, metadatas=metadatas, namespace=namespace, ids=ids) if texts else None
+    if stale_ids:
+        handler.delete_ids(stale_ids, namespace=namespace)
+
+    now = datetime.utcnow()
+    for source, chunks in new_chunks.items():
+        IndexManifest.objects(kind=kind, namespace=ns, source=source).update_one(
+            set__chunks=chunks,
+            set__updated_at=now,
+            upsert=True
+        )
+    for manifest in removed_sources:
+        manifest.delete()
+    keyword_index = get_keyword_index()
+    if keyword_index is not None and (texts or stale_ids or purge_stale):
+        # Mirror the same chunk ids into the local BM25 index
+        keyword_index.upsert(ids, texts, metadatas, namespace=namespace)
+        keyword_index.delete(stale_ids)
+        if purge_stale:
+            for source, chunks in new_chunks.items():
+                keyword_index.delete_prefix(source_prefix(source), keep_ids=list(chunks.keys()))
+        keyword_index.save()
+    if texts or stale_ids or purged:
+        bump_index_generation()
+
+    result = {
+        "sources": len(sources),
+        "removed_sources": len(removed_sources),
+        "upserted": len(texts),
+        "deleted": len(stale_ids) + purged,
+        "unchanged": unchanged,
+        "upload_stats": upload_stats,
+    }
+    logging.info(f"Index sync ({kind}): {result}")
+    console.print(
+        f"[green]{result['upserted']} chunks upserted, {result['deleted']} deleted, "
+        f"{result['unchanged']} unchanged across {result['sources']} sources[/green]"
+    )
+    return result
+
+
+def clear_manifests(kind: str = None):
+    """Forget manifest entries, e.g. after the index has been deleted and recreated."""
+    query = IndexManifest.objects(kind=kind) if kind else IndexManifest.objects()
+    query.delete()
@@ -0,0 +1,299 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from core.config import config
+from utilities.local_vectorstore import matches_filter
+from utilities.sparse_encoder import term_index, tokenize
+
+
+class KeywordIndex:
+    """
+    On-disk BM25 inverted index over ingested chunks.
+
+    ``chunks.jsonl`` is an append-only log of chunks and tombstones used by writers.
+    ``save()`` rebuilds the postings as flat arrays (sorted term ids, offsets, doc rows,
+    term frequencies) plus per-row document lengths and publication/namespace codes,
+    stored as ``.npy`` files that query processes memory-map, next to the compacted
+    chunk list the row numbers refer to. Every save writes a new generation directory
+    and then atomically replaces the ``version`` file naming it, so readers only ever
+    see the arrays and chunks of one generation, and nothing they mapped is modified.
+    """
+
+    ARRAYS = ("terms", "offsets", "postings", "tfs", "doc_lens", "publications", "namespaces")
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        os.makedirs(path, exist_ok=True)
+        self.chunks_path = os.path.join(path, "chunks.jsonl")
+        self.version_path = os.path.join(path, "version")
+        self._lock = threading.RLock()
+        self._chunks = None  # row -> {"id", "text", "metadata", "namespace"}, loaded lazily
+        self._rows = {}
+        self._arrays = {}
+        self._codes = {"publications": {}, "namespaces": {}}
+        self._published = []  # row -> chunk of the loaded generation
+        self._version = None
+
+    # --- writes -----------------------------------------------------------------
+
+    def _load_chunks(self):
+        if self._chunks is not None:
+            return
+        self._chunks, self._rows = [], {}
+        if not os.path.exists(self.chunks_path):
+            return
+        with open(self.chunks_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self._remove_row(record["id"])
+                if not record.get("deleted"):
+                    self._rows[record["id"]] = len(self._chunks)
+                    self._chunks.append(record)
+
+    def _remove_row(self, chunk_id: str):
+        row = self._rows.pop(chunk_id, None)
+        if row is not None:
+            self._chunks[row] = None
+
+    def upsert(self, ids: List[str], texts: List[str], metadatas: List[dict], namespace: str = None):
+        with self._lock:
+            self._load_chunks()
+            with open(self.chunks_path, "a", encoding="utf-8") as f:
+                for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                    record = {"id": chunk_id, "text": text, "metadata": metadata or {}, "namespace": namespace or ""}
+                    self._remove_row(chunk_id)
+                    self._rows[chunk_id] = len(self._chunks)
+                    self._chunks.append(record)
+                    f.write(json.dumps(record) + "\n")
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self._load_chunks()
+            with open(self.chunks_path, "a", encoding="utf-8") as f:
+                for chunk_id in ids:
+                    if chunk_id in self._rows:
+                        self._remove_row(chunk_id)
+                        f.write(json.dumps({"id": chunk_id, "deleted": True}) + "\n")
+
+    def delete_prefix(self, prefix: str, keep_ids: List[str] = None):
+        with self._lock:
+            self._load_chunks()
+            keep = set(keep_ids or [])
+            self.delete([chunk_id for chunk_id in self._rows if chunk_id.startswith(prefix) and chunk_id not in keep])
+
+    def move(self, namespaces: dict):
+        """Reassign chunks to new namespaces, given as chunk id -> namespace."""
+        with self._lock:
+            self._load_chunks()
+            groups = {}
+            for chunk_id, namespace in namespaces.items():
+                if chunk_id in self._rows:
+                    groups.setdefault(namespace, []).append(self._chunks[self._rows[chunk_id]])
+            for namespace, chunks in groups.items():
+                self.upsert([c["id"] for c in chunks], [c["text"] for c in chunks], [c["metadata"] for c in chunks], namespace=namespace)
+
+    def clear(self):
+        """Drop every chunk, e.g. after the vector index was deleted and recreated."""
+        with self._lock:
+            self._chunks, self._rows = [], {}
+            if os.path.exists(self.chunks_path):
+                os.remove(self.chunks_path)
+            self.save()
+
+    def save(self):
+        """Compact the chunk log and rebuild the array-backed postings."""
+        with self._lock:
+            self._load_chunks()
+            chunks = [chunk for chunk in self._chunks if chunk is not None]
+            with open(self.chunks_path + ".tmp", "w", encoding="utf-8") as f:
+                for chunk in chunks:
+                    f.write(json.dumps(chunk) + "\n")
+            os.replace(self.chunks_path + ".tmp", self.chunks_path)
+            self._chunks = chunks
+            self._rows = {chunk["id"]: row for row, chunk in enumerate(chunks)}
+
+            term_rows, term_tfs, doc_lens = {}, {}, np.zeros(len(chunks), dtype=np.int32)
+            for row, chunk in enumerate(chunks):
+                tokens = tokenize(chunk["text"])
+                doc_lens[row] = len(tokens)
+                for index, tf in Counter(term_index(token) for token in tokens).items():
+                    term_rows.setdefault(index, []).append(row)
+                    term_tfs.setdefault(index, []).append(tf)
+            terms = np.array(sorted(term_rows), dtype=np.int64)
+            lengths = np.array([len(term_rows[int(t)]) for t in terms], dtype=np.int64)
+            offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+            postings = np.array([row for t in terms for row in term_rows[int(t)]], dtype=np.int32)
+            tfs = np.array([tf for t in terms for tf in term_tfs[int(t)]], dtype=np.float32)
+
+            codes = {"publications": {}, "namespaces": {}}
+            publications = np.array([
+                codes["publications"].setdefault(str(chunk["metadata"].get("publication_id", "")), len(codes["publications"]))
+                for chunk in chunks
+            ], dtype=np.int32)
+            namespaces = np.array([
+                codes["namespaces"].setdefault(chunk.get("namespace", ""), len(codes["namespaces"]))
+                for chunk in chunks
+            ], dtype=np.int32)
+            arrays = {
+                "terms": terms, "offsets": offsets, "postings": postings, "tfs": tfs, "doc_lens": doc_lens,
+                "publications": publications, "namespaces": namespaces,
+            }
+            version = uuid.uuid4().hex
+            staging = os.path.join(self.path, f"{version}.tmp")
+            os.makedirs(staging)
+            for name, array in arrays.items():
+                np.save(os.path.join(staging, f"{name}.npy"), array)
+            with open(os.path.join(staging, "codes.json"), "w", encoding="utf-8") as f:
+                json.dump(codes, f)
+            with open(os.path.join(staging, "chunks.jsonl"), "w", encoding="utf-8") as f:
+                for chunk in chunks:
+                    f.write(json.dumps(chunk) + "\n")
+            os.replace(staging, os.path.join(self.path, version))
+            # Publish the generation last; readers switch on the next query
+            with open(self.version_path + ".tmp", "w") as f:
+                f.write(version)
+            os.replace(self.version_path + ".tmp", self.version_path)
+            self._version = None
+            self._remove_old_generations(version)
+
+    def _remove_old_generations(self, current: str):
+        # Unlinking files other processes still map is safe; the mappings stay valid
+        for name in os.listdir(self.path):
+            generation = os.path.join(self.path, name)
+            if name != current and os.path.isdir(generation):
+                shutil.rmtree(generation, ignore_errors=True)
+
+    # --- reads ------------------------------------------------------------------
+
+    def _read_version(self) -> Optional[str]:
+        if not os.path.exists(self.version_path):
+            return None
+        with open(self.version_path) as f:
+            return f.read()
+
+    def _load_generation(self, version: str):
+        generation = os.path.join(self.path, version)
+        arrays = {name: np.load(os.path.join(generation, f"{name}.npy"), mmap_mode="r") for name in self.ARRAYS}
+        with open(os.path.join(generation, "codes.json"), encoding="utf-8") as f:
+            codes = json.load(f)
+        with open(os.path.join(generation, "chunks.jsonl"), encoding="utf-8") as f:
+            published = [json.loads(line) for line in f if line.strip()]
+        self._arrays, self._codes, self._published, self._version = arrays, codes, published, version
+
+    def _ensure_loaded(self) -> bool:
+        for _ in range(3):
+            version = self._read_version()
+            if version is None:
+                return False
+            if version == self._version:
+                return True
+            try:
+                self._load_generation(version)
+                return True
+            except FileNotFoundError:
+                # Removed by a newer save between reading the version and loading it, or
+                # written by the older flat layout; re-read the version
+                continue
+        logging.error(f"Keyword index generation {version} not found in {self.path}, run a reindex")
+        return self._version is not None
+
+    def _chunk_at(self, row: int) -> dict:
+        return self._published[row]
+
+    def search_with_score(self, query: str, k: int = 3, filter: Optional[dict] = None, namespace: str = None,
+                          namespaces: List[str] = None) -> List[Tuple[Document, float]]:
+        """
+        BM25 search. ``publication_id`` conditions ($in / equality) and the namespace (or the
+        list of ``namespaces``) are applied on the arrays; any other filter keys are checked
+        on the candidate metadata.
+        """
+        with self._lock:
+            if not self._ensure_loaded():
+                return []
+            arrays = self._arrays
+            n_docs = len(arrays["doc_lens"])
+            if n_docs == 0:
+                return []
+            query_terms = np.array(sorted({term_index(token) for token in tokenize(query)}), dtype=np.int64)
+            positions = np.searchsorted(arrays["terms"], query_terms)
+            positions = positions[positions < len(arrays["terms"])]
+            positions = positions[np.isin(arrays["terms"][positions], query_terms)]
+
+            scores = np.zeros(n_docs, dtype=np.float32)
+            avg_doc_len = float(np.mean(arrays["doc_lens"])) or 1.0
+            for position in positions:
+                start, end = arrays["offsets"][position], arrays["offsets"][position + 1]
+                rows = np.asarray(arrays["postings"][start:end])
+                tf = np.asarray(arrays["tfs"][start:end])
+                df = end - start
+                idf = np.log((n_docs - df + 0.5) / (df + 0.5) + 1.0)
+                norm = self.k1 * (1 - self.b + self.b * arrays["doc_lens"][rows] / avg_doc_len)
+                np.add.at(scores, rows, idf * tf * (self.k1 + 1) / (tf + norm))
+
+            mask = scores > 0
+            namespace_codes = [
+                self._codes["namespaces"][name] for name in (namespaces or [namespace or ""]) if name in self._codes["namespaces"]
+            ]
+            if not namespace_codes:
+                return []
+            mask &= np.isin(np.asarray(arrays["namespaces"]), namespace_codes)
+
+            filter = dict(filter or {})
+            publication_filter = filter.pop("publication_id", None)
+            if publication_filter is not None:
+                wanted = publication_filter.get("$in", []) if isinstance(publication_filter, dict) else [publication_filter]
+                codes = [self._codes["publications"][str(p)] for p in wanted if str(p) in self._codes["publications"]]
+                mask &= np.isin(np.asarray(arrays["publications"]), codes)
+
+            candidates = np.flatnonzero(mask)
+            if len(candidates) == 0:
+                return []
+            take = min(len(candidates), k * 5 if filter else k)
+            top = candidates[np.argpartition(-scores[candidates], take - 1)[:take]]
+            top = top[np.argsort(-scores[top], kind="stable")]
+
+            results = []
+            for row in top:
+                chunk = self._chunk_at(int(row))
+                if chunk is None or not matches_filter(chunk["metadata"], filter):
+                    continue
+                results.append((Document(page_content=chunk["text"], metadata=dict(chunk["metadata"]), id=chunk["id"]), float(scores[row])))
+                if len(results) >= k:
+                    break
+            return results
+
+    def search(self, query: str, k: int = 3, filter: Optional[dict] = None, namespace: str = None, namespaces: List[str] = None) -> List[Document]:
+        return [doc for doc, _ in self.search_with_score(query, k=k, filter=filter, namespace=namespace, namespaces=namespaces)]
+
+
+_keyword_index = None
+_keyword_index_lock = threading.Lock()
+
+
+def get_keyword_index() -> Optional[KeywordIndex]:
+    """Process-wide KeywordIndex, or None when KEYWORD_INDEX_DIR is not configured."""
+    global _keyword_index
+    if not config.KEYWORD_INDEX_DIR:
+        return None
+    if _keyword_index is None:
+        with _keyword_index_lock:
+            if _keyword_index is None:
+                try:
+                    _keyword_index = KeywordIndex(config.KEYWORD_INDEX_DIR)
+                except Exception as e:
+                    logging.error(f"Failed to open keyword index: {e}")
+                    return None
+    return _keyword_index
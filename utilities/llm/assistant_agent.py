@@ -1,24 +1,27 @@
 import json
 import logging
 from typing import Any, Dict
-from pymongo import MongoClient
-import os
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage, ToolMessage, message_chunk_to_message
 from langgraph.graph import START, END, MessagesState, StateGraph
-from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.checkpoint.mongodb import MongoDBSaver
+from langgraph.prebuilt import tools_condition
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 
 from utilities.database.usage_tracker import UsageTracker
+from utilities.blocking_executor import run_blocking
 from utilities.helper import get_message_token_usage
 from utilities.llm.ai_factory import AIFactory
+from utilities.llm.concurrent_tool_node import ConcurrentToolNode
+from utilities.llm.graph_factory import get_graph, prompt_key
+from utilities.llm.speculative_prefetch import SpeculativePrefetcher, thread_key
+from utilities.llm.conversation_memory import conversation_memory
+from utilities.payload_store import payload_store
+from core.config import config as app_config
 
 
 
 
 class AssistantAgent:
-    def __init__(self, system_prompt: str, tools: list, llm, info: dict = None):
+    def __init__(self, system_prompt: str, tools: list, llm, info: dict = None, speculative: bool = None, preinject: bool = None):
         """
         Initializes the GraphAgent.
 
@@ -27,53 +30,133 @@ class AssistantAgent:
             tools: A list of tool functions.
             llm: The language model instance.
             info: Optional dictionary containing additional information like publication_id.
+                It is passed to the graph in the run config (see make_config), so the
+                compiled graph can be shared by every request.
+            speculative: Start content_search/support_search on the raw user message while the
+                first LLM call is in flight. Defaults to SPECULATIVE_PREFETCH.
+            preinject: Run those searches before the first LLM call and put their results in the
+                conversation, skipping the tool-decision round trip. Defaults to SPECULATIVE_PREINJECT.
         """
         self.system_prompt = system_prompt
         self.tools = tools
         self.llm = llm
         self.info = info or {}
-        self.graph = self._build_graph()
+        self.speculative = app_config.SPECULATIVE_PREFETCH if speculative is None else speculative
+        self.preinject = app_config.SPECULATIVE_PREINJECT if preinject is None else preinject
         self.usage_tracker = UsageTracker()
+        self.graph = get_graph(
+            ("assistant", self.llm, tuple(tool.name for tool in self.tools), prompt_key(self.system_prompt), self.speculative, self.preinject),
+            self._build_graph
+        )
         
 
     def save_token_usage(self, thread_id: str, token_usage_details: Dict[str, Any], user_id: str):
         """Saves the token usage details using UsageTracker."""
         self.usage_tracker.save_usage(thread_id, token_usage_details, user_id, agent_type="assistant", model_name = self.llm)
+
+    def save_token_usage_background(self, thread_id: str, token_usage_details: Dict[str, Any], user_id: str):
+        """Saves the token usage details in the bounded executor without blocking the event loop."""
+        self.usage_tracker.save_usage_background(thread_id, token_usage_details, user_id, agent_type="assistant", model_name = self.llm)
     
 
+    def make_config(self, thread_id: str) -> dict:
+        """Run config carrying the thread id and this request's info to the shared graph."""
+        return {
+            "configurable": {"thread_id": thread_id, "info": self.info},
+            "recursion_limit": 1500,
+        }
+
+    @staticmethod
+    def run_info(config: RunnableConfig) -> dict:
+        return ((config or {}).get("configurable") or {}).get("info") or {}
+
     def _build_graph(self):
-        """Builds the LangGraph execution graph."""
-        sys_msg = SystemMessage(content=self.system_prompt)
+        """Builds the LangGraph execution graph (compiled and cached by the graph factory)."""
+        system_prompt = self.system_prompt
+        prefetcher = SpeculativePrefetcher(self.tools) if (self.speculative or self.preinject) and self.tools else None
+        prefetcher = prefetcher if prefetcher and prefetcher.tools_by_name else None
         logging.info(f"tools: {self.tools}")
         llm_with_tools = AIFactory.get_tool(self.llm, tools=self.tools)
 
 
-        def assistant(state: MessagesState):
+        tool_node = ConcurrentToolNode(self.tools, prefetcher=prefetcher if not self.preinject else None)
+        speculate = prefetcher is not None and not self.preinject
+
+        def prepare(state: MessagesState, config: RunnableConfig):
+            info = self.run_info(config)
+            sys_msg = SystemMessage(content=system_prompt + info.get("prompt_note", ""))
             # print("Prompt ::::::::::: ", [sys_msg] + state["messages"])
-            aimessage = [llm_with_tools.use([sys_msg] + self.get_last_interaction(state["messages"]))]
-            messageUseageDetails = get_message_token_usage(aimessage[0])
+            if speculate and isinstance(state["messages"][-1], HumanMessage):
+                # Run the searches the prompt requires while the model decides on its tool calls
+                prefetcher.start(thread_key(config), self._message_text(state["messages"][-1]), info)
+            return info, sys_msg
+
+        def context(sys_msg: SystemMessage, messages: list, config: RunnableConfig) -> list:
+            if app_config.CONVERSATION_MEMORY:
+                # Running summary of the folded turns plus the recent ones, within MEMORY_MAX_TOKENS
+                summary, messages = conversation_memory.build_prompt((config.get("configurable") or {}).get("thread_id"), messages)
+                if summary:
+                    sys_msg = SystemMessage(content=sys_msg.content + "\n\nSummary of the earlier conversation:\n" + summary)
+            else:
+                messages = self.get_last_interaction(messages)
+            # Only the payloads of the messages sent are loaded for the model
+            return [sys_msg] + payload_store.resolve_messages(messages)
+
+        def finish(aimessage, info: dict, config: RunnableConfig, save_usage):
+            if speculate and not aimessage.tool_calls:
+                prefetcher.discard(thread_key(config))
+            messageUseageDetails = get_message_token_usage(aimessage)
             if messageUseageDetails is not None:
-                self.save_token_usage(self.info.get("thread_id"), messageUseageDetails, self.info.get("user_id"))
-            return {"messages": aimessage}
-
-
+                save_usage(info.get("thread_id"), messageUseageDetails, info.get("user_id"))
+            return {"messages": [aimessage]}
+
+        def assistant(state: MessagesState, config: RunnableConfig):
+            info, sys_msg = prepare(state, config)
+            prompt = context(sys_msg, state["messages"], config)
+            return finish(llm_with_tools.use(prompt), info, config, self.save_token_usage)
+
+        async def aassistant(state: MessagesState, config: RunnableConfig):
+            info, sys_msg = prepare(state, config)
+            prompt = await run_blocking(context, sys_msg, state["messages"], config)
+            # Streamed so the graph's "messages" stream mode sees every token as it arrives
+            aimessage = None
+            async for chunk in llm_with_tools.astream(prompt):
+                aimessage = chunk if aimessage is None else aimessage + chunk
+            if isinstance(aimessage, AIMessageChunk):
+                aimessage = message_chunk_to_message(aimessage)
+                aimessage.response_metadata["model_name"] = getattr(llm_with_tools, "tool_name", self.llm)
+            # Usage is written off the critical path; the answer does not wait for MongoDB
+            return finish(aimessage, info, config, self.save_token_usage_background)
+
+        def prefetch_request(state: MessagesState, config: RunnableConfig):
+            # Pre-injected context: the expected tool calls and their results precede the first LLM call
+            return AIMessage(content="", tool_calls=prefetcher.calls_for(self._message_text(state["messages"][-1]), self.run_info(config)))
+
+        def prefetch(state: MessagesState, config: RunnableConfig):
+            request = prefetch_request(state, config)
+            return {"messages": [request] + tool_node.invoke({"messages": [request]}, config)["messages"]}
+
+        async def aprefetch(state: MessagesState, config: RunnableConfig):
+            request = prefetch_request(state, config)
+            return {"messages": [request] + (await tool_node.ainvoke({"messages": [request]}, config))["messages"]}
 
         builder = StateGraph(MessagesState)
-        builder.add_node("assistant", assistant)
-        builder.add_node("tools", ToolNode(self.tools))
-        builder.add_edge(START, "assistant")
+        builder.add_node("assistant", RunnableLambda(assistant, afunc=aassistant, name="assistant"))
+        # Runs all tool calls of one AIMessage concurrently, e.g. content_search and support_search
+        builder.add_node("tools", tool_node)
+        if prefetcher and self.preinject:
+            builder.add_node("prefetch", RunnableLambda(prefetch, afunc=aprefetch, name="prefetch"))
+            builder.add_edge(START, "prefetch")
+            builder.add_edge("prefetch", "assistant")
+        else:
+            builder.add_edge(START, "assistant")
         builder.add_conditional_edges(
             "assistant",
             tools_condition,
         )
         builder.add_edge("tools", "assistant")
         builder.add_edge("assistant", END)
-
-        mongodb_client = MongoClient(os.environ["MONGO_URI"])
-        mongodb_saver = MongoDBSaver(mongodb_client, os.environ['MONGO_DB'])    
-        # memory = MemorySaver()
-        graph = builder.compile(checkpointer=mongodb_saver)
-        return graph
+        return builder
 
 
     async def run(self, initial_input: str, thread_id: str = "2"):
@@ -86,59 +169,45 @@ class AssistantAgent:
         """
         initial_state = {"messages": [HumanMessage(content=initial_input)]}
         self.thread_id = thread_id
-        thread = {
-            "configurable": {"thread_id": thread_id},
-            "recursion_limit": 1500,
-        }
+        thread = self.make_config(thread_id)
 
-        response = {"response": []}
-        
-        async for chunk in self.graph.astream(
-            initial_state, thread, stream_mode="values"
+        async for mode, chunk in self.graph.astream(
+            initial_state, thread, stream_mode=["messages", "updates"]
         ):
-            last_message = chunk["messages"][-1]
-            last_message.pretty_print()
-            print(last_message)
-
-            # Handle tool calls
-            if (
-                isinstance(last_message, AIMessage)
-                and last_message.tool_calls):
-                action_message = {"type": "action"}
-                print("Tool calls found in AIMessage")
-                for tool_call in last_message.tool_calls:
-                    action_message = {
-                        "type": "action",
-                        "tool": tool_call["name"],
-                        "tool_input":tool_call["args"],
-
-                    }
-                    # response["response"].append(action_message)
-                yield action_message
-
-            # Handle tool responses
-            elif isinstance(last_message, ToolMessage):
-                step_message = {
-                    "type": "observation",
-                    "result": last_message.content,
-                }
-                # response["response"].append(step_message)
-                yield step_message
-
-            # Handle final output
-            elif (
-                isinstance(last_message, AIMessage) and
-                last_message.content
-            ):
-                final_output_message = {
-                    "type": "final_output",
-                    "message": last_message.content,
-                }
-                # response["response"].append(final_output_message)
-                yield final_output_message
-
-        # return response
-
+            # Token deltas of the answer as the model produces them
+            if mode == "messages":
+                message, metadata = chunk
+                if isinstance(message, AIMessageChunk) and metadata.get("langgraph_node") == "assistant":
+                    content = self._message_text(message)
+                    if content:
+                        yield {"type": "token", "content": content}
+                continue
+
+            for update in chunk.values():
+                if not isinstance(update, dict):
+                    continue
+                for message in update.get("messages", []):
+                    for event in self._stream_events(message):
+                        yield event
+
+
+    @staticmethod
+    def _stream_events(message):
+        """Action/observation/final_output events for a message a node has completed."""
+        if isinstance(message, AIMessage) and message.tool_calls:
+            for tool_call in message.tool_calls:
+                yield {"type": "action", "tool": tool_call["name"], "tool_input": tool_call["args"]}
+        elif isinstance(message, ToolMessage):
+            yield {"type": "observation", "result": payload_store.resolve_content(message.content)}
+        elif isinstance(message, AIMessage) and message.content:
+            # Complete answer after its token deltas, for clients that do not assemble them
+            yield {"type": "final_output", "message": message.content}
+
+    @staticmethod
+    def _message_text(message) -> str:
+        if isinstance(message.content, str):
+            return message.content
+        return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in message.content)
 
     def get_last_interaction(self, messages):
 
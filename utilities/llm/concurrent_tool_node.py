@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+from core.config import config as app_config
+from utilities.blocking_executor import run_blocking
+from utilities.payload_store import payload_store
+from utilities.llm.speculative_prefetch import thread_key
+from utilities.llm.tools.content_search_tool import acontent_search_batch, content_search_batch
+
+
+class ConcurrentToolNode(RunnableLambda):
+    """
+    Graph node executing every tool call of the last AIMessage concurrently.
+
+    Async tools (those with a coroutine) run on the event loop with asyncio; sync tools
+    run in a bounded thread pool, both in the sync and the async path. Each call has its
+    own timeout, and the ToolMessages are returned in the order of the tool calls, so the
+    node takes as long as the slowest tool rather than the sum of all of them.
+
+    With a SpeculativePrefetcher, calls matching a prefetch reuse its result. Several
+    calls of a tool in BATCH_RUNNERS within one turn run as a single batch, e.g. one
+    embedding request for all content_search queries. Large outputs are moved to the
+    payload store and the ToolMessage keeps a reference.
+    """
+
+    # Tools whose calls of one turn can run together: name -> (sync, async) runner taking
+    # the list of call arguments and returning the outputs in the same order
+    BATCH_RUNNERS = {
+        "content_search": (content_search_batch, acontent_search_batch),
+    }
+
+    def __init__(self, tools: list, timeout: float = None, timeouts: Dict[str, float] = None, max_workers: int = None, prefetcher=None):
+        """
+        Initialize the ConcurrentToolNode.
+
+        Args:
+            tools (list): LangChain tools the model may call.
+            timeout (float): Seconds each tool call may take. Defaults to TOOL_TIMEOUT.
+            timeouts (dict, optional): Per-tool overrides of the timeout, keyed by tool name.
+            max_workers (int): Size of the thread pool for sync tools. Defaults to TOOL_MAX_WORKERS.
+            prefetcher (SpeculativePrefetcher, optional): Source of speculatively prefetched results.
+        """
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.timeout = app_config.TOOL_TIMEOUT if timeout is None else timeout
+        self.timeouts = timeouts or {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or app_config.TOOL_MAX_WORKERS, thread_name_prefix="tool")
+        self.prefetcher = prefetcher
+        super().__init__(self._run, afunc=self._arun, name="tools")
+
+    def _tool_calls(self, state) -> List[dict]:
+        messages = state["messages"] if isinstance(state, dict) else state
+        for message in reversed(messages):
+            if isinstance(message, AIMessage):
+                return message.tool_calls
+        return []
+
+    def _timeout_for(self, name: str) -> float:
+        return self.timeouts.get(name, self.timeout)
+
+    def _prefetched(self, call: dict, config: RunnableConfig = None):
+        return self.prefetcher.take(thread_key(config), call) if self.prefetcher else None
+
+    def _discard_prefetches(self, config: RunnableConfig = None):
+        if self.prefetcher:
+            self.prefetcher.discard(thread_key(config))
+
+    def _batches(self, calls: List[dict], taken: List) -> Dict[str, List[int]]:
+        """Indexes of the calls to run as a batch, per tool; prefetched calls are left out."""
+        batches = {}
+        for i, call in enumerate(calls):
+            if taken[i] is None and call["name"] in self.BATCH_RUNNERS and call["name"] in self.tools_by_name:
+                batches.setdefault(call["name"], []).append(i)
+        return {name: indexes for name, indexes in batches.items() if len(indexes) > 1}
+
+    @staticmethod
+    def _item_future(batch: Future, i: int) -> Future:
+        """Future of the i-th output of a batch."""
+        item = Future()
+
+        def done(finished: Future):
+            if not item.set_running_or_notify_cancel():
+                return
+            try:
+                item.set_result(finished.result()[i])
+            except BaseException as e:
+                item.set_exception(e)
+
+        batch.add_done_callback(done)
+        return item
+
+    @staticmethod
+    def _to_message(call: dict, output: Any) -> ToolMessage:
+        if isinstance(output, ToolMessage):
+            return output
+        if not isinstance(output, str):
+            try:
+                output = json.dumps(output, ensure_ascii=False)
+            except Exception:
+                output = str(output)
+        return ToolMessage(content=payload_store.offload_content(output), name=call["name"], tool_call_id=call["id"])
+
+    @staticmethod
+    def _error_message(call: dict, error: str) -> ToolMessage:
+        logging.error(f"Tool {call['name']} failed: {error}")
+        # JSON like the tool outputs, so clients parsing tool content can read it
+        return ToolMessage(content=json.dumps({"error": error}, ensure_ascii=False), name=call["name"], tool_call_id=call["id"], status="error")
+
+    def _run(self, state, config: RunnableConfig = None) -> dict:
+        calls = self._tool_calls(state)
+        started = time.monotonic()
+        futures = [self._prefetched(call, config) if call["name"] in self.tools_by_name else None for call in calls]
+        self._discard_prefetches(config)
+        for name, indexes in self._batches(calls, futures).items():
+            batch = self.executor.submit(self.BATCH_RUNNERS[name][0], [calls[i]["args"] for i in indexes])
+            for position, i in enumerate(indexes):
+                futures[i] = self._item_future(batch, position)
+        for i, call in enumerate(calls):
+            tool = self.tools_by_name.get(call["name"])
+            if tool and futures[i] is None:
+                futures[i] = self.executor.submit(tool.invoke, call["args"], config)
+
+        messages = []
+        for call, future in zip(calls, futures):
+            if future is None:
+                messages.append(self._error_message(call, f"{call['name']} is not a valid tool"))
+                continue
+            # Every call started at the same time, so each one gets its timeout from `started`
+            remaining = max(0.0, started + self._timeout_for(call["name"]) - time.monotonic())
+            try:
+                messages.append(self._to_message(call, future.result(timeout=remaining)))
+            except FutureTimeoutError:
+                # The worker thread cannot be interrupted; its result is discarded
+                future.cancel()
+                messages.append(self._error_message(call, f"{call['name']} timed out after {self._timeout_for(call['name'])}s"))
+            except Exception as e:
+                messages.append(self._error_message(call, repr(e)))
+        return {"messages": messages}
+
+    @staticmethod
+    async def _batch_item(batch: asyncio.Future, i: int):
+        # A timed-out call must not cancel the batch the other calls wait on
+        return (await asyncio.shield(batch))[i]
+
+    async def _arun_call(self, call: dict, config: RunnableConfig = None, prefetched=None, batched=None) -> ToolMessage:
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            return self._error_message(call, f"{call['name']} is not a valid tool")
+        if prefetched is not None:
+            pending = asyncio.wrap_future(prefetched)
+        elif batched is not None:
+            pending = batched
+        elif getattr(tool, "coroutine", None) is not None:
+            pending = tool.ainvoke(call["args"], config)
+        else:
+            pending = asyncio.get_running_loop().run_in_executor(self.executor, tool.invoke, call["args"], config)
+        try:
+            output = await asyncio.wait_for(pending, timeout=self._timeout_for(call["name"]))
+        except asyncio.TimeoutError:
+            return self._error_message(call, f"{call['name']} timed out after {self._timeout_for(call['name'])}s")
+        except Exception as e:
+            return self._error_message(call, repr(e))
+        # Storing a large payload writes to Mongo
+        return await run_blocking(self._to_message, call, output)
+
+    async def _arun(self, state, config: RunnableConfig = None) -> dict:
+        calls = self._tool_calls(state)
+        prefetched = [self._prefetched(call, config) if call["name"] in self.tools_by_name else None for call in calls]
+        self._discard_prefetches(config)
+        batched = [None] * len(calls)
+        for name, indexes in self._batches(calls, prefetched).items():
+            batch = asyncio.ensure_future(self.BATCH_RUNNERS[name][1]([calls[i]["args"] for i in indexes]))
+            for position, i in enumerate(indexes):
+                batched[i] = self._batch_item(batch, position)
+        # gather preserves the order of the tool calls
+        messages = await asyncio.gather(*[
+            self._arun_call(call, config, future, item) for call, future, item in zip(calls, prefetched, batched)
+        ])
+        return {"messages": list(messages)}
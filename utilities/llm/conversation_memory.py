@@ -0,0 +1,198 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from core.config import config
+from utilities.llm.chain import run_chain
+from utilities.llm.prompts.summary_prompt import CONVERSATION_SUMMARY_PROMPT
+from utilities.upload_engine import get_token_counter
+
+
+def message_text(message) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in message.content)
+
+
+def split_turns(messages: List) -> List[List]:
+    """Group messages into turns, each starting at a HumanMessage."""
+    turns = []
+    for message in messages:
+        if isinstance(message, SystemMessage):
+            continue
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def answer_only(turn: List) -> List:
+    """A completed turn without its tool calls and tool results: the question and the final answer."""
+    return [
+        message for message in turn
+        if isinstance(message, HumanMessage)
+        or (isinstance(message, AIMessage) and not message.tool_calls and message_text(message))
+    ]
+
+
+class ConversationMemory:
+    """
+    Rolling summary memory for long threads.
+
+    The prompt is the stored summary of a thread plus as many of its latest turns as fit
+    in ``max_tokens``; earlier turns only contribute their question and final answer, and
+    the current turn is always included whole. When turns fall outside that window they
+    are folded into the summary by a cheap model, in the background, so a request never
+    waits for it. Until a fold has finished, the turns it covers are simply left out.
+    Folds run on their own small pool, so slow LLM calls never occupy the shared
+    blocking executor that request paths wait on.
+    """
+
+    def __init__(self, max_tokens: int = 4000, summary_words: int = 250, model: str = "azureai", cache_size: int = 1024, fold_workers: int = 2):
+        """
+        Initialize the ConversationMemory.
+
+        Args:
+            max_tokens (int): Token budget for the summary plus the recent turns.
+            summary_words (int): Length limit given to the summarizing model.
+            model (str): Model or provider used for folding.
+            cache_size (int): Thread summaries kept in memory.
+            fold_workers (int): Threads running folds.
+        """
+        self.max_tokens = max_tokens
+        self.summary_words = summary_words
+        self.model = model
+        self.cache_size = cache_size
+        self._summaries = OrderedDict()  # thread_id -> (summary, through_message_id)
+        self._folding = set()
+        self._lock = threading.Lock()
+        self._count = None
+        self._executor = ThreadPoolExecutor(max_workers=fold_workers, thread_name_prefix="memory-fold")
+
+    def count_tokens(self, messages: List) -> int:
+        if self._count is None:
+            self._count = get_token_counter("gpt-4o")
+        return sum(self._count(message_text(message)) for message in messages)
+
+    def _remember(self, thread_id: str, summary: str, through_message_id: Optional[str]):
+        with self._lock:
+            self._summaries[thread_id] = (summary, through_message_id)
+            self._summaries.move_to_end(thread_id)
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+
+    def _load(self, thread_id: str, refresh: bool = False) -> Tuple[str, Optional[str]]:
+        from utilities.database.models.thread_summary import ThreadSummary
+        with self._lock:
+            cached = None if refresh else self._summaries.get(thread_id)
+        if cached is not None:
+            return cached
+        record = ThreadSummary.objects(thread_id=thread_id).first()
+        summary, through = (record.summary or "", record.through_message_id) if record else ("", None)
+        self._remember(thread_id, summary, through)
+        return summary, through
+
+    @staticmethod
+    def _unfolded(messages: List, through_message_id: Optional[str]) -> List:
+        """Messages after the last folded one."""
+        if through_message_id:
+            for idx in range(len(messages) - 1, -1, -1):
+                if messages[idx].id == through_message_id:
+                    return messages[idx + 1:]
+        return messages
+
+    def _window(self, turns: List[List], budget: int) -> int:
+        """Index of the first turn of the newest turns fitting in ``budget``; the last turn always fits."""
+        start = len(turns) - 1 if turns else 0
+        used = self.count_tokens(answer_only(turns[-1])) if turns else 0
+        while start > 0:
+            cost = self.count_tokens(answer_only(turns[start - 1]))
+            if used + cost > budget:
+                break
+            used += cost
+            start -= 1
+        return start
+
+    def build_prompt(self, thread_id: str, messages: List) -> Tuple[str, List]:
+        """
+        Summary and recent messages to send to the model for a thread.
+
+        Args:
+            thread_id (str): Conversation thread.
+            messages (list): Full message history from the graph state.
+
+        Returns:
+            tuple: (summary, or "" if there is none yet; recent messages, oldest first).
+        """
+        if not thread_id or not self.max_tokens:
+            return "", messages
+        summary, through = self._load(thread_id)
+        turns = split_turns(self._unfolded(messages, through))
+        budget = max(0, self.max_tokens - (self.count_tokens([AIMessage(content=summary)]) if summary else 0))
+        start = self._window(turns, budget)
+        if start > 0:
+            self.schedule_fold(thread_id, messages)
+        recent = [message for turn in turns[start:-1] for message in answer_only(turn)]
+        return summary, recent + (turns[-1] if turns else [])
+
+    def schedule_fold(self, thread_id: str, messages: List):
+        with self._lock:
+            if thread_id in self._folding:
+                return
+            self._folding.add(thread_id)
+        self._executor.submit(self._fold, thread_id, list(messages))
+
+    def _fold(self, thread_id: str, messages: List):
+        from utilities.database.models.thread_summary import ThreadSummary
+        try:
+            # Another worker may have folded this thread since it was cached
+            summary, through = self._load(thread_id, refresh=True)
+            turns = split_turns(self._unfolded(messages, through))
+            # Fold down to half the budget, so the next fold is a few turns away
+            end = self._window(turns, self.max_tokens // 2)
+            folded = [message for turn in turns[:end] for message in answer_only(turn)]
+            if not folded or end == 0:
+                return
+            transcript = "\n".join(
+                f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: {message_text(message)}"
+                for message in folded
+            )
+            result = run_chain(
+                prompt_template=CONVERSATION_SUMMARY_PROMPT,
+                model_name=self.model,
+                summary=summary or "(none)",
+                transcript=transcript,
+                max_words=str(self.summary_words),
+            )
+            if not isinstance(result, str) or not result.strip():
+                logging.error(f"Failed to summarize thread {thread_id}: {result}")
+                return
+            through = turns[end - 1][-1].id
+            if through is None:
+                return
+            ThreadSummary.objects(thread_id=thread_id).update_one(
+                set__summary=result.strip(),
+                set__through_message_id=through,
+                inc__folded_messages=sum(len(turn) for turn in turns[:end]),
+                set__updated_at=datetime.utcnow(),
+                upsert=True
+            )
+            self._remember(thread_id, result.strip(), through)
+        except Exception as e:
+            logging.error(f"Failed to fold thread {thread_id}: {e}")
+        finally:
+            with self._lock:
+                self._folding.discard(thread_id)
+
+
+conversation_memory = ConversationMemory(
+    max_tokens=config.MEMORY_MAX_TOKENS,
+    summary_words=config.MEMORY_SUMMARY_WORDS,
+    model=config.MEMORY_SUMMARY_MODEL,
+    fold_workers=config.MEMORY_FOLD_WORKERS,
+)
@@ -18,3 +18,6 @@ class DeepSeekTool(ModelBase):
 
     def use(self, prompt: str) -> str:
         return self.model.invoke(prompt)
+
+    async def ause(self, prompt: str = "Hello, world!") -> str:
+        return await self.model.ainvoke(prompt)
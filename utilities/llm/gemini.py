@@ -36,10 +36,18 @@ class GeminiTool(ModelBase):
         response.response_metadata["model_name"] = self.tool_name
         return response
 
+    async def ause(self, prompt: Any = "Hello, world!") -> str:
+        if not self.model:
+            tools = self.agent.tools if hasattr(self.agent, 'tools') else None
+            self.model = self._get_model(tools=tools)
+        response = await self.model.ainvoke(prompt)
+        response.pretty_print()
+        response.response_metadata["model_name"] = self.tool_name
+        return response
+
     async def astream(self, prompt: Any) -> AsyncGenerator:
         if not self.model:
             tools = self.agent.tools if hasattr(self.agent, 'tools') else None
             self.model = self._get_model(tools=tools)
         async for chunk in self.model.astream(prompt):
-            chunk.pretty_print()
             yield chunk
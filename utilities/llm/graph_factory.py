@@ -0,0 +1,97 @@
+import atexit
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from langgraph.checkpoint.mongodb import MongoDBSaver
+from pymongo import MongoClient
+
+from core.config import config
+from utilities.llm.layered_checkpointer import LayeredCheckpointSaver
+
+_checkpointer = None
+_mongo_client = None
+_graphs = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_mongo_client() -> MongoClient:
+    """Process-wide MongoClient; its connection pool is shared by every graph."""
+    global _mongo_client
+    if _mongo_client is None:
+        with _lock:
+            if _mongo_client is None:
+                _mongo_client = MongoClient(os.environ["MONGO_URI"])
+    return _mongo_client
+
+
+def get_checkpointer():
+    """Process-wide checkpointer used by every compiled graph: the MongoDBSaver, behind the
+    in-memory hot-thread tier when CHECKPOINT_MEMORY_TIER is enabled."""
+    global _checkpointer
+    if _checkpointer is None:
+        client = get_mongo_client()
+        with _lock:
+            if _checkpointer is None:
+                saver = MongoDBSaver(client, os.environ['MONGO_DB'])
+                if config.CHECKPOINT_MEMORY_TIER:
+                    saver = LayeredCheckpointSaver(
+                        saver,
+                        max_threads=config.CHECKPOINT_MEMORY_THREADS,
+                        durability=config.CHECKPOINT_DURABILITY,
+                        flush_size=config.CHECKPOINT_FLUSH_SIZE,
+                        flush_interval=config.CHECKPOINT_FLUSH_INTERVAL,
+                    )
+                    atexit.register(saver.close)
+                _checkpointer = saver
+    return _checkpointer
+
+
+def close_checkpointer():
+    """Persist everything the checkpointer still holds in memory (on shutdown)."""
+    if _checkpointer is not None and hasattr(_checkpointer, "close"):
+        _checkpointer.close()
+
+
+def prompt_key(prompt) -> str:
+    """Short stable key of a prompt (str or PromptTemplate) for graph cache keys."""
+    text = getattr(prompt, "template", prompt)
+    return hashlib.sha1(str(text).encode("utf-8")).hexdigest()[:16]
+
+
+def get_graph(key: Hashable, build: Callable):
+    """
+    Return the compiled graph for ``key``, building and compiling it on first use.
+
+    Graphs are compiled once per (agent type, model, tool set, prompt variant) with the
+    shared checkpointer; per-request data must travel in the run config or the state,
+    never in the node closures.
+
+    Args:
+        key (Hashable): Cache key describing everything the graph's nodes close over.
+        build (Callable): Returns the uncompiled StateGraph builder.
+
+    Returns:
+        CompiledStateGraph: The cached graph.
+    """
+    with _lock:
+        graph = _graphs.get(key)
+        if graph is not None:
+            _graphs.move_to_end(key)
+            return graph
+    graph = build().compile(checkpointer=get_checkpointer())
+    with _lock:
+        graph = _graphs.setdefault(key, graph)
+        _graphs.move_to_end(key)
+        while len(_graphs) > config.GRAPH_CACHE_SIZE:
+            evicted, _ = _graphs.popitem(last=False)
+            logging.info(f"Evicted compiled graph {evicted}")
+    return graph
+
+
+def clear_graphs():
+    with _lock:
+        _graphs.clear()
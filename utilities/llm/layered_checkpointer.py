@@ -0,0 +1,384 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+    get_checkpoint_id,
+)
+
+from utilities.blocking_executor import run_blocking
+
+DURABILITY_MODES = ("sync", "async", "latest")
+# Checkpoints kept in memory per thread and namespace; older ones are read from the wrapped saver
+HOT_CHECKPOINTS = 4
+
+
+class _HotThread:
+    """Checkpoints and pending writes of one thread held in memory."""
+
+    def __init__(self):
+        self.checkpoints = {}  # (checkpoint_ns, checkpoint_id) -> (checkpoint, metadata, parent_checkpoint_id)
+        self.writes = {}  # (checkpoint_ns, checkpoint_id) -> {(task_id, idx): (task_id, channel, value)}
+        self.dirty = 0  # queued operations not yet persisted
+
+
+class LayeredCheckpointSaver(BaseCheckpointSaver):
+    """
+    In-memory tier for recently active threads in front of a persistent saver.
+
+    Checkpoints and writes of a hot thread are kept in an LRU, so ``get_tuple`` is
+    served locally; they are persisted to the wrapped saver (MongoDBSaver) according
+    to ``durability``:
+
+    - ``sync``: write-through; only reads are saved.
+    - ``async``: write-behind; a background thread persists every operation in order,
+      every ``flush_interval`` seconds or when ``flush_size`` operations are queued.
+    - ``latest``: write-behind of only the newest checkpoint of each thread and
+      namespace (with its writes); intermediate super-steps are never persisted, and a
+      persisted checkpoint's parent is the previous *persisted* one, so the stored
+      history skips them.
+
+    Before the latest checkpoint of a thread is served from memory, its id is checked
+    against the newest persisted checkpoint id (one index-only query instead of loading
+    and deserializing the checkpoint), so a turn written by another worker is picked up
+    instead of forking the history. The write-behind modes need a long-lived process:
+    ``close`` (run on shutdown) flushes what is queued, which a serverless deploy may
+    never do; use ``sync`` there.
+    """
+
+    def __init__(self, inner: BaseCheckpointSaver, max_threads: int = 1000, durability: str = "sync", flush_size: int = 200, flush_interval: float = 1.0):
+        """
+        Initialize the LayeredCheckpointSaver.
+
+        Args:
+            inner (BaseCheckpointSaver): Persistent saver, e.g. MongoDBSaver.
+            max_threads (int): Threads kept in memory.
+            durability (str): "sync", "async" or "latest".
+            flush_size (int): Queued operations that trigger an immediate flush.
+            flush_interval (float): Seconds between background flushes.
+        """
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Invalid checkpoint durability {durability!r}, expected one of {DURABILITY_MODES}")
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self.max_threads = max_threads
+        self.durability = durability
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._threads = OrderedDict()  # thread_id -> _HotThread
+        self._queue = []  # ("put" | "put_writes", thread_id, args)
+        self._persisted = {}  # thread_id -> {checkpoint_ns: newest checkpoint id written to inner}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+
+    # Memory tier
+
+    def _entry(self, thread_id: str, create: bool = False) -> Optional[_HotThread]:
+        entry = self._threads.get(thread_id)
+        if entry is None and create:
+            entry = self._threads[thread_id] = _HotThread()
+        if entry is not None:
+            self._threads.move_to_end(thread_id)
+        self._evict(keep=thread_id)
+        return entry
+
+    def _evict(self, keep: str = None):
+        # Threads with unpersisted operations stay until a flush has written them
+        excess = len(self._threads) - self.max_threads
+        for thread_id in list(self._threads.keys()):
+            if excess <= 0:
+                break
+            if thread_id != keep and not self._threads[thread_id].dirty:
+                del self._threads[thread_id]
+                self._persisted.pop(thread_id, None)
+                excess -= 1
+        if excess > 0:
+            self._wake.set()
+
+    def _seed(self, thread_id: str, saved: CheckpointTuple):
+        """Make a tuple loaded from the wrapped saver the state of a (new) hot thread."""
+        with self._lock:
+            entry = self._threads.pop(thread_id, None)
+            if entry is not None and entry.dirty:
+                # Local operations are newer than what was read
+                self._threads[thread_id] = entry
+                return
+            entry = self._entry(thread_id, create=True)
+            checkpoint_ns = saved.config["configurable"].get("checkpoint_ns", "")
+            key = (checkpoint_ns, saved.checkpoint["id"])
+            self._persisted.setdefault(thread_id, {})[checkpoint_ns] = saved.checkpoint["id"]
+            parent_id = (saved.parent_config or {}).get("configurable", {}).get("checkpoint_id")
+            entry.checkpoints[key] = (saved.checkpoint, saved.metadata, parent_id)
+            entry.writes[key] = {
+                (task_id, idx): (task_id, channel, value)
+                for idx, (task_id, channel, value) in enumerate(saved.pending_writes or [])
+            }
+
+    @staticmethod
+    def _prune(entry: _HotThread, checkpoint_ns: str):
+        ids = sorted(key[1] for key in entry.checkpoints if key[0] == checkpoint_ns)
+        for checkpoint_id in ids[:-HOT_CHECKPOINTS]:
+            entry.checkpoints.pop((checkpoint_ns, checkpoint_id), None)
+            entry.writes.pop((checkpoint_ns, checkpoint_id), None)
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, entry: _HotThread) -> CheckpointTuple:
+        checkpoint, metadata, parent_id = entry.checkpoints[(checkpoint_ns, checkpoint_id)]
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=copy_checkpoint(checkpoint),
+            metadata=metadata,
+            parent_config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}} if parent_id else None,
+            pending_writes=list(entry.writes.get((checkpoint_ns, checkpoint_id), {}).values()),
+        )
+
+    def _persisted_latest_id(self, thread_id: str, checkpoint_ns: str):
+        """Newest checkpoint id in the wrapped saver's collection; raises if it cannot be read."""
+        collection = self.inner.checkpoint_collection
+        doc = collection.find_one(
+            {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns},
+            {"checkpoint_id": 1, "_id": 0},
+            sort=[("checkpoint_id", -1)],
+        )
+        return doc["checkpoint_id"] if doc else None
+
+    def _local_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            entry = self._threads.get(thread_id)
+            if entry is None:
+                return None
+            if checkpoint_id is not None:
+                # A given checkpoint never changes once written
+                if (checkpoint_ns, checkpoint_id) not in entry.checkpoints:
+                    return None
+                self._entry(thread_id)
+                return self._tuple(thread_id, checkpoint_ns, checkpoint_id, entry)
+            # Checkpoint ids are time-ordered, the highest is the latest
+            ids = [key[1] for key in entry.checkpoints if key[0] == checkpoint_ns]
+            if not ids:
+                return None
+            local_latest, dirty = max(ids), entry.dirty
+        try:
+            persisted = self._persisted_latest_id(thread_id, checkpoint_ns)
+        except Exception as e:
+            logging.error(f"Could not validate cached checkpoint of thread {thread_id}: {e}")
+            return None
+        # Queued local writes may be ahead of Mongo, but nobody else may be
+        current = (persisted is None or persisted <= local_latest) if dirty else persisted == local_latest
+        if not current:
+            if dirty:
+                logging.error(f"Thread {thread_id} was written by another process while this one has queued checkpoints")
+            return None
+        with self._lock:
+            entry = self._threads.get(thread_id)
+            if entry is None or (checkpoint_ns, local_latest) not in entry.checkpoints:
+                return None
+            self._entry(thread_id)
+            return self._tuple(thread_id, checkpoint_ns, local_latest, entry)
+
+    # Write-behind queue
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _enqueue(self, entry: _HotThread, op: str, thread_id: str, args: tuple):
+        """Queue an operation; call with the lock held, then _after_enqueue without it."""
+        self._queue.append((op, thread_id, args))
+        entry.dirty += 1
+        if not self._closed:
+            self._ensure_thread()
+
+    def _after_enqueue(self):
+        if self._closed:
+            # Nothing drains the queue after close(); write through instead
+            self.flush()
+        elif len(self._queue) >= self.flush_size:
+            self._wake.set()
+
+    def _coalesce(self, batch: list) -> list:
+        """For "latest" durability: the newest checkpoint per thread and namespace, and its writes."""
+        newest = {}
+        for op, thread_id, args in batch:
+            if op == "put":
+                config, checkpoint = args[0], args[1]
+                newest[(thread_id, config["configurable"].get("checkpoint_ns", ""))] = checkpoint["id"]
+        kept = []
+        for item in batch:
+            op, thread_id, args = item
+            checkpoint_ns = args[0]["configurable"].get("checkpoint_ns", "")
+            checkpoint_id = args[1]["id"] if op == "put" else get_checkpoint_id(args[0])
+            if newest.get((thread_id, checkpoint_ns), checkpoint_id) == checkpoint_id:
+                kept.append(item)
+        return kept
+
+    def _reparent(self, config: RunnableConfig, thread_id: str) -> RunnableConfig:
+        """For "latest" durability: point a checkpoint at the newest one actually persisted."""
+        configurable = config["configurable"]
+        parent_id = self._persisted.get(thread_id, {}).get(configurable.get("checkpoint_ns", ""))
+        return {**config, "configurable": {**configurable, "checkpoint_id": parent_id}}
+
+    def flush(self) -> int:
+        """Persist every queued operation; returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._queue = self._queue, []
+            if not batch:
+                return 0
+            ops = self._coalesce(batch) if self.durability == "latest" else batch
+            done = 0
+            try:
+                for op, thread_id, args in ops:
+                    if op == "put":
+                        config = self._reparent(args[0], thread_id) if self.durability == "latest" else args[0]
+                        self.inner.put(config, *args[1:])
+                        with self._lock:
+                            self._persisted.setdefault(thread_id, {})[config["configurable"].get("checkpoint_ns", "")] = args[1]["id"]
+                    else:
+                        self.inner.put_writes(*args)
+                    done += 1
+            except Exception as e:
+                logging.error(f"Failed to persist {len(ops) - done} checkpoint operations, will retry: {e}")
+                retry = ops[done:]
+                retry_ids = {id(item) for item in retry}
+                with self._lock:
+                    # Keep the order: the failed remainder goes before anything queued since
+                    self._queue = retry + self._queue
+                    self._settle([item for item in batch if id(item) not in retry_ids])
+                return done
+            with self._lock:
+                self._settle(batch)
+            return done
+
+    def _settle(self, ops: list):
+        for _, thread_id, _ in ops:
+            entry = self._threads.get(thread_id)
+            if entry is not None and entry.dirty:
+                entry.dirty -= 1
+
+    def close(self):
+        """Stop the background writer and persist everything queued."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        if self._queue:
+            logging.error(f"{len(self._queue)} checkpoint operations could not be persisted on shutdown")
+
+    def discard_thread(self, thread_id: str):
+        """Drop a thread from memory and from the queue, e.g. before deleting it."""
+        with self._lock:
+            self._threads.pop(thread_id, None)
+            self._persisted.pop(thread_id, None)
+            self._queue = [item for item in self._queue if item[1] != thread_id]
+        # Wait for a flush that may be writing this thread right now
+        with self._flush_lock:
+            pass
+
+    # BaseCheckpointSaver
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        local = self._local_tuple(config)
+        if local is not None:
+            self.hits += 1
+            return local
+        self.misses += 1
+        saved = self.inner.get_tuple(config)
+        if saved is not None and get_checkpoint_id(config) is None:
+            self._seed(config["configurable"]["thread_id"], saved)
+        return saved
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        # History is served by the wrapped saver; persist what it has not seen yet
+        self.flush()
+        yield from self.inner.list(config, filter=filter, before=before, limit=limit)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        stored = copy_checkpoint(checkpoint)
+        with self._lock:
+            entry = self._entry(thread_id, create=True)
+            entry.checkpoints[(checkpoint_ns, checkpoint["id"])] = (stored, metadata, configurable.get("checkpoint_id"))
+            self._prune(entry, checkpoint_ns)
+            if self.durability != "sync":
+                self._enqueue(entry, "put", thread_id, (config, stored, metadata, new_versions))
+        if self.durability == "sync":
+            saved = self.inner.put(config, checkpoint, metadata, new_versions)
+            with self._lock:
+                self._persisted.setdefault(thread_id, {})[checkpoint_ns] = checkpoint["id"]
+            return saved
+        self._after_enqueue()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        key = (configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"])
+        with self._lock:
+            entry = self._entry(thread_id, create=True)
+            stored = entry.writes.setdefault(key, {})
+            for idx, (channel, value) in enumerate(writes):
+                write_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                if write_key[1] >= 0 and write_key in stored:
+                    continue
+                stored[write_key] = (task_id, channel, value)
+            if self.durability != "sync":
+                self._enqueue(entry, "put_writes", thread_id, (config, list(writes), task_id, task_path))
+        if self.durability == "sync":
+            return self.inner.put_writes(config, writes, task_id, task_path)
+        self._after_enqueue()
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.discard_thread(thread_id)
+        self.inner.delete_thread(thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        # Even a hit reads the newest persisted id
+        return await run_blocking(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        for item in await run_blocking(lambda: list(self.list(config, filter=filter, before=before, limit=limit))):
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        if self.durability == "sync":
+            return await run_blocking(self.put, config, checkpoint, metadata, new_versions)
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        if self.durability == "sync":
+            return await run_blocking(self.put_writes, config, writes, task_id, task_path)
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await run_blocking(self.delete_thread, thread_id)
@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
 
+from utilities.blocking_executor import run_blocking
+
 
 class ModelBase(ABC):
     """Abstract class for the tool classes."""
@@ -18,3 +20,11 @@ class ModelBase(ABC):
         """Use the tool with the given prompt."""
         pass
 
+    async def ause(self, prompt: str = "Hello, world!") -> str:
+        """Async variant of use; runs the blocking call in the bounded executor unless overridden."""
+        return await run_blocking(self.use, prompt)
+
+    async def astream(self, prompt: str = "Hello, world!"):
+        """Yield the response in chunks; tools without native streaming yield it whole."""
+        yield await self.ause(prompt)
+
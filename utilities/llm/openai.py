@@ -21,3 +21,5 @@ class OpenAITool(ModelBase):
     def use(self, prompt: str = "Hello, world!") -> str:
         return self.model.invoke(prompt)
 
+    async def ause(self, prompt: str = "Hello, world!") -> str:
+        return await self.model.ainvoke(prompt)
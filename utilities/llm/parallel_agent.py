@@ -1,10 +1,8 @@
 import json
 from langchain_core.prompts import PromptTemplate
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableConfig
 from core.config import config
-from langgraph.checkpoint.mongodb import MongoDBSaver
-from pymongo import MongoClient
 from langgraph.graph import START,END, MessagesState, StateGraph
 from langgraph.prebuilt import ToolNode, tools_condition
 from typing import Annotated, Any, Dict, List
@@ -13,7 +11,8 @@ import os
 from datetime import datetime
 
 from utilities.llm.ai_factory import AIFactory
-from utilities.vectorstore import PineconeVectorStoreHandler
+from utilities.llm.graph_factory import get_graph, get_mongo_client, prompt_key
+from utilities.vectorstore import get_shared_handler
 
 def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
@@ -40,13 +39,32 @@ class ParallelAgent:
         self.llm = llm
         self.customPrompt = customPrompt
         self.publication_id = publication_id
-        self.graph = self._build_graph()
+        # customPrompt and publication_id travel in the run config (see make_config)
+        self.graph = get_graph(
+            ("parallel", self.llm, prompt_key(self.system_prompt) if self.system_prompt is not None else None),
+            self._build_graph
+        )
+
+    def make_config(self, thread_id: str) -> dict:
+        """Run config carrying the thread id and this request's options to the shared graph."""
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "custom_prompt": self.customPrompt,
+                "publication_id": self.publication_id,
+            },
+            "recursion_limit": 1500,
+        }
+
+    @staticmethod
+    def run_options(config: RunnableConfig) -> dict:
+        return (config or {}).get("configurable") or {}
     
-    def get_system_prompt(self, state: AgentState):
+    def get_system_prompt(self, state: AgentState, options: dict):
         """Returns the formatted system prompt."""
         # print("customPrompt:::::::::::", self.customPrompt)
         # print("system_prompt:::::::::::", self.system_prompt.format(context=state["context"]))
-        if self.customPrompt is None:
+        if options.get("custom_prompt") is None:
             # print(self.system_prompt.format(context=state["context"]))
             return [SystemMessage(content=self.system_prompt.format(context=state["context"]))] + state["messages"]  
         else : 
@@ -57,15 +75,16 @@ class ParallelAgent:
         # sys_msg = SystemMessage(content=self.system_prompt.format(context=state["context"]))
         # llm_with_tools = self.llm.bind_tools(self.tools, parallel_tool_calls=False)
 
-        def initalize(state: AgentState):
+        def initalize(state: AgentState, config: RunnableConfig):
             # print("Initializer Node ::::::::::: ", state)
 
             query = state["messages"][-1].content
             print(query)
             if self.system_prompt is not None:
-                handler = PineconeVectorStoreHandler()
+                handler = get_shared_handler()
                 vectorstore = handler.get_vector_store()
-                filter_criteria = {"publication_id": self.publication_id} if self.publication_id else {}
+                publication_id = self.run_options(config).get("publication_id")
+                filter_criteria = {"publication_id": publication_id} if publication_id else {}
                 context =vectorstore.similarity_search(  
                     query,  # our search query  
                     k=3,  # return 3 most relevant docs  
@@ -75,9 +94,9 @@ class ParallelAgent:
             return {"input": state["messages"][-1].content, "response":[], "context": context if len(context) > 0 else " "}
             
 
-        def model_node(state: AgentState):
+        def model_node(state: AgentState, config: RunnableConfig):
             print(f"Using model: {self.llm}")
-            response = AIFactory.get_tool(self.llm).use(self.get_system_prompt(state))
+            response = AIFactory.get_tool(self.llm).use(self.get_system_prompt(state, self.run_options(config)))
             print("response::::::::::::", response)
             return {"response": [response], "messages": [response]}
 
@@ -89,17 +108,11 @@ class ParallelAgent:
         builder.add_edge(START, "initialize")
         builder.add_edge("initialize", "model")
         builder.add_edge("model", END)
-        
-        mongodb_client = MongoClient(os.environ["MONGO_URI"])
-        mongodb_saver = MongoDBSaver(mongodb_client, os.environ['MONGO_DB'])    
-        memory = MemorySaver()
-        graph = builder.compile(checkpointer=mongodb_saver)
-        return graph
+        return builder
 
     def save_token_usage(self, thread_id: str, token_usage_details: Dict[str, Any], user_id: str):
         """Saves the token usage details to the MongoDB collection."""
-        mongodb_client = MongoClient(os.environ["MONGO_URI"])
-        db = mongodb_client[os.environ['MONGO_DB']]
+        db = get_mongo_client()[os.environ['MONGO_DB']]
         collection = db["tokenz"]
         token_usage_details.update({
             "thread_id": thread_id,
@@ -118,9 +131,6 @@ class ParallelAgent:
             user_id: Optional. The ID of the user. Defaults to "unknown".
         """
         initial_state = {"messages": [HumanMessage(content=initial_input)]}
-        thread = {
-            "configurable": {"thread_id": thread_id},
-            "recursion_limit": 1500,
-        }  # Now uses the passed thread_id
+        thread = self.make_config(thread_id)  # Now uses the passed thread_id
         return self.graph.invoke(initial_state, thread)
 
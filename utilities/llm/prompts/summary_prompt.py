@@ -0,0 +1,13 @@
+CONVERSATION_SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a user and an AI assistant.
+- Merge the new turns into the current summary.
+- Keep facts, names, publications, decisions and open questions the assistant may need later.
+- Drop greetings, repetition and the wording of search results.
+- The summary must be at most {max_words} words.
+- Respond ONLY with the updated summary.
+
+Current summary: {summary}
+
+New turns:
+{transcript}
+"""
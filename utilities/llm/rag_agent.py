@@ -1,19 +1,18 @@
 import json
 from langchain_core.prompts import PromptTemplate
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableConfig
 from core.config import config
-from langgraph.checkpoint.mongodb import MongoDBSaver
-from pymongo import MongoClient
 from langgraph.graph import START,END, MessagesState, StateGraph
 from langgraph.prebuilt import ToolNode, tools_condition
 from typing import Annotated, Any, Dict, List
 import operator
-import os
 from datetime import datetime
 from utilities.llm.questions_prompt import message_prompt, schemas
 from utilities.llm.ai_factory import AIFactory
-from utilities.vectorstore import PineconeVectorStoreHandler
+from utilities.llm.conversation_memory import conversation_memory
+from utilities.llm.graph_factory import get_graph, prompt_key
+from utilities.vectorstore import get_shared_handler
 from utilities.database.usage_tracker import UsageTracker
 
 def format_docs(docs):
@@ -45,27 +44,50 @@ class RAGAgent:
         self.customPrompt = customPrompt
         self.publication_id = publication_id
         self.question_type = question_type  # Add question type
-        self.graph = self._build_graph()
         self.usage_tracker = UsageTracker()
+        # customPrompt, publication_id and question_type travel in the run config (see make_config)
+        self.graph = get_graph(
+            ("rag", self.llm, prompt_key(self.system_prompt) if self.system_prompt is not None else None),
+            self._build_graph
+        )
+
+    def make_config(self, thread_id: str) -> dict:
+        """Run config carrying the thread id and this request's options to the shared graph."""
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "custom_prompt": self.customPrompt,
+                "publication_id": self.publication_id,
+                "question_type": self.question_type,
+            },
+            "recursion_limit": 1500,
+        }
+
+    @staticmethod
+    def run_options(config: RunnableConfig) -> dict:
+        return (config or {}).get("configurable") or {}
     
-    def get_trimmed_messages(self, messages: List[Any]) -> List[Any]:
-        """Returns trimmed messages if length is greater than 6."""
+    def get_trimmed_messages(self, messages: List[Any], thread_id: str | None = None) -> List[Any]:
+        """Returns the running summary plus the recent turns, or a fixed slice if memory is disabled."""
         print("messages ::: ", messages)
+        if config.CONVERSATION_MEMORY and thread_id:
+            summary, recent = conversation_memory.build_prompt(thread_id, messages)
+            return ([SystemMessage(content="Summary of the earlier conversation:\n" + summary)] if summary else []) + recent
         if len(messages) > 6:
             return messages[:3] + messages[-4:]
         return messages
 
-    def get_system_prompt(self, state: AgentState):
+    def get_system_prompt(self, state: AgentState, options: dict):
         """Returns the formatted system prompt."""
         # print("customPrompt:::::::::::", self.customPrompt)
         # print("system_prompt:::::::::::", self.system_prompt.format(context=state["context"]))
-        if self.customPrompt is None:
+        if options.get("custom_prompt") is None:
             return [SystemMessage(content=self.system_prompt.format(context=state["context"])), HumanMessage(content=state["input"])] 
         else:
             userPrompt = PromptTemplate.from_template(template=message_prompt).partial(
-                schema=schemas[self.question_type]
+                schema=schemas[options.get("question_type")]
             )
-            trimmed_messages = self.get_trimmed_messages(state["messages"])
+            trimmed_messages = self.get_trimmed_messages(state["messages"], options.get("thread_id"))
             return trimmed_messages + [HumanMessage(content=userPrompt.format(user_query=state["input"]))]
     
     def _build_graph(self):
@@ -73,15 +95,16 @@ class RAGAgent:
         # sys_msg = SystemMessage(content=self.system_prompt.format(context=state["context"]))
         # llm_with_tools = self.llm.bind_tools(self.tools, parallel_tool_calls=False)
 
-        def initalize(state: AgentState):
+        def initalize(state: AgentState, config: RunnableConfig):
             # print("Initializer Node ::::::::::: ", state)
 
             query = state["input"]
             print(query)
             if self.system_prompt is not None:
-                handler = PineconeVectorStoreHandler()
+                handler = get_shared_handler()
                 vectorstore = handler.get_vector_store()
-                filter_criteria = {"publication_id": self.publication_id} if self.publication_id else {}
+                publication_id = self.run_options(config).get("publication_id")
+                filter_criteria = {"publication_id": publication_id} if publication_id else {}
                 context =vectorstore.similarity_search(  
                     query,  # our search query  
                     k=3,  # return 3 most relevant docs  
@@ -91,9 +114,9 @@ class RAGAgent:
             return {"response":[], "context": context if len(context) > 0 else " "}
             
 
-        def model_node(state: AgentState):
+        def model_node(state: AgentState, config: RunnableConfig):
             print(f"Using model: {self.llm}")
-            systemprompt = self.get_system_prompt(state)
+            systemprompt = self.get_system_prompt(state, self.run_options(config))
             print("systemprompt::::::::::::", systemprompt)
             response = AIFactory.get_tool(self.llm).use(systemprompt)
             print("response::::::::::::", response)
@@ -107,12 +130,7 @@ class RAGAgent:
         builder.add_edge(START, "initialize")
         builder.add_edge("initialize", "model")
         builder.add_edge("model", END)
-        
-        mongodb_client = MongoClient(os.environ["MONGO_URI"])
-        mongodb_saver = MongoDBSaver(mongodb_client, os.environ['MONGO_DB'])    
-        # memory = MemorySaver()
-        graph = builder.compile(checkpointer=mongodb_saver)
-        return graph
+        return builder
 
     def save_token_usage(self, thread_id: str, token_usage_details: Dict[str, Any], user_id: str):
         """Saves the token usage details using UsageTracker."""
@@ -129,9 +147,6 @@ class RAGAgent:
         initial_state = {
                      "input": initial_input,
                }
-        thread = {
-            "configurable": {"thread_id": thread_id},
-            "recursion_limit": 1500,
-        }  # Now uses the passed thread_id
+        thread = self.make_config(thread_id)  # Now uses the passed thread_id
         return self.graph.invoke(initial_state, thread)
 
@@ -0,0 +1,139 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from core.config import config
+from utilities.llm.tools.content_search_tool import content_search_context, finish_content_search
+from utilities.sparse_encoder import tokenize
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the query tokens (stopwords removed)."""
+    tokens_a, tokens_b = set(tokenize(a)), set(tokenize(b))
+    if not tokens_a or not tokens_b:
+        return 1.0 if tokens_a == tokens_b else 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+def thread_key(config: dict = None) -> str:
+    """Conversation thread a graph run belongs to."""
+    return str(((config or {}).get("configurable") or {}).get("thread_id"))
+
+
+def _normalize_args(args: dict) -> dict:
+    normalized = {}
+    for key, value in (args or {}).items():
+        if key == "query" or value is None:
+            continue
+        normalized[key] = sorted(map(str, value)) if isinstance(value, list) else value
+    return normalized
+
+
+class SpeculativePrefetcher:
+    """
+    Runs retrieval tool calls on the raw user message while the first LLM call is in flight.
+
+    Prefetches are keyed by conversation thread. When the model later calls the same tool
+    with the same non-query arguments and a sufficiently similar query, the tools node
+    takes the prefetched future instead of running the tool again. A prefetch only
+    searches; side effects such as the SearchIndex row are written when it is taken.
+    """
+
+    # Tools worth prefetching, and how to build their arguments from the user message and agent info
+    ARGUMENT_BUILDERS = {
+        "content_search": lambda text, info: {
+            "query": text,
+            "publication_ids_array": info.get("publication_ids") or info.get("publication_id") or [],
+        },
+        "support_search": lambda text, info: {"query": text},
+    }
+
+    # Side-effect free variants of tools that persist their results: (search, finish on use)
+    SPECULATIVE_RUNNERS = {
+        "content_search": (
+            lambda args: content_search_context(**args),
+            lambda args, context: finish_content_search(args["query"], context),
+        ),
+    }
+
+    def __init__(self, tools: list, min_similarity: float = None, max_workers: int = None):
+        """
+        Initialize the SpeculativePrefetcher.
+
+        Args:
+            tools (list): The agent's tools; only those in ARGUMENT_BUILDERS are prefetched.
+            min_similarity (float): Query similarity needed to reuse a prefetch. Defaults to SPECULATIVE_MIN_SIMILARITY.
+            max_workers (int): Threads running prefetches. Defaults to TOOL_MAX_WORKERS.
+        """
+        self.tools_by_name = {tool.name: tool for tool in tools if tool.name in self.ARGUMENT_BUILDERS}
+        self.min_similarity = config.SPECULATIVE_MIN_SIMILARITY if min_similarity is None else min_similarity
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or config.TOOL_MAX_WORKERS, thread_name_prefix="prefetch")
+        self._pending: Dict[str, List[tuple]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def calls_for(self, text: str, info: dict) -> List[dict]:
+        """Tool calls the agent would be expected to make for this user message."""
+        return [
+            {"name": name, "args": self.ARGUMENT_BUILDERS[name](text, info or {}), "id": f"prefetch-{uuid.uuid4().hex}", "type": "tool_call"}
+            for name in self.tools_by_name
+        ]
+
+    def start(self, key: str, text: str, info: dict):
+        """Start prefetching for the thread, replacing any earlier unused prefetch."""
+        calls = self.calls_for(text, info)
+        pending = [(call, self.executor.submit(self._runner(call["name"]), call["args"])) for call in calls]
+        with self._lock:
+            self._pending[key] = pending
+
+    def _runner(self, name: str):
+        if name in self.SPECULATIVE_RUNNERS:
+            return self.SPECULATIVE_RUNNERS[name][0]
+        return self.tools_by_name[name].invoke
+
+    def _finished(self, call: dict, future: Future) -> Future:
+        """Future of the tool output: the prefetched result, finished (persisted) once it is ready."""
+        if call["name"] not in self.SPECULATIVE_RUNNERS:
+            return future
+        finish = self.SPECULATIVE_RUNNERS[call["name"]][1]
+        result = Future()
+
+        def run(done: Future):
+            if not result.set_running_or_notify_cancel():
+                return
+            try:
+                result.set_result(finish(call["args"], done.result()))
+            except BaseException as e:
+                result.set_exception(e)
+
+        future.add_done_callback(lambda done: self.executor.submit(run, done))
+        return result
+
+    def take(self, key: str, call: dict) -> Optional[Future]:
+        """Return and consume a prefetched future matching the tool call, or None."""
+        with self._lock:
+            pending = self._pending.get(key) or []
+            for i, (prefetched, future) in enumerate(pending):
+                if prefetched["name"] != call["name"]:
+                    continue
+                if _normalize_args(prefetched["args"]) != _normalize_args(call["args"]):
+                    continue
+                if query_similarity(prefetched["args"].get("query", ""), call["args"].get("query", "")) < self.min_similarity:
+                    continue
+                del pending[i]
+                self.hits += 1
+                return self._finished(prefetched, future)
+            self.misses += 1
+            return None
+
+    def discard(self, key: str):
+        """Drop unused prefetches of the thread; their results are not awaited."""
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending:
+            logging.info(f"Discarding {len(pending)} unused prefetches for thread {key}")
+            for _, future in pending:
+                future.cancel()
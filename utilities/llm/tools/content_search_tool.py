@@ -1,109 +1,304 @@
+import asyncio
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import numpy as np
 from langchain_core.tools import tool
-from utilities.database.models.search_index import SearchIndex
-from utilities.vectorstore import PineconeVectorStoreHandler
-import json
+from core.config import config
+from utilities.blocking_executor import run_blocking
+from utilities.payload_store import payload_store
+from utilities.search_index_writer import search_index_writer
+from utilities.keyword_index import get_keyword_index
+from utilities.context_packer import pack_context
+from utilities.vectorstore import get_shared_handler, publication_namespace
+
+_search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="content-search")
+
+def publication_namespaces(publication_ids_array: list[str]) -> list[str] | None:
+    """Namespaces to fan out to when content is sharded per publication, else None."""
+    if not config.PUBLICATION_NAMESPACES or not publication_ids_array:
+        return None
+    return [publication_namespace(publication_id) for publication_id in dict.fromkeys(publication_ids_array)]
+
+def build_filter_criteria(publication_ids_array: list[str], additional_filter_criteria: dict = None) -> dict:
+    """Build the Pinecone metadata filter for the user's publications."""
+    print("publication_ids_array", publication_ids_array)
+    # Apply multi-publication filter; per-publication namespaces make it unnecessary
+    filter_criteria = {
+        "publication_id": {"$in": publication_ids_array}
+    } if publication_ids_array and not publication_namespaces(publication_ids_array) else {}
+    # Merge in any additional filter criteria
+    if additional_filter_criteria:
+        for key, value in additional_filter_criteria.items():
+            filter_criteria[key] = value
+    print(f"Filter criteria applied: {filter_criteria}")
+    return filter_criteria
+
+def save_search_index(query: str, formatted_context: str) -> str | None:
+    """Queue the search for SearchIndex persistence and return its pre-allocated id."""
+    try:
+        return search_index_writer.create(
+            query=query,
+            # Same digest as the ToolMessage's text, so the payload is stored once
+            sources=payload_store.offload(formatted_context),
+        )
+        # formatted_context["metadata"]["internal_source_url"] = f"{os.environ['SEARCH_URL']}/{search_index_id}"
+    except Exception as e:
+        logging.error(f"Failed to save to SearchIndex: {e}")
+        return None
+
+def build_search_response(formatted_context: str, search_index_id: str | None):
+    return {"text" : formatted_context, "internal_source_url": f"{os.environ['SEARCH_URL']}/{search_index_id}"} if search_index_id else formatted_context
+
+def content_search_context(query: str, publication_ids_array: list[str], additional_filter_criteria: dict = None, top_k: int = 3, max_tokens: int = None) -> str:
+    """Search and pack the context of a content_search call, without persisting anything."""
+    filter_criteria = build_filter_criteria(publication_ids_array, additional_filter_criteria)
+    semantic_results = search_content(query, filter_criteria, k=top_k, namespaces=publication_namespaces(publication_ids_array))
+    print(f"Search results: {len(semantic_results)} documents found.")
+    return format_docs(semantic_results, max_tokens=max_tokens)
+
+def finish_content_search(query: str, formatted_context: str):
+    """Persist a search whose context is returned to the model, and build the tool response."""
+    return build_search_response(formatted_context, save_search_index(query, formatted_context))
+
+def search_content(query: str, filter_criteria: dict, k: int = 3, namespaces: list[str] = None) -> list:
+    """
+    Query the vector index and the local keyword index together.
+
+    The vector side returns up to k diverse chunks (MMR over a larger candidate set,
+    cut off by RETRIEVAL_SCORE_THRESHOLD). The keyword results are fused with the
+    vector results; if the vector search fails or exceeds VECTOR_QUERY_TIMEOUT, the
+    keyword results are served alone, provided there are any. Without keyword hits
+    (e.g. no local index on this node) the vector search is awaited up to TOOL_TIMEOUT
+    and its errors are raised. With ``namespaces`` both sides only scan those
+    namespaces (one per subscribed publication).
+    """
+    handler = get_shared_handler()
+    keyword_index = get_keyword_index()
+    # Hybrid (BM25 sparse + dense) candidates; dense only until the BM25 encoder is fitted
+    vector_future = _search_pool.submit(handler.mmr_search, query, k=k, filter=filter_criteria, namespaces=namespaces)
+    started = time.monotonic()
+    keyword_results = keyword_index.search(query, k=k, filter=filter_criteria, namespaces=namespaces) if keyword_index else []
+    try:
+        vector_results = vector_future.result(timeout=config.VECTOR_QUERY_TIMEOUT)
+    except FutureTimeoutError:
+        if keyword_results:
+            logging.error("Vector search timed out, serving keyword results only")
+            return keyword_results
+        # Nothing to fall back on: keep waiting, within the tool's own timeout
+        vector_results = vector_future.result(timeout=max(0.0, config.TOOL_TIMEOUT - (time.monotonic() - started)))
+    except Exception as e:
+        if not keyword_results:
+            raise
+        logging.error(f"Vector search unavailable, serving keyword results only: {e!r}")
+        return keyword_results
+    print(f"Vector search results: {len(vector_results)}, keyword search results: {len(keyword_results)}")
+    return merge_and_rerank(vector_results, keyword_results, k) if keyword_results else vector_results
+
+async def asearch_content(query: str, filter_criteria: dict, k: int = 3, namespaces: list[str] = None) -> list:
+    """Async variant of search_content."""
+    handler = get_shared_handler()
+    keyword_index = get_keyword_index()
+    started = time.monotonic()
+    vector_task = asyncio.ensure_future(handler.ammr_search(query, k=k, filter=filter_criteria, namespaces=namespaces))
+    keyword_results = await asyncio.to_thread(keyword_index.search, query, k, filter_criteria, None, namespaces) if keyword_index else []
+    remaining = max(0.0, config.VECTOR_QUERY_TIMEOUT - (time.monotonic() - started))
+    done, _ = await asyncio.wait({vector_task}, timeout=remaining)
+    if not done and keyword_results:
+        vector_task.cancel()
+        logging.error("Vector search timed out, serving keyword results only")
+        return keyword_results
+    try:
+        # Without keyword hits, keep waiting within the tool's own timeout
+        vector_results = await asyncio.wait_for(vector_task, timeout=max(0.0, config.TOOL_TIMEOUT - (time.monotonic() - started)))
+    except Exception as e:
+        if not keyword_results:
+            raise
+        logging.error(f"Vector search unavailable, serving keyword results only: {e!r}")
+        return keyword_results
+    print(f"Vector search results: {len(vector_results)}, keyword search results: {len(keyword_results)}")
+    return merge_and_rerank(vector_results, keyword_results, k) if keyword_results else vector_results
+
+def search_content_many(queries: list[str], filters: list[dict], k: int = 3, namespaces: list[str] = None) -> list[list]:
+    """
+    search_content for several queries at once: the vector side embeds every query in
+    one request (similarity_search_many) and runs the searches concurrently. Returns one
+    result list per query, in input order, with the same keyword fallback as search_content.
+    """
+    handler = get_shared_handler()
+    keyword_index = get_keyword_index()
+    vector_future = _search_pool.submit(handler.similarity_search_many, queries, filters, k=k, namespaces=namespaces, mmr=True)
+    started = time.monotonic()
+    keyword_results = [
+        keyword_index.search(query, k=k, filter=filter_criteria, namespaces=namespaces) if keyword_index else []
+        for query, filter_criteria in zip(queries, filters)
+    ]
+    try:
+        vector_results = vector_future.result(timeout=config.VECTOR_QUERY_TIMEOUT)
+    except FutureTimeoutError:
+        if any(keyword_results):
+            logging.error("Vector search timed out, serving keyword results only")
+            return keyword_results
+        vector_results = vector_future.result(timeout=max(0.0, config.TOOL_TIMEOUT - (time.monotonic() - started)))
+    except Exception as e:
+        if not any(keyword_results):
+            raise
+        logging.error(f"Vector search unavailable, serving keyword results only: {e!r}")
+        return keyword_results
+    return [merge_and_rerank(vector, keyword, k) if keyword else vector for vector, keyword in zip(vector_results, keyword_results)]
+
+async def asearch_content_many(queries: list[str], filters: list[dict], k: int = 3, namespaces: list[str] = None) -> list[list]:
+    """Async variant of search_content_many."""
+    handler = get_shared_handler()
+    keyword_index = get_keyword_index()
+    started = time.monotonic()
+    vector_task = asyncio.ensure_future(handler.asimilarity_search_many(queries, filters, k=k, namespaces=namespaces, mmr=True))
+    keyword_results = [
+        await asyncio.to_thread(keyword_index.search, query, k, filter_criteria, None, namespaces) if keyword_index else []
+        for query, filter_criteria in zip(queries, filters)
+    ]
+    remaining = max(0.0, config.VECTOR_QUERY_TIMEOUT - (time.monotonic() - started))
+    done, _ = await asyncio.wait({vector_task}, timeout=remaining)
+    if not done and any(keyword_results):
+        vector_task.cancel()
+        logging.error("Vector search timed out, serving keyword results only")
+        return keyword_results
+    try:
+        vector_results = await asyncio.wait_for(vector_task, timeout=max(0.0, config.TOOL_TIMEOUT - (time.monotonic() - started)))
+    except Exception as e:
+        if not any(keyword_results):
+            raise
+        logging.error(f"Vector search unavailable, serving keyword results only: {e!r}")
+        return keyword_results
+    return [merge_and_rerank(vector, keyword, k) if keyword else vector for vector, keyword in zip(vector_results, keyword_results)]
+
+def _batch_groups(calls: list[dict]) -> dict:
+    """Indexes of the content_search calls that can share one search, keyed by (namespaces, top_k)."""
+    groups = {}
+    for i, args in enumerate(calls):
+        namespaces = publication_namespaces(args.get("publication_ids_array") or [])
+        groups.setdefault((tuple(namespaces) if namespaces else None, args.get("top_k", 3)), []).append(i)
+    return groups
+
+def _batch_outputs(calls: list[dict], indexes: list[int], results) -> list:
+    outputs = []
+    for i, docs in zip(indexes, results):
+        formatted_context = format_docs(docs, max_tokens=calls[i].get("max_tokens"))
+        outputs.append(finish_content_search(calls[i]["query"], formatted_context))
+    return outputs
+
+def content_search_batch(calls: list[dict]) -> list:
+    """
+    Outputs of several content_search calls of one tool turn, in call order; the calls
+    sharing namespaces and top_k go through search_content_many together.
+    """
+    outputs = [None] * len(calls)
+    for (namespaces, top_k), indexes in _batch_groups(calls).items():
+        try:
+            results = search_content_many(
+                [calls[i]["query"] for i in indexes],
+                [build_filter_criteria(calls[i].get("publication_ids_array") or [], calls[i].get("additional_filter_criteria")) for i in indexes],
+                k=top_k,
+                namespaces=list(namespaces) if namespaces else None
+            )
+            for i, output in zip(indexes, _batch_outputs(calls, indexes, results)):
+                outputs[i] = output
+        except Exception as e:
+            for i in indexes:
+                outputs[i] = f"Error searching content: {str(e)}"
+    return outputs
+
+async def acontent_search_batch(calls: list[dict]) -> list:
+    """Async variant of content_search_batch."""
+    outputs = [None] * len(calls)
+    for (namespaces, top_k), indexes in _batch_groups(calls).items():
+        try:
+            results = await asearch_content_many(
+                [calls[i]["query"] for i in indexes],
+                [build_filter_criteria(calls[i].get("publication_ids_array") or [], calls[i].get("additional_filter_criteria")) for i in indexes],
+                k=top_k,
+                namespaces=list(namespaces) if namespaces else None
+            )
+            # Storing the SearchIndex rows and payloads writes to Mongo
+            for i, output in zip(indexes, await run_blocking(_batch_outputs, calls, indexes, results)):
+                outputs[i] = output
+        except Exception as e:
+            for i in indexes:
+                outputs[i] = f"Error searching content: {str(e)}"
+    return outputs
 
 @tool
-def content_search(query: str, publication_ids_array: list[str], additional_filter_criteria: dict = None) -> dict:
+def content_search(query: str, publication_ids_array: list[str], additional_filter_criteria: dict = None, top_k: int = 3, max_tokens: int = None) -> dict:
     """
     Search for relevant documents within the user's publications using hybrid search (semantic + keyword).
 
     Args:
         query: The search query in natural language.
-        top_k: Number of results to return (default: 3).
         publication_ids_array: List of publication IDs (as strings) to filter the search.
         additional_filter_criteria: Optional dict of additional filter criteria to merge into the search filter.
+        top_k: Maximum number of results to return (default: 3); fewer are returned when fewer are relevant.
+        max_tokens: Optional cap on the tokens of returned content (default: RETRIEVAL_MAX_TOKENS, 0 for no cap).
 
     Returns:
         Formatted context string from relevant documents.
     """
     print(f"content_search invoked with query: {query}, publication_ids_array: {publication_ids_array}, additional_filter_criteria: {additional_filter_criteria}")
     try:
-       
-        print("publication_ids_array", publication_ids_array)
-        # Apply multi-publication filter
-        filter_criteria = {
-            "publication_id": {"$in": publication_ids_array}
-        } if publication_ids_array else {}
-        # Merge in any additional filter criteria
-        if additional_filter_criteria:
-            for key, value in additional_filter_criteria.items():
-                filter_criteria[key] = value
-        print(f"Filter criteria applied: {filter_criteria}")
-        handler = PineconeVectorStoreHandler()
-        vectorstore = handler.get_vector_store()
-
-        # Semantic search
-        semantic_results = vectorstore.similarity_search(
-            query,
-            k=3,
-            filter=filter_criteria
-        )
-        print(f"Semantic search results: {len(semantic_results)} documents found.") 
-       
-        formatted_context = format_docs(semantic_results)
+        formatted_context = content_search_context(query, publication_ids_array, additional_filter_criteria, top_k=top_k, max_tokens=max_tokens)
+        return finish_content_search(query, formatted_context)
 
-        search_index_id = None
-        try:
-            search_index = SearchIndex(
-                query=query,
-                sources=formatted_context,
-    
-            )
-            search_index.save()
-            search_index_id = str(search_index.id)
-            # formatted_context["metadata"]["internal_source_url"] = f"{os.environ['SEARCH_URL']}/{search_index_id}"
-        except Exception as e:
-            logging.error(f"Failed to save to SearchIndex: {e}")
+    except Exception as e:
+        return f"Error searching content: {str(e)}"
 
-        return {"text" : formatted_context, "internal_source_url": f"{os.environ['SEARCH_URL']}/{search_index_id}"} if search_index_id else formatted_context
+
+async def acontent_search(query: str, publication_ids_array: list[str], additional_filter_criteria: dict = None, top_k: int = 3, max_tokens: int = None) -> dict:
+    """Async variant of content_search used when the agent runs through astream/ainvoke."""
+    print(f"content_search (async) invoked with query: {query}, publication_ids_array: {publication_ids_array}, additional_filter_criteria: {additional_filter_criteria}")
+    try:
+        filter_criteria = build_filter_criteria(publication_ids_array, additional_filter_criteria)
+        semantic_results = await asearch_content(query, filter_criteria, k=top_k, namespaces=publication_namespaces(publication_ids_array))
+        print(f"Search results: {len(semantic_results)} documents found.")
+
+        formatted_context = format_docs(semantic_results, max_tokens=max_tokens)
+        search_index_id = await run_blocking(save_search_index, query, formatted_context)
+        return build_search_response(formatted_context, search_index_id)
 
     except Exception as e:
         return f"Error searching content: {str(e)}"
 
+content_search.coroutine = acontent_search
 
-def format_docs(docs) -> str:
-    """Format search results into JSON context for the LLM"""
-    if not docs:
-        return json.dumps([])
-
-    formatted = []
-    for doc in docs:
-        metadata = doc.metadata
-        # pub_id = metadata.get('publication_id', 'Unknown')
-        # pdf_url = metadata.get('pdf_url', 'N/A')
-        # doc_type = metadata.get('type', 'document')
-        formatted.append({
-            "metadata": metadata,
-            "content": doc.page_content
-        })
-
-    return json.dumps(formatted)
-
-def merge_and_rerank(semantic_results, keyword_results, top_k):
+def format_docs(docs, max_tokens: int = None) -> str:
+    """Format search results into compact, token-budgeted JSON context for the LLM"""
+    return pack_context(docs, max_tokens=max_tokens)
+
+def merge_and_rerank(semantic_results, keyword_results, top_k, k: int = 60):
     """
-    Merge semantic and keyword search results, remove duplicates, and rerank.
-    Documents appearing in both are prioritized.
+    Merge semantic and keyword search results with reciprocal rank fusion.
+    Documents appearing in both lists accumulate score from each and are prioritized.
     """
     # Use doc id or page_content as unique key
     def doc_id(doc):
         # Prefer a unique id if available, else fallback to content hash
         return getattr(doc, "id", None) or hash(doc.page_content)
 
-    seen = {}
-    # Assign a score: +2 if in both, +1 if only in one
-    for doc in semantic_results:
-        key = doc_id(doc)
-        seen[key] = {"doc": doc, "score": 1}
-    for doc in keyword_results:
-        key = doc_id(doc)
-        if key in seen:
-            seen[key]["score"] += 1  # boost if in both
-        else:
-            seen[key] = {"doc": doc, "score": 1}
-    # Sort by score descending, then by original order
-    sorted_docs = sorted(seen.values(), key=lambda x: -x["score"])
-    # Return only the doc objects, up to top_k
-    return [item["doc"] for item in sorted_docs[:top_k]]
\ No newline at end of file
+    docs = {}
+    for doc in list(semantic_results) + list(keyword_results):
+        docs.setdefault(doc_id(doc), doc)
+    if not docs:
+        return []
+    keys = list(docs.keys())
+    position = {key: i for i, key in enumerate(keys)}
+
+    # ranks[list, doc] = 1-based rank of the doc in each result list, 0 when absent
+    ranks = np.zeros((2, len(keys)), dtype=np.float32)
+    for row, results in enumerate((semantic_results, keyword_results)):
+        for rank, doc in enumerate(results, start=1):
+            column = position[doc_id(doc)]
+            if ranks[row, column] == 0:
+                ranks[row, column] = rank
+    scores = np.where(ranks > 0, 1.0 / (k + ranks), 0.0).sum(axis=0)
+    # Stable sort keeps the original order for ties
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [docs[keys[i]] for i in order]
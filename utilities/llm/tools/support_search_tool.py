@@ -1,6 +1,6 @@
 from langchain_core.tools import tool
-from utilities.vectorstore import PineconeVectorStoreHandler
-import json
+from utilities.context_packer import pack_context
+from utilities.vectorstore import get_shared_handler
 
 @tool
 def support_search(query: str) -> str:
@@ -15,9 +15,8 @@ def support_search(query: str) -> str:
     """
     print(f"support_search invoked with query: {query}")
     try:
-        handler = PineconeVectorStoreHandler()
-        vectorstore = handler.get_vector_store()
-        results = vectorstore.similarity_search(query, k=3, namespace="support")
+        handler = get_shared_handler(namespace="support")
+        results = handler.mmr_search(query, k=3)
         print(f"Support search results: {len(results)} documents found.")
         formatted_context = format_docs(results)
         return formatted_context
@@ -25,17 +24,20 @@ def support_search(query: str) -> str:
         return f"Error searching support content: {str(e)}"
 
 
+async def asupport_search(query: str) -> str:
+    """Async variant of support_search used when the agent runs through astream/ainvoke."""
+    print(f"support_search (async) invoked with query: {query}")
+    try:
+        handler = get_shared_handler(namespace="support")
+        results = await handler.ammr_search(query, k=3)
+        print(f"Support search results: {len(results)} documents found.")
+        return format_docs(results)
+    except Exception as e:
+        return f"Error searching support content: {str(e)}"
+
+support_search.coroutine = asupport_search
+
+
 def format_docs(docs) -> str:
-    """Format search results into JSON context for the LLM"""
-    if not docs:
-        return json.dumps([])
-
-    formatted = []
-    for doc in docs:
-        metadata = doc.metadata
-        formatted.append({
-            "metadata": metadata,
-            "content": doc.page_content
-        })
-
-    return json.dumps(formatted)
+    """Format search results into compact, token-budgeted JSON context for the LLM"""
+    return pack_context(docs)
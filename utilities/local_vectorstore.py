@@ -0,0 +1,325 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import hnswlib
+except ImportError:  # optional dependency
+    hnswlib = None
+
+
+def matches_filter(metadata: dict, filter: Optional[dict]) -> bool:
+    """Evaluate a Pinecone-style metadata filter ($eq, $ne, $in, $nin, $gt(e), $lt(e), $and, $or)."""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, expected in condition.items():
+            if op == "$eq" and not _equals(value, expected):
+                return False
+            if op == "$ne" and _equals(value, expected):
+                return False
+            if op == "$in" and not any(_equals(value, item) for item in expected):
+                return False
+            if op == "$nin" and any(_equals(value, item) for item in expected):
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > expected:
+                    return False
+                if op == "$gte" and not value >= expected:
+                    return False
+                if op == "$lt" and not value < expected:
+                    return False
+                if op == "$lte" and not value <= expected:
+                    return False
+    return True
+
+
+def _equals(value: Any, expected: Any) -> bool:
+    # Metadata ids are stored as ints by the PDF ingest but queried as strings by the tools.
+    return value == expected or (value is not None and str(value) == str(expected))
+
+
+class LocalNamespace:
+    """
+    One namespace of the local index.
+
+    Vectors are appended to ``vectors.f32`` and read back through a memory map;
+    ``records.jsonl`` is an append-only log of (id, row, metadata) and tombstones,
+    replayed on load. ``refresh`` replays whatever another process appended since,
+    and the live rows are kept as one contiguous in-memory matrix between writes.
+    """
+
+    def __init__(self, path: str, dimension: int, use_hnsw: bool = False):
+        self.path = path
+        self.dimension = dimension
+        self.use_hnsw = use_hnsw and hnswlib is not None
+        os.makedirs(path, exist_ok=True)
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.records_path = os.path.join(path, "records.jsonl")
+        self.reload()
+
+    def reload(self):
+        """Drop everything in memory and replay the record log from the start."""
+        self.ids: List[Optional[str]] = []
+        self.metadatas: List[Optional[dict]] = []
+        self.rows = {}
+        self._records_offset = 0
+        self._vectors_size = 0
+        self._matrix = None
+        self._live = None
+        self._live_rows = None
+        self._hnsw = None
+        self._load()
+
+    def refresh(self):
+        """Pick up records appended to the log since the last load; reload if the files shrank."""
+        records_size = os.path.getsize(self.records_path) if os.path.exists(self.records_path) else 0
+        vectors_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if records_size < self._records_offset or vectors_size < self._vectors_size:
+            self.reload()
+        elif records_size > self._records_offset:
+            self._load()
+
+    def _load(self):
+        if not os.path.exists(self.records_path):
+            return
+        self._vectors_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        rows_on_disk = self._vectors_size // (4 * self.dimension)
+        changed = False
+        with open(self.records_path, "rb") as f:
+            f.seek(self._records_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # record still being written
+                self._records_offset += len(line)
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("deleted"):
+                    self._tombstone(record["id"])
+                elif record["row"] < rows_on_disk:
+                    self._tombstone(record["id"])
+                    self._set_row(record["row"], record["id"], record["metadata"])
+                changed = True
+        if changed:
+            self._live = None
+            self._hnsw = None
+
+    def _rows_on_disk(self) -> int:
+        if not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (4 * self.dimension)
+
+    def _set_row(self, row: int, vector_id: str, metadata: dict):
+        while len(self.ids) <= row:
+            self.ids.append(None)
+            self.metadatas.append(None)
+        self.ids[row] = vector_id
+        self.metadatas[row] = metadata
+        self.rows[vector_id] = row
+
+    def _tombstone(self, vector_id: str):
+        row = self.rows.pop(vector_id, None)
+        if row is not None:
+            self.ids[row] = None
+            self.metadatas[row] = None
+
+    @property
+    def matrix(self):
+        rows = self._rows_on_disk()
+        if rows == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        if self._matrix is None or self._matrix.shape[0] != rows:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        return self._matrix
+
+    def _live_matrix(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Row numbers of the live vectors and an in-memory copy of them, rebuilt after writes."""
+        if self._live is None:
+            self._live_rows = np.fromiter(self.rows.values(), dtype=np.int64, count=len(self.rows))
+            self._live = np.ascontiguousarray(self.matrix[self._live_rows]) if len(self._live_rows) else np.zeros((0, self.dimension), dtype=np.float32)
+        return self._live_rows, self._live
+
+    def __len__(self):
+        return len(self.rows)
+
+    def upsert(self, records: List[dict]):
+        vectors = np.asarray([record["values"] for record in records], dtype=np.float32).reshape(len(records), self.dimension)
+        row_bytes = 4 * self.dimension
+        with open(self.vectors_path, "ab") as f:
+            start = f.seek(0, os.SEEK_END) // row_bytes
+            f.write(vectors.tobytes())
+        with open(self.records_path, "a", encoding="utf-8") as f:
+            for offset, record in enumerate(records):
+                f.write(json.dumps({"id": record["id"], "row": start + offset, "metadata": record.get("metadata") or {}}) + "\n")
+        self.refresh()
+
+    def delete(self, ids: Iterable[str]):
+        self.refresh()
+        with open(self.records_path, "a", encoding="utf-8") as f:
+            for vector_id in ids:
+                if vector_id in self.rows:
+                    f.write(json.dumps({"id": vector_id, "deleted": True}) + "\n")
+        self.refresh()
+
+    def _hnsw_index(self):
+        if self._hnsw is None:
+            live_rows, live = self._live_matrix()
+            index = hnswlib.Index(space="ip", dim=self.dimension)
+            index.init_index(max_elements=max(len(live_rows), 1), ef_construction=200, M=16)
+            if len(live_rows):
+                index.add_items(live, live_rows)
+            index.set_ef(64)
+            self._hnsw = index
+        return self._hnsw
+
+    def query(self, vector: List[float], k: int, filter: Optional[dict] = None) -> List[Tuple[int, float]]:
+        """Return up to k (row, dot-product score) pairs matching the filter, best first."""
+        if not self.rows:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        if self.use_hnsw:
+            candidates = min(len(self.rows), k if not filter else k * 10)
+            labels, distances = self._hnsw_index().knn_query(q, k=candidates)
+            hits = [(int(row), 1.0 - float(distance)) for row, distance in zip(labels[0], distances[0])]
+            hits = [hit for hit in hits if matches_filter(self.metadatas[hit[0]], filter)]
+            if len(hits) >= k or candidates == len(self.rows):
+                return hits[:k]
+        live_rows, live = self._live_matrix()
+        scores = live @ q
+        if filter:
+            keep = np.fromiter((matches_filter(self.metadatas[row], filter) for row in live_rows), dtype=bool, count=len(live_rows))
+            positions = np.flatnonzero(keep)
+        else:
+            positions = np.arange(len(live_rows))
+        if len(positions) == 0:
+            return []
+        top = positions[np.argsort(-scores[positions])[:k]]
+        return [(int(live_rows[i]), float(scores[i])) for i in top]
+
+    def list_ids(self, prefix: str = "") -> List[str]:
+        return [vector_id for vector_id in self.rows if vector_id.startswith(prefix)]
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store with the PineconeVectorStore surface used by the tools."""
+
+    def __init__(self, path: str, embedding: Embeddings, dimension: int = 1536, namespace: str = None, use_hnsw: bool = False, text_key: str = "text", generation_check_interval: float = 0):
+        """
+        Initialize the LocalVectorStore.
+
+        Args:
+            path (str): Folder holding one subfolder per namespace.
+            embedding (Embeddings): Embedding client for queries and texts.
+            dimension (int): Vector dimensionality.
+            namespace (str, optional): Default namespace.
+            use_hnsw (bool): Serve queries from an HNSW graph when hnswlib is installed.
+            text_key (str): Metadata key holding the chunk text.
+            generation_check_interval (float): Seconds between checks of the index
+                generation; a change reloads every namespace from disk. 0 disables the check.
+        """
+        self.path = path
+        self._embedding = embedding
+        self.dimension = dimension
+        self.namespace = namespace
+        self.use_hnsw = use_hnsw
+        self.text_key = text_key
+        self._namespaces = {}
+        self._lock = threading.RLock()
+        self.generation_check_interval = generation_check_interval
+        self._generation = None
+        self._generation_checked_at = 0.0
+        if use_hnsw and hnswlib is None:
+            logging.warning("hnswlib is not installed, falling back to flat search")
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def get_namespace(self, namespace: str = None) -> LocalNamespace:
+        name = namespace or self.namespace or "__default__"
+        with self._lock:
+            if name not in self._namespaces:
+                self._namespaces[name] = LocalNamespace(os.path.join(self.path, name), self.dimension, self.use_hnsw)
+            return self._namespaces[name]
+
+    def _check_generation(self):
+        """Reload every open namespace when another process bumped the index generation."""
+        if not self.generation_check_interval or time.monotonic() - self._generation_checked_at < self.generation_check_interval:
+            return
+        from utilities.search_cache import read_index_generation
+        self._generation_checked_at = time.monotonic()
+        generation = read_index_generation()
+        if generation is None:
+            return
+        if self._generation is not None and generation != self._generation:
+            for store in self._namespaces.values():
+                store.reload()
+        self._generation = generation
+
+    def upsert(self, records: List[dict], namespace: str = None):
+        with self._lock:
+            self.get_namespace(namespace).upsert(records)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, namespace: str = None, **kwargs) -> List[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        self.upsert([
+            {"id": ids[i], "values": vectors[i], "metadata": {**((metadatas or [{}] * len(texts))[i] or {}), self.text_key: text}}
+            for i, text in enumerate(texts)
+        ], namespace=namespace)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, namespace: str = None, **kwargs):
+        with self._lock:
+            self.get_namespace(namespace).delete(ids or [])
+
+    def _to_document(self, store: LocalNamespace, row: int) -> Document:
+        metadata = dict(store.metadatas[row])
+        text = metadata.pop(self.text_key, "")
+        return Document(page_content=text, metadata=metadata, id=store.ids[row])
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, namespace: str = None) -> List[Tuple[Document, float]]:
+        with self._lock:
+            self._check_generation()
+            store = self.get_namespace(namespace)
+            store.refresh()
+            return [(self._to_document(store, row), score) for row, score in store.query(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None, namespace: str = None, **kwargs) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k, filter=filter, namespace=namespace)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, namespace: str = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter, namespace=namespace)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, namespace: str = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, namespace=namespace)]
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, path: str = "local_vectors", **kwargs) -> "LocalVectorStore":
+        store = cls(path, embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas)
+        return store
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List
+
+from langchain_core.messages import ToolMessage
+
+from core.config import config
+
+REF_PREFIX = "payload:sha256:"
+# Reference to a JSON-serialized non-string value (list, object, ...)
+JSON_REF_PREFIX = "json:" + REF_PREFIX
+
+
+class PayloadStore:
+    """
+    Content-addressed side store for large tool outputs.
+
+    A payload is saved once under its sha256 and replaced in the message state by a
+    reference string (``payload:sha256:<digest>``), so the full text is no longer
+    serialized into every later checkpoint of a thread. References are resolved on
+    demand; recently stored or loaded payloads are kept in a small LRU.
+    """
+
+    def __init__(self, min_bytes: int = 2048, cache_size: int = 256):
+        """
+        Initialize the PayloadStore.
+
+        Args:
+            min_bytes (int): Values smaller than this stay inline; 0 disables offloading.
+            cache_size (int): Payloads kept in memory.
+        """
+        self.min_bytes = min_bytes
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_ref(value) -> bool:
+        return isinstance(value, str) and value.startswith(REF_PREFIX)
+
+    def _remember(self, digest: str, content: str):
+        with self._lock:
+            self._cache[digest] = content
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def offload(self, value: str) -> str:
+        """Store ``value`` if it is large and return its reference, else return it unchanged."""
+        from utilities.database.models.tool_payload import ToolPayload
+        if not self.min_bytes or not isinstance(value, str) or self.is_ref(value):
+            return value
+        data = value.encode("utf-8")
+        if len(data) < self.min_bytes:
+            return value
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            known = digest in self._cache
+        if not known:
+            try:
+                ToolPayload.objects(id=digest).update_one(
+                    set_on_insert__content=value,
+                    set_on_insert__size=len(data),
+                    set_on_insert__created_at=datetime.utcnow(),
+                    upsert=True
+                )
+            except Exception as e:
+                # Keep the payload inline rather than lose it
+                logging.error(f"Failed to store tool payload: {e}")
+                return value
+            self._remember(digest, value)
+        return REF_PREFIX + digest
+
+    def resolve(self, value):
+        """Return the payload a reference points at; other values are returned unchanged."""
+        from utilities.database.models.tool_payload import ToolPayload
+        if not self.is_ref(value):
+            return value
+        digest = value[len(REF_PREFIX):]
+        with self._lock:
+            content = self._cache.get(digest)
+        if content is None:
+            record = ToolPayload.objects(id=digest).first()
+            if record is None:
+                logging.error(f"Tool payload {digest} not found")
+                return value
+            content = record.content
+            self._remember(digest, content)
+        return content
+
+    def _offload_field(self, value):
+        """Offload a field of a JSON object; lists and objects are stored in serialized form."""
+        if not isinstance(value, (dict, list)):
+            return self.offload(value)
+        serialized = json.dumps(value, ensure_ascii=False)
+        ref = self.offload(serialized)
+        return "json:" + ref if self.is_ref(ref) else value
+
+    def _resolve_field(self, value):
+        if isinstance(value, str) and value.startswith(JSON_REF_PREFIX):
+            resolved = self.resolve(value[len("json:"):])
+            try:
+                return json.loads(resolved)
+            except ValueError:
+                return resolved
+        return self.resolve(value)
+
+    def offload_content(self, content: str) -> str:
+        """Offload a tool output; the large fields of a JSON object are offloaded one by one, so
+        small fields such as internal_source_url stay readable in the state."""
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            return self.offload(content)
+        if not isinstance(data, dict):
+            return self.offload(content)
+        slim = {key: self._offload_field(value) for key, value in data.items()}
+        return json.dumps(slim, ensure_ascii=False) if slim != data else content
+
+    def resolve_content(self, content):
+        """Inverse of offload_content."""
+        if self.is_ref(content):
+            return self.resolve(content)
+        if not isinstance(content, str) or REF_PREFIX not in content:
+            return content
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return content
+        if not isinstance(data, dict):
+            return content
+        return json.dumps({key: self._resolve_field(value) for key, value in data.items()}, ensure_ascii=False)
+
+    def resolve_messages(self, messages: List) -> List:
+        """Copies of the ToolMessages with their payloads loaded, e.g. before an LLM call."""
+        return [
+            message.model_copy(update={"content": self.resolve_content(message.content)})
+            if isinstance(message, ToolMessage) and isinstance(message.content, str) and REF_PREFIX in message.content
+            else message
+            for message in messages
+        ]
+
+
+payload_store = PayloadStore(
+    min_bytes=config.TOOL_PAYLOAD_MIN_BYTES,
+    cache_size=config.TOOL_PAYLOAD_CACHE_SIZE,
+)
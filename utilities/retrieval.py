@@ -0,0 +1,76 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+def mmr_select(query_vector: List[float], vectors, k: int, lambda_mult: float = 0.5, relevance=None) -> List[int]:
+    """
+    Vectorized Maximal Marginal Relevance.
+
+    Args:
+        query_vector (list): Query embedding.
+        vectors: Candidate embeddings, one row per candidate.
+        k (int): Number of candidates to select.
+        lambda_mult (float): 1 ranks by relevance only, 0 by diversity only.
+        relevance (optional): Precomputed relevance per candidate (e.g. hybrid index
+            scores). Defaults to the cosine similarity with the query.
+
+    Returns:
+        list: Indices of the selected candidates, in selection order.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if k <= 0 or len(vectors) == 0:
+        return []
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1.0, norms)
+    if relevance is None:
+        query = np.asarray(query_vector, dtype=np.float32)
+        relevance = unit @ (query / (np.linalg.norm(query) or 1.0))
+    relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = unit @ unit.T
+
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of every candidate to anything already selected
+    redundancy = similarity[selected[0]].copy()
+    for _ in range(min(k, len(vectors)) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        chosen = int(np.argmax(scores))
+        selected.append(chosen)
+        redundancy = np.maximum(redundancy, similarity[chosen])
+    return selected
+
+
+def select_diverse(
+    query_vector: List[float],
+    candidates: List[Tuple[Document, float, List[float]]],
+    k: int,
+    lambda_mult: float = 0.5,
+    score_threshold: Optional[float] = None,
+) -> List[Document]:
+    """
+    Drop candidates scoring below the threshold, then pick up to k of the rest with MMR.
+
+    Args:
+        query_vector (list): Query embedding.
+        candidates (list): (Document, index score, embedding) triples, best first.
+        k (int): Maximum number of results.
+        lambda_mult (float): MMR relevance/diversity trade-off.
+        score_threshold (float, optional): Minimum index score a result must reach.
+
+    Returns:
+        list: Selected Documents, in MMR order.
+    """
+    if score_threshold is not None:
+        candidates = [candidate for candidate in candidates if candidate[1] >= score_threshold]
+    if not candidates:
+        return []
+    order = mmr_select(
+        query_vector,
+        [vector for _, _, vector in candidates],
+        k,
+        lambda_mult=lambda_mult,
+        relevance=[score for _, score, _ in candidates],
+    )
+    return [candidates[i][0] for i in order]
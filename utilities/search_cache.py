@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+
+from core.config import config
+from utilities.embedding_cache import normalize_query
+
+GENERATION_NAME = "vectors"
+
+
+def canonicalize_filter(filter: Optional[dict]):
+    """Return the filter with sorted keys and sorted $in/$nin lists, so equivalent filters share a key."""
+    if isinstance(filter, dict):
+        return {
+            key: sorted(map(str, value)) if key in ("$in", "$nin") and isinstance(value, list) else canonicalize_filter(value)
+            for key, value in sorted(filter.items())
+        }
+    if isinstance(filter, list):
+        return [canonicalize_filter(item) for item in filter]
+    return filter
+
+
+def bump_index_generation():
+    """Invalidate every node's search result cache after an ingest."""
+    from utilities.database.models.index_generation import IndexGeneration
+    try:
+        IndexGeneration.objects(name=GENERATION_NAME).update_one(
+            inc__value=1,
+            set__updated_at=datetime.utcnow(),
+            upsert=True
+        )
+    except Exception as e:
+        logging.error(f"Failed to bump index generation: {e}")
+
+
+def read_index_generation() -> Optional[int]:
+    from utilities.database.models.index_generation import IndexGeneration
+    try:
+        record = IndexGeneration.objects(name=GENERATION_NAME).first()
+        return record.value if record else 0
+    except Exception as e:
+        logging.error(f"Failed to read index generation: {e}")
+        return None
+
+
+class SearchResultCache:
+    """
+    TTL/LRU cache of similarity search results.
+
+    Entries are keyed by (query hash, canonical filter, namespace, k). The cache is
+    dropped whenever the index generation stored in Mongo changes, which the ingest
+    commands bump after writing to the index; the generation is re-read at most every
+    ``generation_check_interval`` seconds.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: int = 3600, generation_check_interval: int = 30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation_check_interval = generation_check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = None
+        self._generation_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query: str, filter: Optional[dict], namespace: Optional[str], k: int, **extra) -> str:
+        payload = json.dumps({
+            "query": hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest(),
+            "filter": canonicalize_filter(filter or {}),
+            "namespace": namespace or "",
+            "k": k,
+            **extra
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def generation_check_due(self) -> bool:
+        return time.monotonic() - self._generation_checked_at >= self.generation_check_interval
+
+    def check_generation(self, generation: Optional[int] = None):
+        """Drop all entries if the index generation moved since the last check."""
+        if generation is None:
+            generation = read_index_generation()
+        self._generation_checked_at = time.monotonic()
+        if generation is None:
+            return
+        with self._lock:
+            if self.generation is not None and generation != self.generation:
+                self._entries.clear()
+                self.invalidations += 1
+            self.generation = generation
+
+    def get(self, key: str) -> Optional[List]:
+        if self.generation_check_due():
+            self.check_generation()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, results = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(results)
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, results: List):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), list(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "generation": self.generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+search_result_cache = SearchResultCache(
+    max_size=config.SEARCH_CACHE_SIZE,
+    ttl=config.SEARCH_CACHE_TTL,
+    generation_check_interval=config.SEARCH_CACHE_GENERATION_CHECK_SECONDS,
+)
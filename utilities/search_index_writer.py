@@ -0,0 +1,141 @@
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from core.config import config
+
+
+class SearchIndexWriter:
+    """
+    Process-level write-behind buffer for SearchIndex documents.
+
+    Ids are allocated up front so callers can hand out ``internal_source_url``
+    immediately. Every write is a ``$set`` keyed by id, so the insert from
+    content_search and the later final-answer update of the same search coalesce into
+    one upsert. Buffered writes are flushed with ``bulk_write`` when ``flush_size``
+    documents are pending or every ``flush_interval`` seconds; a failed flush puts the
+    batch back (the upserts are idempotent) and the next flush retries it.
+
+    Buffering relies on a long-lived process for the background flush and the exit
+    drain; on serverless deployments leave ``write_behind`` off and every write goes
+    straight to Mongo.
+    """
+
+    def __init__(self, flush_size: int = 100, flush_interval: float = 2.0, write_behind: bool = False):
+        """
+        Initialize the SearchIndexWriter.
+
+        Args:
+            flush_size (int): Pending documents that trigger an immediate flush.
+            flush_interval (float): Seconds between background flushes.
+            write_behind (bool): Buffer writes; when False each write is a direct upsert.
+        """
+        self.write_behind = write_behind
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = OrderedDict()  # ObjectId -> fields to $set
+        self._inflight = {}  # batch currently being written
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self.flushed = 0
+        self.failed_flushes = 0
+
+    def _collection(self):
+        from utilities.database.models.search_index import SearchIndex
+        return SearchIndex._get_collection()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="search-index-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _enqueue(self, search_index_id: ObjectId, fields: dict):
+        if not self.write_behind:
+            self._collection().update_one({"_id": search_index_id}, {"$set": fields}, upsert=True)
+            return
+        with self._lock:
+            self._pending.setdefault(search_index_id, {}).update(fields)
+            pending = len(self._pending)
+            if not self._closed:
+                self._ensure_thread()
+        if self._closed:
+            # Nothing drains the buffer after close(); write through instead
+            self.flush()
+        elif pending >= self.flush_size:
+            self._wake.set()
+
+    def create(self, **fields) -> str:
+        """Buffer a new SearchIndex document and return its pre-allocated id."""
+        search_index_id = ObjectId()
+        self._enqueue(search_index_id, fields)
+        return str(search_index_id)
+
+    def update(self, search_index_id: str, **fields):
+        """Buffer a $set on a SearchIndex document, merged with any pending write of the same id."""
+        self._enqueue(ObjectId(search_index_id), fields)
+
+    def pending(self, search_index_id: str) -> Optional[dict]:
+        """Fields of a document that has not been flushed yet, or None."""
+        with self._lock:
+            _id = ObjectId(search_index_id)
+            if _id not in self._pending and _id not in self._inflight:
+                return None
+            return {**self._inflight.get(_id, {}), **self._pending.get(_id, {})}
+
+    def flush(self) -> int:
+        """Write all pending documents; returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, OrderedDict()
+                self._inflight = batch
+            if not batch:
+                return 0
+            try:
+                self._collection().bulk_write(
+                    [UpdateOne({"_id": _id}, {"$set": fields}, upsert=True) for _id, fields in batch.items()],
+                    ordered=False
+                )
+            except Exception as e:
+                self.failed_flushes += 1
+                logging.error(f"Failed to flush {len(batch)} SearchIndex writes, will retry: {e}")
+                with self._lock:
+                    # Writes buffered since the batch was taken are newer and win
+                    for _id, fields in batch.items():
+                        self._pending[_id] = {**fields, **self._pending.get(_id, {})}
+                    self._inflight = {}
+                return 0
+            with self._lock:
+                self._inflight = {}
+            self.flushed += len(batch)
+            return len(batch)
+
+    def close(self):
+        """Stop the background flusher and drain the buffer."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        if self.flush() == 0 and self._pending:
+            logging.error(f"{len(self._pending)} SearchIndex writes could not be flushed on shutdown")
+
+
+search_index_writer = SearchIndexWriter(
+    flush_size=config.SEARCH_INDEX_FLUSH_SIZE,
+    flush_interval=config.SEARCH_INDEX_FLUSH_INTERVAL,
+    write_behind=config.SEARCH_INDEX_WRITE_BEHIND,
+)
+atexit.register(search_index_writer.close)
@@ -0,0 +1,173 @@
+import logging
+import re
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "how", "i", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "which",
+    "who", "why", "will", "with", "you", "your", "do", "does", "can", "my", "me", "we", "our",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords; numbers are kept so "week 12" stays searchable."""
+    return [token for token in _TOKEN_RE.findall((text or "").lower()) if token not in STOPWORDS]
+
+
+def term_index(term: str) -> int:
+    """Stable sparse dimension of a term."""
+    return zlib.crc32(term.encode("utf-8")) & 0xFFFFFFFF
+
+
+class BM25Encoder:
+    """
+    BM25 sparse encoder for Pinecone sparse-dense vectors.
+
+    Documents are encoded with the BM25 term-frequency saturation and length
+    normalisation; queries carry the IDF weights, so the dot product of the two is
+    the BM25 score. Corpus statistics are fitted at ingest time and persisted in Mongo,
+    one document per term, so the vocabulary is not bound by the document size limit.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.n_docs = 0
+        self.avg_doc_len = 0.0
+        self.doc_freq: Dict[int, int] = {}
+        self._dirty = set()
+        self._reset = False
+
+    def partial_fit(self, texts: List[str], removed_texts: List[str] = None):
+        """
+        Update the corpus statistics.
+
+        Args:
+            texts (list): Documents added to the corpus.
+            removed_texts (list, optional): Documents deleted from the corpus, or replaced
+                by one of ``texts``; their counts are subtracted.
+        """
+        total_len = self.avg_doc_len * self.n_docs
+        for sign, batch in ((1, texts), (-1, removed_texts or [])):
+            for text in batch:
+                tokens = tokenize(text)
+                total_len += sign * len(tokens)
+                for index in {term_index(token) for token in tokens}:
+                    count = self.doc_freq.get(index, 0) + sign
+                    if count > 0:
+                        self.doc_freq[index] = count
+                    else:
+                        self.doc_freq.pop(index, None)
+                    self._dirty.add(index)
+            self.n_docs = max(0, self.n_docs + sign * len(batch))
+        self.avg_doc_len = max(0.0, total_len) / self.n_docs if self.n_docs else 0.0
+        return self
+
+    def fit(self, texts: List[str]):
+        self.n_docs, self.avg_doc_len, self.doc_freq = 0, 0.0, {}
+        self._dirty, self._reset = set(), True
+        return self.partial_fit(texts)
+
+    def encode_documents(self, texts: List[str]) -> List[dict]:
+        encoded = []
+        avg_doc_len = self.avg_doc_len or 1.0
+        for text in texts:
+            tokens = tokenize(text)
+            counts = Counter(term_index(token) for token in tokens)
+            if not counts:
+                encoded.append({"indices": [], "values": []})
+                continue
+            indices = np.fromiter(counts.keys(), dtype=np.int64)
+            tf = np.fromiter(counts.values(), dtype=np.float32)
+            values = tf / (tf + self.k1 * (1 - self.b + self.b * len(tokens) / avg_doc_len))
+            encoded.append({"indices": indices.tolist(), "values": values.tolist()})
+        return encoded
+
+    def idf(self, indices: np.ndarray) -> np.ndarray:
+        df = np.array([self.doc_freq.get(int(index), 0) for index in indices], dtype=np.float32)
+        return np.log((self.n_docs - df + 0.5) / (df + 0.5) + 1.0)
+
+    def encode_queries(self, texts: List[str]) -> List[dict]:
+        encoded = []
+        for text in texts:
+            indices = np.array(sorted({term_index(token) for token in tokenize(text)}), dtype=np.int64)
+            if len(indices) == 0:
+                encoded.append({"indices": [], "values": []})
+                continue
+            weights = self.idf(indices)
+            total = weights.sum()
+            values = weights / total if total > 0 else weights
+            encoded.append({"indices": indices.tolist(), "values": values.tolist()})
+        return encoded
+
+    def save(self, name: str = "default", batch_size: int = 1000):
+        """Persist the parameters and the document frequencies changed since the last save."""
+        from pymongo import DeleteOne, UpdateOne
+        from utilities.database.models.sparse_encoder_params import SparseEncoderParams
+        from utilities.database.models.sparse_encoder_term import SparseEncoderTerm
+        terms = SparseEncoderTerm._get_collection()
+        if self._reset:
+            terms.delete_many({"name": name})
+        dirty = sorted(self._dirty)
+        for i in range(0, len(dirty), batch_size):
+            terms.bulk_write([
+                UpdateOne({"name": name, "term": index}, {"$set": {"doc_freq": self.doc_freq[index]}}, upsert=True)
+                if index in self.doc_freq else DeleteOne({"name": name, "term": index})
+                for index in dirty[i:i + batch_size]
+            ], ordered=False)
+        SparseEncoderParams.objects(name=name).update_one(
+            set__k1=self.k1,
+            set__b=self.b,
+            set__n_docs=self.n_docs,
+            set__avg_doc_len=self.avg_doc_len,
+            unset__doc_freq=True,
+            set__updated_at=datetime.utcnow(),
+            upsert=True
+        )
+        self._dirty, self._reset = set(), False
+
+    @classmethod
+    def load(cls, name: str = "default"):
+        """Load persisted parameters; returns None when the encoder was never fitted."""
+        from utilities.database.models.sparse_encoder_params import SparseEncoderParams
+        from utilities.database.models.sparse_encoder_term import SparseEncoderTerm
+        try:
+            record = SparseEncoderParams.objects(name=name).first()
+            if record is None:
+                return None
+            encoder = cls(k1=record.k1, b=record.b)
+            encoder.n_docs = record.n_docs
+            encoder.avg_doc_len = record.avg_doc_len
+            encoder.doc_freq = {
+                term["term"]: term["doc_freq"]
+                for term in SparseEncoderTerm._get_collection().find({"name": name}, {"_id": 0, "term": 1, "doc_freq": 1})
+            }
+            if not encoder.doc_freq and record.doc_freq:
+                # Saved before the vocabulary moved to its own collection; rewritten on the next save
+                encoder.doc_freq = {int(index): count for index, count in record.doc_freq.items()}
+                encoder._reset, encoder._dirty = True, set(encoder.doc_freq)
+        except Exception as e:
+            logging.error(f"Failed to load BM25 parameters: {e}")
+            return None
+        return encoder
+
+
+def hybrid_scale(dense: List[float], sparse: dict, alpha: float):
+    """
+    Convex combination of dense and sparse query vectors for a dotproduct index.
+
+    Returns:
+        tuple: (scaled dense values, scaled sparse vector); score = alpha * dense + (1 - alpha) * sparse.
+    """
+    if not 0 <= alpha <= 1:
+        raise ValueError("alpha must be between 0 and 1")
+    dense_values = (np.asarray(dense, dtype=np.float32) * alpha).tolist()
+    sparse_values = (np.asarray(sparse["values"], dtype=np.float32) * (1 - alpha)).tolist()
+    return dense_values, {"indices": sparse["indices"], "values": sparse_values}
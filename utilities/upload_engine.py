@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import tiktoken
+from rich.console import Console
+
+console = Console()
+
+
+def get_token_encoding(model: str = "text-embedding-ada-002"):
+    """Return the tiktoken encoding of the model, cl100k_base for unknown models."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def get_token_counter(model: str = "text-embedding-ada-002") -> Callable[[str], int]:
+    """Return a function counting the tokens a text costs for the given embedding model."""
+    encoding = get_token_encoding(model)
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``capacity`` units per minute."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.rate = capacity / 60.0
+        self.available = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available (0 when they are available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.available >= amount else (amount - self.available) / self.rate
+
+    def consume(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter built from two token buckets."""
+
+    def __init__(self, requests_per_min: int, tokens_per_min: int):
+        self.requests = TokenBucket(requests_per_min)
+        self.tokens = TokenBucket(tokens_per_min)
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self, tokens: int):
+        """Block until one request carrying ``tokens`` tokens may be sent."""
+        with self._lock:
+            while True:
+                wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if wait <= 0:
+                    self.requests.consume(1)
+                    self.tokens.consume(tokens)
+                    return
+                self.waited += wait
+                time.sleep(wait)
+
+
+class BatchUploader:
+    """
+    Pipelined embed-and-upsert engine.
+
+    Chunks are grouped into batches bounded by count and token size. Embedding of a
+    batch is started as soon as the rate limiter allows it, and its upsert runs on a
+    separate pool, so the embedding of batch N+1 overlaps the upsert of batch N. At most
+    ``max_in_flight`` batches are being embedded or upserted at any time.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        upsert_fn: Callable[[List[dict]], None],
+        limiter: RateLimiter,
+        count_tokens: Callable[[str], int],
+        cost_fn: Optional[Callable[[List[str]], List[str]]] = None,
+        batch_size: int = 100,
+        max_batch_tokens: int = 100000,
+        max_in_flight: int = 4,
+    ):
+        """
+        Initialize the BatchUploader.
+
+        Args:
+            embed_fn: Embeds a list of texts.
+            upsert_fn: Writes a list of vector records ({"id", "values", "metadata"}).
+            limiter: Rate limiter for the embedding API.
+            count_tokens: Counts the tokens of a single text.
+            cost_fn: Returns the subset of a batch that will actually hit the embedding API
+                (e.g. texts missing from the embedding archive). Defaults to the whole batch.
+            batch_size: Maximum chunks per embedding request.
+            max_batch_tokens: Maximum tokens per embedding request.
+            max_in_flight: Maximum number of batches being embedded or upserted concurrently.
+        """
+        self.embed_fn = embed_fn
+        self.upsert_fn = upsert_fn
+        self.limiter = limiter
+        self.count_tokens = count_tokens
+        self.cost_fn = cost_fn
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_in_flight = max_in_flight
+
+    def make_batches(self, items: List[dict]) -> List[List[dict]]:
+        """Group items into batches bounded by batch_size and max_batch_tokens."""
+        batches, current, current_tokens = [], [], 0
+        for item in items:
+            item["tokens"] = self.count_tokens(item["text"])
+            if current and (len(current) >= self.batch_size or current_tokens + item["tokens"] > self.max_batch_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += item["tokens"]
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_and_upsert(self, batch: List[dict], upsert_pool: ThreadPoolExecutor, slots: threading.Semaphore, errors: list):
+        try:
+            vectors = self.embed_fn([item["text"] for item in batch])
+            records = [
+                {"id": item["id"], "values": vector, "metadata": item["metadata"]}
+                for item, vector in zip(batch, vectors)
+            ]
+        except Exception as e:
+            errors.append(e)
+            slots.release()
+            return
+
+        def upsert():
+            try:
+                self.upsert_fn(records)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                slots.release()
+
+        upsert_pool.submit(upsert)
+
+    def upload(self, texts: List[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, text_key: str = "text") -> dict:
+        """
+        Embed and upsert texts, returning throughput statistics.
+
+        Args:
+            texts: Chunk texts.
+            metadatas: Optional metadata per chunk; the text is stored under ``text_key``.
+            ids: Optional vector ids; random ids are generated when omitted.
+            text_key: Metadata key holding the chunk text (LangChain's PineconeVectorStore uses "text").
+
+        Returns:
+            dict: chunks, tokens, embedded_tokens, batches, seconds, chunks_per_sec, tokens_per_sec, throttled_seconds.
+        """
+        items = [
+            {
+                "id": ids[i] if ids else str(uuid.uuid4()),
+                "text": text,
+                "metadata": {**(metadatas[i] if metadatas and metadatas[i] else {}), text_key: text},
+            }
+            for i, text in enumerate(texts)
+        ]
+        start = time.monotonic()
+        batches = self.make_batches(items)
+        slots = threading.Semaphore(self.max_in_flight)
+        errors = []
+        total_tokens = sum(item["tokens"] for item in items)
+        embedded_tokens = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="embed") as embed_pool, \
+                ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="upsert") as upsert_pool:
+            for n, batch in enumerate(batches, start=1):
+                if errors:
+                    break
+                batch_texts = [item["text"] for item in batch]
+                billable = self.cost_fn(batch_texts) if self.cost_fn else batch_texts
+                batch_tokens = sum(self.count_tokens(text) for text in billable) if self.cost_fn else sum(item["tokens"] for item in batch)
+                slots.acquire()
+                if billable:
+                    self.limiter.acquire(batch_tokens)
+                embedded_tokens += batch_tokens
+                embed_pool.submit(self._embed_and_upsert, batch, upsert_pool, slots, errors)
+                if n % 10 == 0:  # Log progress every 10 batches
+                    console.print(f"[cyan]Submitted {n}/{len(batches)} batches...[/cyan]")
+            # Wait for every in-flight batch, including upserts queued by the embed pool.
+            for _ in range(self.max_in_flight):
+                slots.acquire()
+
+        if errors:
+            raise errors[0]
+
+        seconds = max(time.monotonic() - start, 1e-9)
+        stats = {
+            "chunks": len(items),
+            "tokens": total_tokens,
+            "embedded_tokens": embedded_tokens,
+            "batches": len(batches),
+            "seconds": round(seconds, 2),
+            "chunks_per_sec": round(len(items) / seconds, 2),
+            "tokens_per_sec": round(total_tokens / seconds, 2),
+            "throttled_seconds": round(self.limiter.waited, 2),
+        }
+        logging.info(f"Upload stats: {stats}")
+        console.print(
+            f"[green]Uploaded {stats['chunks']} chunks ({stats['tokens']} tokens) in {stats['seconds']}s: "
+            f"{stats['chunks_per_sec']} chunks/s, {stats['tokens_per_sec']} tokens/s[/green]"
+        )
+        return stats
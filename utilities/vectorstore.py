@@ -1,21 +1,44 @@
+import asyncio
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 # from pinecone.grpc import PineconeGRPC as Pinecone
 from pinecone import Pinecone
 from pinecone import ServerlessSpec, PodSpec
 from langchain_pinecone import PineconeVectorStore
 from langchain_openai import OpenAIEmbeddings
+from core.config import config
+from utilities.chunk_ids import source_prefix
+from utilities.embedding_archive import ArchivedEmbeddings, get_embedding_archive
+from utilities.embedding_cache import CachedQueryEmbeddings
+from utilities.local_vectorstore import LocalVectorStore
+from utilities.retrieval import select_diverse
+from utilities.search_cache import search_result_cache
+from utilities.sparse_encoder import BM25Encoder, hybrid_scale
+from langchain_core.documents import Document
+from utilities.upload_engine import BatchUploader, RateLimiter, get_token_counter
 # from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import CharacterTextSplitter
 from rich.console import Console
 
 console = Console()
+
+# Process-wide registry of warm handlers keyed by (index_name, namespace), and
+# the set of indexes whose readiness has already been confirmed.
+_shared_handlers = {}
+_ready_indexes = set()
+_shared_lock = threading.Lock()
+# Fan-out of sharded searches to one namespace per publication
+_shard_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="shard-search")
+
 # OPENAI_API_KEY = "<YOUR_OPENAI_API_KEY>"
 # PINECONE_API_KEY = "<YOUR_PINECONE_API_KEY>"
 # INDEX_NAME = "langchain-retrieval-augmentation-fast"
 # os.environ['OPENAI_API_KEY'] = OPENAI_API_KEY
 class PineconeVectorStoreHandler:
-    def __init__(self, use_serverless=True, dimension=1536, cloud="aws", region="us-east-1"):
+    def __init__(self, use_serverless=True, dimension=1536, cloud="aws", region="us-east-1", namespace=None):
         """
         Initialize the PineconeVectorStoreHandler.
 
@@ -26,15 +49,24 @@ class PineconeVectorStoreHandler:
             dimension (int): Dimensionality of the embeddings. Default is 1536.
             cloud (str): Cloud provider for serverless spec. Default is 'aws'.
             region (str): Region for serverless spec. Default is 'us-east-1'.
+            namespace (str): Namespace used by the vector store returned from get_vector_store.
         """
         try:
             print("index_name", os.environ['PINECONE_INDEX_NAME'])
             self.index_name = os.environ['PINECONE_INDEX_NAME']
+            self.namespace = namespace
             self.dimension = dimension
             self.use_serverless = use_serverless
             self.pc = Pinecone(api_key=os.environ['PINECONE_API_KEY'])
             self.spec = ServerlessSpec(cloud=cloud, region=region) if use_serverless else PodSpec()
             self.index = None
+            self._embeddings = None
+            self._ingest_embeddings = None
+            self._vector_store = None
+            self._sparse_encoder = None
+            self._sparse_generation = None
+            self._sparse_loaded = False
+            self.last_upload_stats = None
             self._initialize_index()
         except KeyError as e:
             raise ValueError(f"Missing environment variable: {str(e)}")
@@ -44,6 +76,9 @@ class PineconeVectorStoreHandler:
     def _initialize_index(self):
         """Create or reset the Pinecone index."""
         try:
+            if self.index_name in _ready_indexes:
+                self.index = self.pc.Index(self.index_name)
+                return
             print("...Initialize the Pinecone index")
             if not self.pc.has_index(self.index_name):
                 self.pc.create_index(
@@ -55,6 +90,7 @@ class PineconeVectorStoreHandler:
             while not self.pc.describe_index(self.index_name).status['ready']:
                 time.sleep(1)
             self.index = self.pc.Index(self.index_name)
+            _ready_indexes.add(self.index_name)
         except Exception as e:
             print(f"Error initializing index: {str(e)}")
             raise
@@ -70,15 +106,344 @@ class PineconeVectorStoreHandler:
         try:
             with console.status("[cyan]Deleting...[/cyan]", spinner="monkey"):
                 self.pc.delete_index(self.index_name)
+                _ready_indexes.discard(self.index_name)
+                self._vector_store = None
             with console.status("[cyan]Creating...[/cyan]", spinner="monkey"):
                 self._initialize_index()
         except Exception as e:
             print(f"Error deleting & reinitializing index: {str(e)}")
             raise
 
+    @property
+    def embeddings(self):
+        """Embedding client shared by every vector store built from this handler."""
+        if self._embeddings is None:
+            self._embeddings = CachedQueryEmbeddings(OpenAIEmbeddings())
+        return self._embeddings
+
+    @property
+    def ingest_embeddings(self):
+        """Embedding client for uploads, backed by the embedding archive when one is configured."""
+        if self._ingest_embeddings is None:
+            embeddings = OpenAIEmbeddings()
+            archive = None
+            if config.EMBEDDING_ARCHIVE_DIR:
+                archive = get_embedding_archive(config.EMBEDDING_ARCHIVE_DIR, embeddings.model, self.dimension)
+            self._ingest_embeddings = ArchivedEmbeddings(embeddings, archive) if archive else embeddings
+        return self._ingest_embeddings
+
+    def _build_vector_store(self):
+        """Return the warm PineconeVectorStore bound to this handler's index and namespace."""
+        if self._vector_store is None:
+            self._vector_store = PineconeVectorStore(
+                index=self.index,
+                embedding=self.embeddings,
+                namespace=self.namespace
+            )
+        return self._vector_store
+
+    def similarity_search(self, query: str, k: int = 3, filter: dict = None, namespace: str = None) -> list:
+        """
+        Similarity search served through the shared search result cache.
+
+        Args:
+            query (str): Query text.
+            k (int): Number of results.
+            filter (dict, optional): Metadata filter.
+            namespace (str, optional): Namespace override.
+
+        Returns:
+            list: Matching Documents.
+        """
+        namespace = namespace or self.namespace
+        key = search_result_cache.make_key(query, filter, namespace, k, index=self.index_name)
+        results = search_result_cache.get(key)
+        if results is None:
+            results = self._build_vector_store().similarity_search(query, k=k, filter=filter or None, namespace=namespace)
+            search_result_cache.set(key, results)
+        return results
+
+    async def asimilarity_search(self, query: str, k: int = 3, filter: dict = None, namespace: str = None) -> list:
+        """Async variant of similarity_search."""
+        namespace = namespace or self.namespace
+        if search_result_cache.generation_check_due():
+            await asyncio.to_thread(search_result_cache.check_generation)
+        key = search_result_cache.make_key(query, filter, namespace, k, index=self.index_name)
+        results = search_result_cache.get(key)
+        if results is None:
+            results = await self._build_vector_store().asimilarity_search(query, k=k, filter=filter or None, namespace=namespace)
+            search_result_cache.set(key, results)
+        return results
+
+    def _sparse_encoder_stale(self) -> bool:
+        return not self._sparse_loaded or self._sparse_generation != search_result_cache.generation
+
+    def _load_sparse_encoder(self):
+        # An unfitted encoder (None) is cached too, until the next generation
+        generation = search_result_cache.generation
+        self._sparse_encoder = BM25Encoder.load()
+        self._sparse_generation = generation
+        self._sparse_loaded = True
+
+    @property
+    def sparse_encoder(self):
+        """BM25 encoder fitted at ingest time, reloaded when the index generation moves."""
+        if not config.HYBRID_SEARCH:
+            return None
+        if self._sparse_encoder_stale():
+            self._load_sparse_encoder()
+        return self._sparse_encoder
+
+    async def _aload_sparse_encoder(self):
+        """Async sparse_encoder: a stale encoder is reloaded in a worker thread, never on the event loop."""
+        if not config.HYBRID_SEARCH:
+            return None
+        if self._sparse_encoder_stale():
+            await asyncio.to_thread(self._load_sparse_encoder)
+        return self._sparse_encoder
+
+    def update_sparse_encoder(self, texts: list, removed_ids: list = None, namespace: str = None, reset: bool = False):
+        """
+        Fit the BM25 corpus statistics on newly ingested chunks and persist them.
+
+        Args:
+            texts (list): Chunk texts about to be upserted.
+            removed_ids (list, optional): Ids of chunks about to be deleted; their texts
+                are fetched from the index and subtracted from the statistics.
+            namespace (str, optional): Namespace of ``removed_ids``.
+            reset (bool): Start from empty statistics.
+        """
+        if not config.HYBRID_SEARCH:
+            return
+        removed_texts = []
+        if removed_ids and not reset:
+            removed_texts = [record["metadata"].get("text", "") for record in self.fetch_records(removed_ids, namespace=namespace)]
+        encoder = BM25Encoder().fit([]) if reset else (self.sparse_encoder or BM25Encoder())
+        encoder.partial_fit(texts, removed_texts=removed_texts)
+        encoder.save()
+        self._sparse_encoder = encoder
+        self._sparse_loaded = True
+
+    def _query_candidates(self, dense: list, sparse: dict, k: int, filter: dict, namespace: str, include_values: bool = False) -> list:
+        """Query the index and return (Document, score, values) triples, best first."""
+        response = self.index.query(
+            vector=dense,
+            sparse_vector=sparse if sparse and sparse["indices"] else None,
+            top_k=k,
+            filter=filter or None,
+            namespace=namespace or "",
+            include_metadata=True,
+            include_values=include_values
+        )
+        candidates = []
+        for match in response.matches:
+            metadata = dict(match.metadata or {})
+            text = metadata.pop("text", "")
+            candidates.append((Document(page_content=text, metadata=metadata, id=match.id), match.score, match.values))
+        return candidates
+
+    def _query_index(self, dense: list, sparse: dict, k: int, filter: dict, namespace: str) -> list:
+        return [doc for doc, _, _ in self._query_candidates(dense, sparse, k, filter, namespace)]
+
+    def hybrid_search(self, query: str, k: int = 3, filter: dict = None, namespace: str = None, alpha: float = None) -> list:
+        """
+        Sparse-dense (BM25 + embedding) search in a single Pinecone query.
+
+        Falls back to dense similarity_search when hybrid search is disabled or the
+        BM25 encoder has not been fitted yet.
+        """
+        encoder = self.sparse_encoder
+        if encoder is None:
+            return self.similarity_search(query, k=k, filter=filter, namespace=namespace)
+        alpha = config.HYBRID_ALPHA if alpha is None else alpha
+        namespace = namespace or self.namespace
+        key = search_result_cache.make_key(query, filter, namespace, k, index=self.index_name, alpha=alpha)
+        results = search_result_cache.get(key)
+        if results is None:
+            dense, sparse = hybrid_scale(self.embeddings.embed_query(query), encoder.encode_queries([query])[0], alpha)
+            results = self._query_index(dense, sparse, k, filter, namespace)
+            search_result_cache.set(key, results)
+        return results
+
+    async def ahybrid_search(self, query: str, k: int = 3, filter: dict = None, namespace: str = None, alpha: float = None) -> list:
+        """Async variant of hybrid_search."""
+        if search_result_cache.generation_check_due():
+            await asyncio.to_thread(search_result_cache.check_generation)
+        encoder = await self._aload_sparse_encoder()
+        if encoder is None:
+            return await self.asimilarity_search(query, k=k, filter=filter, namespace=namespace)
+        alpha = config.HYBRID_ALPHA if alpha is None else alpha
+        namespace = namespace or self.namespace
+        key = search_result_cache.make_key(query, filter, namespace, k, index=self.index_name, alpha=alpha)
+        results = search_result_cache.get(key)
+        if results is None:
+            dense, sparse = hybrid_scale(await self.embeddings.aembed_query(query), encoder.encode_queries([query])[0], alpha)
+            results = await asyncio.to_thread(self._query_index, dense, sparse, k, filter, namespace)
+            search_result_cache.set(key, results)
+        return results
+
+    def _search_candidates(self, query: str, query_vector: list, fetch_k: int, filter: dict, namespace: str) -> list:
+        """Fetch fetch_k (Document, score, embedding) candidates, hybrid-scored when the BM25 encoder is fitted."""
+        encoder = self.sparse_encoder
+        if encoder is None:
+            return self._query_candidates(query_vector, None, fetch_k, filter, namespace, include_values=True)
+        dense, sparse = hybrid_scale(query_vector, encoder.encode_queries([query])[0], config.HYBRID_ALPHA)
+        return self._query_candidates(dense, sparse, fetch_k, filter, namespace, include_values=True)
+
+    def _mmr_params(self, k: int, fetch_k: int, lambda_mult: float, score_threshold: float) -> tuple:
+        return (
+            max(fetch_k or config.RETRIEVAL_FETCH_K, k),
+            config.RETRIEVAL_MMR_LAMBDA if lambda_mult is None else lambda_mult,
+            config.RETRIEVAL_SCORE_THRESHOLD if score_threshold is None else score_threshold,
+        )
+
+    @staticmethod
+    def _merge_candidates(shard_results: list, fetch_k: int) -> list:
+        """Merge per-namespace candidates by score; scores of one index are comparable across namespaces."""
+        merged = [candidate for results in shard_results for candidate in results]
+        merged.sort(key=lambda candidate: candidate[1], reverse=True)
+        return merged[:fetch_k]
+
+    def _search_shards(self, query: str, query_vector: list, fetch_k: int, filter: dict, namespaces: list) -> list:
+        """Query every namespace in parallel and merge the candidates by score."""
+        if len(namespaces) == 1:
+            return self._search_candidates(query, query_vector, fetch_k, filter, namespaces[0])
+        shard_results = _shard_pool.map(
+            lambda namespace: self._search_candidates(query, query_vector, fetch_k, filter, namespace), namespaces
+        )
+        return self._merge_candidates(list(shard_results), fetch_k)
+
+    async def _asearch_shards(self, query: str, query_vector: list, fetch_k: int, filter: dict, namespaces: list) -> list:
+        shard_results = await asyncio.gather(*[
+            asyncio.to_thread(self._search_candidates, query, query_vector, fetch_k, filter, namespace)
+            for namespace in namespaces
+        ])
+        return self._merge_candidates(shard_results, fetch_k)
+
+    def mmr_search(self, query: str, k: int = 3, filter: dict = None, namespace: str = None, fetch_k: int = None,
+                   lambda_mult: float = None, score_threshold: float = None, namespaces: list = None,
+                   query_vector: list = None) -> list:
+        """
+        Diversified search: fetch a larger candidate set with its vectors, drop candidates
+        below the score threshold and pick up to k of the rest with Maximal Marginal Relevance.
+
+        Args:
+            query (str): Query text.
+            k (int): Maximum number of results; fewer are returned when few candidates pass the threshold.
+            filter (dict, optional): Metadata filter.
+            namespace (str, optional): Namespace override.
+            fetch_k (int, optional): Candidate set size. Defaults to RETRIEVAL_FETCH_K.
+            lambda_mult (float, optional): Relevance/diversity trade-off. Defaults to RETRIEVAL_MMR_LAMBDA.
+            score_threshold (float, optional): Minimum index score. Defaults to RETRIEVAL_SCORE_THRESHOLD.
+            namespaces (list, optional): Fan out to these namespaces in parallel instead of
+                querying ``namespace``, e.g. one namespace per subscribed publication.
+            query_vector (list, optional): Embedding of the query, when already computed.
+
+        Returns:
+            list: Selected Documents.
+        """
+        fetch_k, lambda_mult, score_threshold = self._mmr_params(k, fetch_k, lambda_mult, score_threshold)
+        namespace = namespace or self.namespace
+        key = search_result_cache.make_key(
+            query, filter, namespace, k, index=self.index_name, fetch_k=fetch_k, lambda_mult=lambda_mult,
+            score_threshold=score_threshold, hybrid=self.sparse_encoder is not None,
+            namespaces=sorted(namespaces) if namespaces else None
+        )
+        results = search_result_cache.get(key)
+        if results is None:
+            if query_vector is None:
+                query_vector = self.embeddings.embed_query(query)
+            if namespaces:
+                candidates = self._search_shards(query, query_vector, fetch_k, filter, namespaces)
+            else:
+                candidates = self._search_candidates(query, query_vector, fetch_k, filter, namespace)
+            results = select_diverse(query_vector, candidates, k, lambda_mult, score_threshold)
+            search_result_cache.set(key, results)
+        return results
+
+    async def ammr_search(self, query: str, k: int = 3, filter: dict = None, namespace: str = None, fetch_k: int = None,
+                          lambda_mult: float = None, score_threshold: float = None, namespaces: list = None,
+                          query_vector: list = None) -> list:
+        """Async variant of mmr_search."""
+        fetch_k, lambda_mult, score_threshold = self._mmr_params(k, fetch_k, lambda_mult, score_threshold)
+        namespace = namespace or self.namespace
+        if search_result_cache.generation_check_due():
+            await asyncio.to_thread(search_result_cache.check_generation)
+        encoder = await self._aload_sparse_encoder()
+        key = search_result_cache.make_key(
+            query, filter, namespace, k, index=self.index_name, fetch_k=fetch_k, lambda_mult=lambda_mult,
+            score_threshold=score_threshold, hybrid=encoder is not None,
+            namespaces=sorted(namespaces) if namespaces else None
+        )
+        results = search_result_cache.get(key)
+        if results is None:
+            if query_vector is None:
+                query_vector = await self.embeddings.aembed_query(query)
+            if namespaces:
+                candidates = await self._asearch_shards(query, query_vector, fetch_k, filter, namespaces)
+            else:
+                candidates = await asyncio.to_thread(self._search_candidates, query, query_vector, fetch_k, filter, namespace)
+            results = await asyncio.to_thread(select_diverse, query_vector, candidates, k, lambda_mult, score_threshold)
+            search_result_cache.set(key, results)
+        return results
+
+    @staticmethod
+    def _filters_for(queries: list, filters) -> list:
+        if isinstance(filters, list):
+            if len(filters) != len(queries):
+                raise ValueError("filters must have one entry per query")
+            return filters
+        return [filters] * len(queries)
+
+    def similarity_search_many(self, queries: list, filters=None, k: int = 3, namespace: str = None,
+                               namespaces: list = None, mmr: bool = False) -> list:
+        """
+        Run several similarity searches with one embedding request and concurrent queries.
+
+        Args:
+            queries (list): Query strings.
+            filters (dict | list, optional): One filter for all queries, or one per query.
+            k (int): Results per query.
+            namespace (str, optional): Namespace override.
+            namespaces (list, optional): Fan out to these namespaces (``mmr`` only).
+            mmr (bool): Run each query as mmr_search instead of a plain similarity search.
+
+        Returns:
+            list: One list of Documents per query, in input order.
+        """
+        if not queries:
+            return []
+        filters = self._filters_for(queries, filters)
+        namespace = namespace or self.namespace
+        vectors = self.embeddings.embed_queries(queries)
+
+        def search(i):
+            if mmr:
+                return self.mmr_search(queries[i], k=k, filter=filters[i], namespace=namespace, namespaces=namespaces, query_vector=vectors[i])
+            return self._build_vector_store().similarity_search_by_vector(vectors[i], k=k, filter=filters[i] or None, namespace=namespace)
+
+        with ThreadPoolExecutor(max_workers=min(len(queries), 8)) as pool:
+            return list(pool.map(search, range(len(queries))))
+
+    async def asimilarity_search_many(self, queries: list, filters=None, k: int = 3, namespace: str = None,
+                                      namespaces: list = None, mmr: bool = False) -> list:
+        """Async variant of similarity_search_many."""
+        if not queries:
+            return []
+        filters = self._filters_for(queries, filters)
+        namespace = namespace or self.namespace
+        vectors = await self.embeddings.aembed_queries(queries)
+
+        def search(i):
+            if mmr:
+                return self.ammr_search(queries[i], k=k, filter=filters[i], namespace=namespace, namespaces=namespaces, query_vector=vectors[i])
+            return self._build_vector_store().asimilarity_search_by_vector(vectors[i], k=k, filter=filters[i] or None, namespace=namespace)
+
+        return list(await asyncio.gather(*[search(i) for i in range(len(queries))]))
+
     def get_vector_store(self, documents=[]):
         """
-        Create a PineconeVectorStore and upsert documents in batches of 100.
+        Return the PineconeVectorStore, first uploading any given documents.
 
         Args:
             documents (list): List of document chunks to upsert.
@@ -87,91 +452,264 @@ class PineconeVectorStoreHandler:
             PineconeVectorStore: Configured vector store.
         """
         try:
-            embeddings = OpenAIEmbeddings()
-            vector_store = PineconeVectorStore(index_name=self.index_name, embedding=embeddings)
+            vector_store = self._build_vector_store()
             if len(documents) > 0:
-                batch_size = 100
-                MAX_REQUESTS_PER_MIN = 120
-                MAX_TOKENS_PER_MIN = 150000
-                tokens_per_doc = 800  # estimate or compute for a doc
-                start_time = time.time()
-                requests_sent = 0
-                tokens_sent = 0
-                for i in range(0, len(documents), batch_size):
-                    batch = documents[i:i + batch_size]
-                    batch_tokens = len(batch) * tokens_per_doc # rough estimate; 
-                    # Throttle by requests per minute
-                    if requests_sent >= MAX_REQUESTS_PER_MIN or tokens_sent + batch_tokens > MAX_TOKENS_PER_MIN:
-                        elapsed = time.time() - start_time
-                        if elapsed < 60:
-                            time.sleep(60 - elapsed)
-                        # Reset counters after each minute
-                        start_time = time.time()
-                        requests_sent = 0
-                        tokens_sent = 0
-                    vector_store.add_documents(batch)
-                    requests_sent += 1
-                    tokens_sent += batch_tokens
+                self.last_upload_stats = self.add_texts(
+                    [doc.page_content for doc in documents],
+                    metadatas=[doc.metadata for doc in documents]
+                )
             return vector_store
         except Exception as e:
             print(f"Error creating vector store: {str(e)}")
             raise
 
-    def add_texts(self, texts: list, metadatas: list = None, namespace: str = None):
+    def _texts_to_embed(self, texts: list) -> list:
+        """Texts of a batch that still cost embedding tokens (not in the embedding archive)."""
+        embeddings = self.ingest_embeddings
+        return embeddings.missing(texts) if isinstance(embeddings, ArchivedEmbeddings) else texts
+
+    def _upsert(self, records: list, namespace: str = None):
+        encoder = self.sparse_encoder
+        if encoder is not None:
+            sparse_vectors = encoder.encode_documents([record["metadata"].get("text", "") for record in records])
+            for record, sparse in zip(records, sparse_vectors):
+                if sparse["indices"]:
+                    record["sparse_values"] = sparse
+        self.index.upsert(vectors=records, namespace=namespace or self.namespace)
+
+    def delete_ids(self, ids: list, namespace: str = None):
+        """Delete vectors by id, 1000 ids per request."""
+        for i in range(0, len(ids), 1000):
+            self.index.delete(ids=ids[i:i + 1000], namespace=namespace or self.namespace)
+
+    def purge_source(self, source: str, keep_ids: list = None, namespace: str = None) -> int:
+        """
+        Delete every vector of a source whose id is not in keep_ids.
+
+        Relies on the deterministic ``<source hash>#...`` id prefix, so it also finds
+        vectors the index manifest does not know about.
+
+        Returns:
+            int: Number of vectors deleted.
+        """
+        keep = set(keep_ids or [])
+        stale = [vector_id for vector_id in self.list_ids(source_prefix(source), namespace=namespace) if vector_id not in keep]
+        if stale:
+            self.delete_ids(stale, namespace=namespace)
+        return len(stale)
+
+    def has_vectors(self, namespace: str = None) -> bool:
+        """Whether the namespace (default: the handler's) holds any vectors."""
+        stats = self.index.describe_index_stats()
+        namespaces = stats.namespaces or {}
+        name = namespace or self.namespace or ""
+        summary = namespaces.get(name) or (namespaces.get("__default__") if name == "" else None)
+        return bool(summary and summary.vector_count)
+
+    def list_ids(self, prefix: str = "", namespace: str = None) -> list:
+        """Ids of the vectors in a namespace, optionally restricted to an id prefix."""
+        ids = []
+        for page in self.index.list(prefix=prefix or None, namespace=namespace or self.namespace or ""):
+            ids.extend(page)
+        return ids
+
+    def fetch_records(self, ids: list, namespace: str = None) -> list:
+        """Fetch stored vectors as upsert records (id, values, metadata), 100 ids per request."""
+        records = []
+        for i in range(0, len(ids), 100):
+            response = self.index.fetch(ids=ids[i:i + 100], namespace=namespace or self.namespace or "")
+            for vector_id, vector in response.vectors.items():
+                records.append({"id": vector_id, "values": list(vector.values), "metadata": dict(vector.metadata or {})})
+        return records
+
+    def get_uploader(self, namespace: str = None) -> BatchUploader:
+        """Build a BatchUploader writing to this handler's index."""
+        return BatchUploader(
+            embed_fn=self.ingest_embeddings.embed_documents,
+            upsert_fn=lambda records: self._upsert(records, namespace=namespace),
+            limiter=RateLimiter(config.UPLOAD_MAX_REQUESTS_PER_MIN, config.UPLOAD_MAX_TOKENS_PER_MIN),
+            count_tokens=get_token_counter(self.ingest_embeddings.model),
+            cost_fn=self._texts_to_embed,
+            batch_size=config.UPLOAD_BATCH_SIZE,
+            max_in_flight=config.UPLOAD_MAX_IN_FLIGHT
+        )
+
+    def add_texts(self, texts: list, metadatas: list = None, namespace: str = None, ids: list = None) -> dict:
         """
         Add texts with metadata to the vector store with rate limiting.
         
         Args:
             texts (list): List of text strings to add
             metadatas (list, optional): List of metadata dicts for each text
+            namespace (str, optional): Target namespace, defaults to the handler's namespace
+            ids (list, optional): Vector ids; random ids are generated when omitted
+
+        Returns:
+            dict: Upload throughput statistics (chunks/s, tokens/s, ...).
         """
         try:
-            embeddings = OpenAIEmbeddings()
-            vector_store = PineconeVectorStore(index_name=self.index_name, embedding=embeddings)
-            
-            if len(texts) > 0:
-                batch_size = 100
-                MAX_REQUESTS_PER_MIN = 120
-                MAX_TOKENS_PER_MIN = 150000
-                tokens_per_doc = 800  # estimate per document
-                
-                start_time = time.time()
-                requests_sent = 0
-                tokens_sent = 0
-                
-                for i in range(0, len(texts), batch_size):
-                    batch_texts = texts[i:i + batch_size]
-                    batch_metadata = metadatas[i:i + batch_size] if metadatas else None
-                    batch_tokens = len(batch_texts) * tokens_per_doc
-                    
-                    # Apply rate limiting
-                    if requests_sent >= MAX_REQUESTS_PER_MIN or tokens_sent + batch_tokens > MAX_TOKENS_PER_MIN:
-                        elapsed = time.time() - start_time
-                        if elapsed < 60:
-                            time.sleep(60 - elapsed)
-                        start_time = time.time()
-                        requests_sent = 0
-                        tokens_sent = 0
-                    
-                    vector_store.add_texts(
-                        texts=batch_texts,
-                        metadatas=batch_metadata if batch_metadata else None,
-                        namespace=namespace
-                    )
-                    
-                    requests_sent += 1
-                    tokens_sent += batch_tokens
-                    
-                    if requests_sent % 10 == 0:  # Log progress every 10 batches
-                        console.print(f"[cyan]Processed {i + len(batch_texts)} documents...[/cyan]")
-                        
-            return vector_store
-            
+            if len(texts) == 0:
+                return {"chunks": 0}
+            return self.get_uploader(namespace).upload(texts, metadatas=metadatas, ids=ids)
         except Exception as e:
             console.print(f"[red]Error adding texts to vector store: {str(e)}[/red]")
             raise
 
 
+class LocalVectorStoreHandler(PineconeVectorStoreHandler):
+    """
+    In-process backend with the PineconeVectorStoreHandler interface.
+
+    Vectors are kept in memory-mapped files under LOCAL_VECTOR_DIR and searched with
+    NumPy (or an HNSW graph when LOCAL_VECTOR_HNSW is set and hnswlib is installed),
+    so no Pinecone account or network hop is needed.
+    """
+
+    def __init__(self, dimension=1536, namespace=None, path=None, use_hnsw=None):
+        """
+        Initialize the LocalVectorStoreHandler.
+
+        Args:
+            dimension (int): Dimensionality of the embeddings. Default is 1536.
+            namespace (str): Namespace used by the vector store returned from get_vector_store.
+            path (str): Storage folder. Defaults to LOCAL_VECTOR_DIR.
+            use_hnsw (bool): Serve queries from an HNSW graph. Defaults to LOCAL_VECTOR_HNSW.
+        """
+        self.index_name = "local"
+        self.namespace = namespace
+        self.dimension = dimension
+        self.path = path or config.LOCAL_VECTOR_DIR
+        self.use_hnsw = config.LOCAL_VECTOR_HNSW if use_hnsw is None else use_hnsw
+        self.index = None
+        self._embeddings = None
+        self._ingest_embeddings = None
+        self._vector_store = None
+        self._sparse_encoder = None
+        self._sparse_generation = None
+        self._sparse_loaded = False
+        self.last_upload_stats = None
+
+    def _initialize_index(self):
+        os.makedirs(self.path, exist_ok=True)
+
+    def is_index_exists(self):
+        return os.path.isdir(self.path)
+
+    def reset_index(self):
+        import shutil
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._vector_store = None
+        self._initialize_index()
+
+    def _build_vector_store(self):
+        if self._vector_store is None:
+            self._vector_store = LocalVectorStore(
+                self.path,
+                self.embeddings,
+                dimension=self.dimension,
+                namespace=self.namespace,
+                use_hnsw=self.use_hnsw,
+                generation_check_interval=config.SEARCH_CACHE_GENERATION_CHECK_SECONDS
+            )
+        return self._vector_store
+
+    def _upsert(self, records: list, namespace: str = None):
+        self._build_vector_store().upsert(records, namespace=namespace or self.namespace)
+
+    def hybrid_search(self, query: str, k: int = 3, filter: dict = None, namespace: str = None, alpha: float = None) -> list:
+        # The local backend has no sparse vectors; serve dense results.
+        return self.similarity_search(query, k=k, filter=filter, namespace=namespace)
+
+    async def ahybrid_search(self, query: str, k: int = 3, filter: dict = None, namespace: str = None, alpha: float = None) -> list:
+        return await self.asimilarity_search(query, k=k, filter=filter, namespace=namespace)
+
+    def _search_candidates(self, query: str, query_vector: list, fetch_k: int, filter: dict, namespace: str) -> list:
+        vector_store = self._build_vector_store()
+        with vector_store._lock:
+            # Pick up chunks ingested by other processes since the namespace was opened
+            vector_store._check_generation()
+            store = vector_store.get_namespace(namespace)
+            store.refresh()
+            return [
+                (vector_store._to_document(store, row), score, np.asarray(store.matrix[row]))
+                for row, score in store.query(query_vector, fetch_k, filter)
+            ]
+
+    def delete_ids(self, ids: list, namespace: str = None):
+        self._build_vector_store().delete(ids, namespace=namespace or self.namespace)
+
+    def has_vectors(self, namespace: str = None) -> bool:
+        vector_store = self._build_vector_store()
+        with vector_store._lock:
+            store = vector_store.get_namespace(namespace or self.namespace)
+            store.refresh()
+            return len(store) > 0
+
+    def list_ids(self, prefix: str = "", namespace: str = None) -> list:
+        vector_store = self._build_vector_store()
+        with vector_store._lock:
+            store = vector_store.get_namespace(namespace or self.namespace)
+            store.refresh()
+            return store.list_ids(prefix)
+
+    def fetch_records(self, ids: list, namespace: str = None) -> list:
+        vector_store = self._build_vector_store()
+        with vector_store._lock:
+            store = vector_store.get_namespace(namespace or self.namespace)
+            store.refresh()
+            return [
+                {"id": vector_id, "values": np.asarray(store.matrix[store.rows[vector_id]]).tolist(), "metadata": dict(store.metadatas[store.rows[vector_id]])}
+                for vector_id in ids if vector_id in store.rows
+            ]
+
+
+def publication_namespace(publication_id) -> str:
+    """Namespace holding one publication's content vectors when PUBLICATION_NAMESPACES is on."""
+    return f"{config.PUBLICATION_NAMESPACE_PREFIX}{publication_id}"
+
+
+def is_local_namespace(namespace: str = None) -> bool:
+    """Whether the namespace is served by the local backend (VECTOR_BACKEND / LOCAL_VECTOR_NAMESPACES)."""
+    if config.VECTOR_BACKEND == "local":
+        return True
+    local_namespaces = [name.strip() for name in (config.LOCAL_VECTOR_NAMESPACES or "").split(",") if name.strip()]
+    return (namespace or "") in local_namespaces
+
+
+def create_handler(namespace: str = None) -> PineconeVectorStoreHandler:
+    """Create a handler for the backend configured for the namespace."""
+    if is_local_namespace(namespace):
+        return LocalVectorStoreHandler(namespace=namespace)
+    return PineconeVectorStoreHandler(namespace=namespace)
+
+
+def get_shared_handler(namespace: str = None) -> PineconeVectorStoreHandler:
+    """
+    Return the process-wide handler for the configured index and namespace.
+
+    The handler is created lazily on first use, so the readiness check, the Pinecone
+    client, the embedding client and the vector store are set up once per process
+    and reused by every later search. Namespaces configured for the local backend
+    get a LocalVectorStoreHandler instead.
+
+    Args:
+        namespace (str, optional): Namespace the handler's vector store is bound to.
+
+    Returns:
+        PineconeVectorStoreHandler: The shared handler.
+    """
+    index_name = "local" if is_local_namespace(namespace) else os.environ.get('PINECONE_INDEX_NAME')
+    key = (index_name, namespace)
+    handler = _shared_handlers.get(key)
+    if handler is None:
+        with _shared_lock:
+            handler = _shared_handlers.get(key)
+            if handler is None:
+                handler = create_handler(namespace=namespace)
+                _shared_handlers[key] = handler
+    return handler
+
+
 # # Example usage
 # if __name__ == "__main__":
 #     # Configure your API keys and index name